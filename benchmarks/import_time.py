@@ -0,0 +1,54 @@
+"""Temps d'import du cœur trezoponts, mesuré avec python -X importtime dans un interpréteur neuf.
+
+Échoue (code de sortie 1) si le temps d'import dépasse le budget ou si un module lourd (interface graphique,
+pdfplumber) est chargé à l'import.
+
+    python benchmarks/import_time.py [--budget-ms 100] [--runs 5] [--module trezoponts.ingestion]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = 100
+FORBIDDEN_MODULES = ("tkinter", "pdfplumber", "pdfminer")
+
+
+def measure(module):
+    # Temps cumulé (ms) de l'import du module, et modules interdits chargés au passage
+    code = f"import sys, {module}; print(','.join(m for m in {FORBIDDEN_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return cumulative_us / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="trezoponts")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    timings = []
+    loaded = []
+    for _ in range(args.runs):
+        elapsed_ms, loaded = measure(args.module)
+        timings.append(elapsed_ms)
+    best_ms = min(timings)
+
+    print(json.dumps({"module": args.module, "import_ms": round(best_ms, 2), "budget_ms": args.budget_ms,
+                      "runs_ms": [round(t, 2) for t in timings], "forbidden_loaded": loaded}))
+    if best_ms > args.budget_ms or loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Mémoire occupée par N opérations : représentation compacte (trezoponts.models) contre l'ancienne classe à __dict__.
+
+Chaque représentation est mesurée dans un processus neuf. Les chaînes et les dates sont recréées pour chaque
+opération, comme à la lecture d'un relevé ou d'operations.json.
+
+    python benchmarks/memory.py [-n 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trezoponts.models import Operation  # noqa: E402
+
+
+class LegacyOperation:
+    # Opération telle qu'elle était avant la représentation compacte : un __dict__ par instance, rien de partagé
+    def __init__(self, compte, moyen, nom, destinataire, montant, date, valeur=None, de=None, motif=None, ref=None, ref_2=None, ref_3=None,
+                 pour=None, date_virement=None, remise=None, chez=None, lib=None, facture=None, repartition=None):
+        self.compte = compte
+        self.moyen = moyen
+        self.nom = nom
+        self.destinataire = destinataire
+        self.montant = montant
+        self.date = date
+        self.valeur = valeur
+        self.de = de
+        self.motif = motif
+        self.ref = ref
+        self.ref_2 = ref_2
+        self.ref_3 = ref_3
+        self.pour = pour
+        self.date_virement = date_virement
+        self.remise = remise
+        self.chez = chez
+        self.lib = lib
+        self.facture = facture
+        self.repartition = repartition or []
+
+
+REPRESENTATIONS = {"legacy": LegacyOperation, "compact": Operation}
+
+
+def resident_memory():
+    # Mémoire résidente du processus (octets), si le système permet de la lire
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def build_operations(cls, n, seed=0):
+    rnd = random.Random(seed)
+    comptes = ["COMPTE COURANT", "LIVRET", "COMPTE ASSO"]
+    moyens = ["CARTE", "VIR", "CHEQUE", "_"]
+    tiers = [f"SOCIETE {i}" for i in range(500)]
+    start = datetime(2015, 1, 1).toordinal()
+    operations = []
+    for i in range(n):
+        day = start + rnd.randrange(3650)
+        destinataire = "%s" % rnd.choice(tiers)  # Nouvelle chaîne à chaque opération, comme après un parsing
+        operations.append(cls(compte="%s" % rnd.choice(comptes), moyen="%s" % rnd.choice(moyens),
+                              nom=f"CARTE X{i % 9999:04d} {destinataire}", destinataire=destinataire,
+                              montant=round(rnd.uniform(-500, 500), 2), date=datetime.fromordinal(day),
+                              valeur=datetime.fromordinal(day) + timedelta(days=1), de=destinataire, ref=f"R{i}"))
+    return operations
+
+
+def run(representation, n):
+    gc.collect()
+    rss_before = resident_memory()
+    if rss_before is None:
+        tracemalloc.start()  # Sans mémoire résidente lisible, on compte les allocations Python (plus lent)
+    start = time.perf_counter()
+    operations = build_operations(REPRESENTATIONS[representation], n)
+    build_seconds = time.perf_counter() - start
+    if rss_before is None:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        memory = resident_memory() - rss_before
+    return {"representation": representation, "operations": len(operations), "build_seconds": round(build_seconds, 2),
+            "memory_mb": round(memory / 2 ** 20, 1), "measure": "rss" if rss_before is not None else "tracemalloc"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=1_000_000)
+    parser.add_argument("--run", choices=REPRESENTATIONS, help=argparse.SUPPRESS)  # Mesure dans le processus courant
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.n)))
+        return
+
+    results = {}
+    for representation in REPRESENTATIONS:
+        output = subprocess.run([sys.executable, __file__, "--run", representation, "-n", str(args.n)],
+                                capture_output=True, text=True, check=True).stdout
+        results[representation] = json.loads(output)
+    results["memory_ratio"] = round(results["compact"]["memory_mb"] / results["legacy"]["memory_mb"], 3)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Micro-benchmark de l'analyse des lignes de relevés : boucle actuelle contre l'ancienne (startswith/replace, strptime).
+
+Les lignes viennent de relevés synthétiques (benchmarks/synthetic.py), sans PDF ; les deux analyses doivent produire
+exactement les mêmes opérations. Avec --header-pages N, mesure aussi la recherche de l'en-tête d'un profil
+d'extraction sur un relevé PDF synthétique de N pages : chaînes du flux de contenu contre caractères de la page
+(interprétation complète par pdfminer) ; les deux doivent écarter les mêmes pages.
+
+    python benchmarks/parsing.py [--rows 200000] [--repeat 3] [--header-pages 30]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import statement_tables, write_statement_pdf  # noqa: E402
+from trezoponts.ingestion import ExtractionProfile, parse_statement_rows, statement_rows, str_to_float  # noqa: E402
+from trezoponts.models import Operation  # noqa: E402
+
+
+def legacy_parse_statement_rows(account, rows):
+    # Boucle d'analyse telle qu'elle était avant la table des préfixes
+    current_operation = None
+
+    for l in rows:
+        if l[0] != '' and l[0] is not None:
+            if current_operation:
+                current_operation.compact()
+                yield current_operation
+            date = datetime.strptime(l[0], "%d/%m/%Y")
+            valeur = datetime.strptime(l[1], "%d/%m/%Y")
+            nom = l[2]
+            moyen = "CARTE" if "CARTE" in nom else "VIR" if "VIR" in nom else "CHEQUE" if "CHEQUE" in nom else "_"
+            debit = None if l[3] == '' else str_to_float(l[3])
+            credit = None if l[4] == '' else str_to_float(l[4])
+            montant = credit if credit is not None else -debit
+
+            current_operation = Operation(compte=account, moyen=moyen,
+                                          nom=nom, destinataire="", montant=montant, date=date, valeur=valeur
+                                          )
+
+        elif l[2] is not None:
+            if l[2].startswith("DE:"):
+                current_operation.de = l[2].replace("DE:", "", 1).strip()
+                current_operation.destinataire = current_operation.de
+            elif l[2].startswith("MOTIF:"):
+                current_operation.motif = l[2].replace("MOTIF:", "", 1).strip()
+            elif l[2].startswith("REF:"):
+                if current_operation.ref is None:
+                    current_operation.ref = l[2].replace("REF:", "", 1).strip()
+                elif current_operation.ref_2 is None:
+                    current_operation.ref_2 = l[2].replace("REF:", "", 1).strip()
+                elif current_operation.ref_3 is None:
+                    current_operation.ref_3 = l[2].replace("REF:", "", 1).strip()
+            elif l[2].startswith("POUR:"):
+                current_operation.pour = l[2].replace("POUR:", "", 1).strip()
+                current_operation.destinataire = current_operation.pour
+            elif l[2].startswith("DATE:"):
+                current_operation.date_virement = l[2].replace("DATE:", "", 1).strip()
+            elif l[2].startswith("REMISE:"):
+                current_operation.remise = l[2].replace("REMISE:", "", 1).strip()
+            elif l[2].startswith("CHEZ:"):
+                current_operation.chez = l[2].replace("CHEZ:", "", 1).strip()
+            elif l[2].startswith("LIB:"):
+                current_operation.lib = l[2].replace("LIB:", "", 1).strip()
+
+    if current_operation:
+        current_operation.compact()
+        yield current_operation
+
+
+PARSERS = {"legacy": legacy_parse_statement_rows, "current": parse_statement_rows}
+
+
+def legacy_has_header(profile, page):
+    # Recherche de l'en-tête dans les caractères de la page (interprétation complète), seule recherche avant la lecture
+    # du flux de contenu
+    return profile._header_chars in "".join("".join(char["text"] for char in page.chars).split())
+
+
+def header_benchmark(nb_pages, repeat):
+    # Seule la première page du relevé synthétique porte l'en-tête : les autres sont écartées, comme des mentions légales
+    import pdfplumber
+
+    profile = ExtractionProfile(header="RELEVE DE COMPTE")
+    checks = {"legacy": lambda page: legacy_has_header(profile, page), "current": profile.has_header}
+    results = {}
+    decisions = {}
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "releve_01012000.pdf")
+        write_statement_pdf(path, statement_tables(pages=nb_pages, rows_per_page=40)[0])
+        for name, check in checks.items():
+            timings = []
+            for _ in range(repeat):
+                with pdfplumber.open(path) as pdf:  # Réouvert à chaque fois : pdfplumber garde les caractères lus
+                    start = time.perf_counter()
+                    decisions[name] = [check(page) for page in pdf.pages]
+                    timings.append(time.perf_counter() - start)
+            seconds = min(timings)
+            results[name] = {"seconds": round(seconds, 4), "ms_per_page": round(1000 * seconds / nb_pages, 2)}
+    return {"pages": nb_pages, "header_pages": decisions["current"].count(True), **results,
+            "identical": decisions["legacy"] == decisions["current"],
+            "speedup": round(results["legacy"]["seconds"] / results["current"]["seconds"], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000, help="Nombre approximatif de lignes analysées")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--header-pages", type=int, default=0, help="Pages du relevé PDF de la mesure de l'en-tête (0 : pas de mesure)")
+    args = parser.parse_args()
+
+    # Relevés de 10 pages de 40 lignes, sur des dates différentes
+    statements = []
+    while sum(len(table) for tables in statements for table in tables) < args.rows:
+        statements.append(statement_tables(pages=10, rows_per_page=40, seed=len(statements),
+                                           start=datetime(2000, 1, 1) + timedelta(days=20 * len(statements)))[0])
+    statements_rows = [list(statement_rows(tables)) for tables in statements]
+    nb_rows = sum(len(rows) for rows in statements_rows)
+
+    results = {}
+    operations = {}
+    for name, parse in PARSERS.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            operations[name] = [operation for rows in statements_rows for operation in parse("COMPTE", rows)]
+            timings.append(time.perf_counter() - start)
+        seconds = min(timings)
+        results[name] = {"seconds": round(seconds, 4), "rows_per_second": round(nb_rows / seconds),
+                         "operations": len(operations[name])}
+
+    identical = [op.to_dict() for op in operations["legacy"]] == [op.to_dict() for op in operations["current"]]
+    output = {"rows": nb_rows, "statements": len(statements), **results, "identical": identical,
+              "speedup": round(results["legacy"]["seconds"] / results["current"]["seconds"], 2)}
+    if args.header_pages:
+        output["header"] = header_benchmark(args.header_pages, args.repeat)
+        identical = identical and output["header"]["identical"]
+    print(json.dumps(output))
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
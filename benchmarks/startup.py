@@ -0,0 +1,80 @@
+"""Temps de démarrage (chargement d'operations.json et premier mois affiché) en fonction du nombre d'opérations.
+
+Pour chaque taille, un registre synthétique est écrit dans un dossier temporaire puis chargé dans un processus neuf :
+chargement du Ledger (décodage JSON, index, totaux par événement), lecture du mois le plus récent, puis création de
+toutes les opérations (ce que coûtait le démarrage avant la création à la première lecture).
+
+    python benchmarks/startup.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory import build_operations  # noqa: E402
+from trezoponts.models import Operation  # noqa: E402
+from trezoponts.storage import JsonStorage, write_json_atomic  # noqa: E402
+
+REPARTITION_EVERY = 10  # Une opération sur REPARTITION_EVERY a une répartition
+
+
+def write_ledger(folder, n):
+    operations = build_operations(Operation, n)
+    for i, operation in enumerate(operations[::REPARTITION_EVERY]):
+        operation.repartition = [[f"TIERS {i % 50}", operation.montant, f"EVENEMENT {i % 5}"]]
+    operations.sort(key=lambda operation: operation.date)
+    write_json_atomic(os.path.join(folder, JsonStorage.FILES["operations"]), [operation.to_dict() for operation in operations])
+    write_json_atomic(os.path.join(folder, JsonStorage.FILES["config"]), {"accounts": {}, "root_folder": None})
+
+
+def run(folder):
+    # Mesure dans le processus courant (dossier du registre en argument)
+    from trezoponts.ledger import Ledger
+
+    os.chdir(folder)
+    start = time.perf_counter()
+    ledger = Ledger(JsonStorage())
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    year, month = ledger.operations_index.months()[-1]
+    displayed = ledger.operations_index.operations(None, year, month)
+    first_page_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in ledger.all_operations:
+        pass
+    hydrate_all_seconds = time.perf_counter() - start
+    return {"operations": len(ledger.all_operations), "load_seconds": round(load_seconds, 3),
+            "first_page_seconds": round(first_page_seconds, 4), "first_page_operations": len(displayed),
+            "startup_seconds": round(load_seconds + first_page_seconds, 3), "hydrate_all_seconds": round(hydrate_all_seconds, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # Mesure dans le processus courant
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run)))
+        return
+
+    results = []
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            write_ledger(folder, n)
+            output = subprocess.run([sys.executable, __file__, "--run", folder], capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(output))
+    print(json.dumps({"json_decoder": "orjson" if "orjson" in sys.modules else "json", "results": results}))
+
+
+if __name__ == "__main__":
+    main()
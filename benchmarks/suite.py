@@ -0,0 +1,244 @@
+"""Suite de benchmarks reproductible : extraction et analyse des relevés, sauvegarde et chargement, affichage d'un mois
+d'opérations et totaux par événement, sur des données synthétiques (benchmarks/synthetic.py).
+
+Le résultat est écrit en JSON (avec la version du code) pour suivre les régressions d'une version à l'autre ; avec
+--baseline, chaque temps est comparé à un résultat précédent et le code de sortie vaut 1 si l'un d'eux dépasse
+la tolérance.
+
+    python benchmarks/suite.py [--operations 100000] [--statements 4] [--pages 5] [--parse-statements 200]
+                               [--storage json sqlite journal] [--repeat 3]
+                               [--output resultats.json] [--baseline precedent.json] [--tolerance 1.25]
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import build_ledger, statement_tables, write_ledger, write_statements  # noqa: E402
+from trezoponts.indexes import EventAggregator  # noqa: E402
+from trezoponts.ingestion import StatementPages, TableCache, statement_rows, parse_statement_rows  # noqa: E402
+from trezoponts.ledger import Ledger  # noqa: E402
+from trezoponts.storage import make_storage  # noqa: E402
+
+VISIBLE_ROWS = 15  # Lignes construites par affichage en mode sans interface (hauteur par défaut du tableau)
+
+
+def best_of(repeat, function):
+    # Meilleur temps sur repeat exécutions, et résultat de la dernière
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def code_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "orjson": "orjson" in sys.modules, "date": datetime.now().isoformat(timespec="seconds")}
+
+
+def bench_extraction(folder, args):
+    # Extraction des tableaux des PDF (pdfplumber), sans cache puis depuis le cache
+    paths = write_statements(folder, statements=args.statements, pages=args.pages, rows_per_page=args.rows_per_page)
+    if importlib.util.find_spec("pdfplumber") is None:
+        return {"skipped": "pdfplumber n'est pas installé"}
+
+    seconds, tables = best_of(args.repeat, lambda: [list(StatementPages(path)) for path in paths])
+    nb_pages = sum(len(pages) for pages in tables)
+    cache = TableCache(os.path.join(folder, "cache"))
+    for path in paths:
+        list(StatementPages(path, cache))  # Remplissage du cache
+    cached_seconds, _ = best_of(args.repeat, lambda: [list(StatementPages(path, cache)) for path in paths])
+    return {"pdfs": len(paths), "pages": nb_pages, "seconds": round(seconds, 4), "pages_per_second": round(nb_pages / seconds, 1),
+            "cached_seconds": round(cached_seconds, 4)}
+
+
+def bench_parsing(args):
+    # Analyse des lignes extraites en opérations (tableaux générés directement, sans PDF)
+    statements = [statement_tables(args.pages, args.rows_per_page, seed=s)[0] for s in range(args.parse_statements)]
+    seconds, operations = best_of(args.repeat, lambda: [list(parse_statement_rows("COMPTE", statement_rows(tables)))
+                                                        for tables in statements])
+    nb_rows = sum(len(table) for tables in statements for table in tables)
+    nb_operations = sum(len(ops) for ops in operations)
+    return {"rows": nb_rows, "operations": nb_operations, "seconds": round(seconds, 4),
+            "operations_per_second": round(nb_operations / seconds, 1)}
+
+
+def bench_storage(folder, backend, data, args):
+    # Chargement, sauvegarde complète, sauvegarde d'une seule opération modifiée, rechargement
+    os.makedirs(folder)
+    write_ledger(folder, data)
+    os.chdir(folder)
+    start = time.perf_counter()
+    ledger = Ledger(make_storage(backend))  # Premier lancement (import des fichiers JSON pour sqlite et journal)
+    first_load_seconds = time.perf_counter() - start
+
+    load_seconds, _ = best_of(args.repeat, ledger.load_data)
+    save_seconds, _ = best_of(args.repeat, ledger.save_data)
+    operation = ledger.all_operations[len(ledger.all_operations) // 2]
+
+    def save_one():
+        operation.facture = f"facture_{time.perf_counter_ns()}.pdf"
+        ledger.save_data(updated=[operation])
+
+    save_one_seconds, _ = best_of(args.repeat, save_one)
+    if hasattr(ledger.storage, "wait_for_compaction"):
+        ledger.storage.wait_for_compaction()
+    return ledger, {"first_load_seconds": round(first_load_seconds, 4), "load_seconds": round(load_seconds, 4),
+                    "save_seconds": round(save_seconds, 4), "save_one_seconds": round(save_one_seconds, 5)}
+
+
+class _HeadlessLabel:
+    def config(self, **options):
+        pass
+
+
+class _HeadlessTree:
+    # Sans affichage : construit les lignes visibles comme le ferait le tableau virtualisé, sans appels Tk
+    def set_rows(self, row_count, get_row):
+        for i in range(min(row_count, VISIBLE_ROWS)):
+            get_row(i)
+
+
+def bench_render(storage, args):
+    # load_operations_page sur chaque mois de l'historique (vraie fenêtre Tk si un affichage est disponible)
+    try:
+        import tkinter as tk
+        import compta
+        root = tk.Tk()
+    except Exception as e:  # Pas de tkinter ou pas d'affichage
+        root = None
+        reason = str(e)
+
+    if root is not None:
+        root.withdraw()
+        app = compta.ComptaApp(root, storage)
+        app.config["root_folder"] = app.config["root_folder"] or os.getcwd()
+        app.open_operations()
+        mode = "tk"
+    else:
+        from compta import ComptaApp
+        app = ComptaApp.__new__(ComptaApp)
+        app.page_num_operations = None
+        app.operations_account = None
+        Ledger.__init__(app, storage)
+        app.month_page = _HeadlessLabel()
+        app.operations_tree = _HeadlessTree()
+        mode = f"headless ({reason})"
+
+    months = app.operations_index.months(None)
+
+    def render_all_months():
+        timings = []
+        for page in range(len(months)):
+            app.page_num_operations = page
+            start = time.perf_counter()
+            app.load_operations_page()
+            if root is not None:
+                root.update_idletasks()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    render_all_months()  # Premier passage : création des opérations des mois affichés
+    _, timings = best_of(args.repeat, render_all_months)
+    if root is not None:
+        root.destroy()
+    return {"mode": mode, "months": len(months), "mean_seconds": round(sum(timings) / len(timings), 6) if timings else 0.0,
+            "max_seconds": round(max(timings, default=0.0), 6)}
+
+
+def bench_aggregation(ledger, args):
+    # Construction des totaux par événement puis résumé de chaque événement et de tous les tiers
+    operations = list(ledger.all_operations)
+    build_seconds, aggregator = best_of(args.repeat, lambda: EventAggregator(itertools.chain(operations, ledger.cash_operations)))
+    since = datetime(2018, 1, 1)
+    summaries_seconds, _ = best_of(args.repeat, lambda: [aggregator.summary(name, since) for name in aggregator.event_names()])
+    tiers_seconds, _ = best_of(args.repeat, lambda: aggregator.tiers_summary(since))
+    result = {"events": len(aggregator.event_names()), "build_seconds": round(build_seconds, 4),
+              "summaries_seconds": round(summaries_seconds, 5), "tiers_summary_seconds": round(tiers_seconds, 5)}
+
+    try:
+        from trezoponts.analytics import LedgerArrays
+    except ImportError:
+        return result
+    arrays_seconds, arrays = best_of(args.repeat, lambda: LedgerArrays(operations, ledger.cash_operations))
+    dashboard_seconds, _ = best_of(args.repeat, lambda: (arrays.monthly_balances(), arrays.event_totals(since),
+                                                        arrays.tier_totals(since), arrays.cash_vs_bank(since)))
+    result.update({"arrays_seconds": round(arrays_seconds, 4), "dashboard_seconds": round(dashboard_seconds, 5)})
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # Temps (clés *_seconds et seconds) plus lents que la référence au-delà de la tolérance
+    regressions = []
+    for stage, values in results.items():
+        for key, value in values.items():
+            previous = baseline.get(stage, {}).get(key)
+            if (key == "seconds" or key.endswith("_seconds")) and previous and value > previous * tolerance:
+                regressions.append({"stage": stage, "measure": key, "baseline": previous, "value": value,
+                                    "ratio": round(value / previous, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=100_000, help="Taille du registre synthétique")
+    parser.add_argument("--statements", type=int, default=4, help="Relevés PDF par compte")
+    parser.add_argument("--pages", type=int, default=5, help="Pages par relevé")
+    parser.add_argument("--rows-per-page", type=int, default=40)
+    parser.add_argument("--parse-statements", type=int, default=200, help="Relevés analysés (sans PDF) pour la mesure de l'analyse")
+    parser.add_argument("--storage", nargs="+", default=["json"], choices=("json", "sqlite", "journal"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Fichier JSON des résultats (sinon sur la sortie standard)")
+    parser.add_argument("--baseline", help="Résultats précédents à comparer")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Ratio de temps au-delà duquel une mesure régresse")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        results["extraction"] = bench_extraction(os.path.join(folder, "releves"), args)
+        results["parsing"] = bench_parsing(args)
+        data = build_ledger(args.operations)
+        ledger = None
+        for backend in args.storage:
+            ledger, results[f"storage_{backend}"] = bench_storage(os.path.join(folder, backend), backend, data, args)
+        results["render"] = bench_render(ledger.storage, args)
+        results["aggregation"] = bench_aggregation(ledger, args)
+        os.chdir(cwd)
+
+    report = {"version": code_version(), "parameters": {key: value for key, value in vars(args).items()
+                                                        if key not in ("output", "baseline")},
+              "results": results}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+
+    output = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Données synthétiques reproductibles pour les benchmarks : relevés PDF et registres de taille quelconque.
+
+Les relevés reprennent la mise en page attendue par l'analyse : colonnes date, valeur, libellé, débit et crédit
+séparées par des traits verticaux, une ligne par opération suivie de ses lignes de continuation (DE:, MOTIF:,
+REF:, ...), trois lignes d'en-tête et une ligne de solde final. Les PDF sont écrits à la main (police standard
+Helvetica), sans dépendance.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+from trezoponts.models import Operation, CashOperation, Tiers, Event
+from trezoponts.storage import JsonStorage, write_json_atomic
+
+COLUMNS_X = (40, 110, 180, 420, 490, 560)  # Traits verticaux délimitant les 5 colonnes
+PAGE_TOP = 800
+ROW_HEIGHT = 10
+
+LABELS = ("CARTE X1234 {tiers}", "VIR SEPA {tiers}", "PRLV SEPA {tiers}", "CHEQUE {number}", "REMISE CHEQUES {number}")
+TIERS_NAMES = tuple(f"SOCIETE {i}" for i in range(200)) + ("ASSOCIATION DES AMIS", "MAIRIE DE PARIS", "URSSAF")
+EVENT_NAMES = tuple(f"EVENEMENT {i}" for i in range(20))
+
+
+def french_amount(value):
+    # 1234.5 -> "1.234,50"
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def french_value(text):
+    # "1.234,50" -> 1234.5 ("" -> 0)
+    return float(text.replace(".", "").replace(",", ".")) if text else 0.0
+
+
+def statement_tables(pages=3, rows_per_page=40, seed=0, start=datetime(2024, 1, 1)):
+    """Tableaux (un par page) d'un relevé synthétique, tels que les renvoie l'extraction, et date de la dernière opération."""
+    rnd = random.Random(seed)
+    opening = round(rnd.uniform(0, 5000), 2)
+    rows = [["", "", "RELEVE DE COMPTE", "", ""], ["", "", "SOLDE PRECEDENT", "", french_amount(opening)],
+            ["Date", "Valeur", "Libellé", "Débit", "Crédit"]]
+    day = start
+    number = 0
+    while len(rows) < pages * rows_per_page - 1:
+        number += 1
+        day += timedelta(days=rnd.randint(0, 1))
+        tiers = rnd.choice(TIERS_NAMES)
+        label = rnd.choice(LABELS).format(tiers=tiers, number=1000 + number)
+        amount = french_amount(rnd.uniform(1, 3000))
+        debit, credit = (amount, "") if rnd.random() < 0.6 else ("", amount)
+        rows.append([day.strftime("%d/%m/%Y"), (day + timedelta(days=rnd.randint(0, 2))).strftime("%d/%m/%Y"), label, debit, credit])
+
+        # Lignes de continuation
+        continuation = [f"{'POUR' if debit else 'DE'}: {tiers}"]
+        if label.startswith(("VIR", "PRLV")):
+            continuation += [f"MOTIF: FACTURE {number}", f"REF: {rnd.randrange(10 ** 9):09d}"]
+            if rnd.random() < 0.3:
+                continuation += [f"REF: MANDAT {number}", f"DATE: {day.strftime('%d/%m/%Y')}"]
+        elif label.startswith("REMISE"):
+            continuation.append(f"REMISE: {number}")
+        elif label.startswith("CARTE"):
+            continuation.append(f"CHEZ: {tiers}")
+        if rnd.random() < 0.1:
+            continuation.append(f"LIB: LIBELLE {number}")
+        rows += [["", "", text, "", ""] for text in continuation]
+    # Pas de page supplémentaire faite seulement de lignes de continuation : sans texte dans les colonnes des dates,
+    # l'extraction ne retrouverait pas ces colonnes
+    del rows[pages * rows_per_page - 1:]
+    # Solde final cohérent avec les opérations gardées : le relevé se rapproche sans écart
+    closing = round(opening + sum(french_value(row[4]) - french_value(row[3]) for row in rows[3:] if row[0]), 2)
+    rows.append(["", "", "SOLDE FINAL", "", french_amount(closing)] if closing >= 0 else
+                ["", "", "SOLDE FINAL", french_amount(-closing), ""])
+    return [rows[i:i + rows_per_page] for i in range(0, len(rows), rows_per_page)], day
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_statement_pdf(path, tables):
+    # Une page par tableau : traits verticaux des colonnes, puis le texte de chaque cellule ligne par ligne
+    contents = []
+    for table in tables:
+        commands = ["0.5 w"]
+        for x in COLUMNS_X:
+            commands.append(f"{x} {PAGE_TOP + 12} m {x} {PAGE_TOP - ROW_HEIGHT * len(table)} l S")
+        commands.append(f"BT /F1 8 Tf {COLUMNS_X[-1] + 5} {PAGE_TOP} Td (EUR) Tj ET")  # Texte hors tableau : borne la 5e colonne
+        for r, row in enumerate(table):
+            for c, cell in enumerate(row):
+                if cell:
+                    commands.append(f"BT /F1 8 Tf {COLUMNS_X[c] + 3} {PAGE_TOP - ROW_HEIGHT * r} Td ({_pdf_string(cell)}) Tj ET")
+        contents.append("\n".join(commands).encode("latin-1"))
+
+    # Objets : 1 catalogue, 2 arbre des pages, 3 police, puis (page, contenu) pour chaque page
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"}
+    kids = []
+    for k, content in enumerate(contents):
+        page_id, content_id = 4 + 2 * k, 5 + 2 * k
+        kids.append(f"{page_id} 0 R")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+                            f"/Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(contents)} >>".encode()
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(pdf)
+        pdf += b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n"
+    xref = len(pdf)
+    size = max(objects) + 1
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    pdf += b"".join(b"%010d 00000 n \n" % offsets[object_id] for object_id in range(1, size))
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref)
+    with open(path, "wb") as f:
+        f.write(pdf)
+
+
+def write_statements(root, accounts=("COMPTE COURANT", "LIVRET"), statements=4, pages=3, rows_per_page=40, seed=0):
+    """Dossier racine avec un sous-dossier de relevés (..._ddmmyyyy.pdf) par compte ; renvoie les chemins écrits."""
+    paths = []
+    for a, account in enumerate(accounts):
+        folder = os.path.join(root, account)
+        os.makedirs(folder, exist_ok=True)
+        start = datetime(2024, 1, 1)
+        for s in range(statements):
+            tables, last_day = statement_tables(pages, rows_per_page, seed=seed + 1000 * a + s, start=start)
+            path = os.path.join(folder, f"releve_{last_day.strftime('%d%m%Y')}.pdf")
+            write_statement_pdf(path, tables)
+            paths.append(path)
+            start = last_day
+    return paths
+
+
+def build_ledger(n_operations, seed=0, accounts=("COMPTE COURANT", "LIVRET", "COMPTE ASSO"), repartition_ratio=0.3,
+                 cash_ratio=0.05, years=10):
+    """Données d'un registre synthétique, au format renvoyé par le chargement du stockage."""
+    rnd = random.Random(seed)
+    tiers = [Tiers(f"Tiers {i}", [name]) for i, name in enumerate(TIERS_NAMES)]
+    events = [Event(name, f"#{rnd.randrange(0x1000000):06x}") for name in EVENT_NAMES]
+    start = datetime(2024 - years, 1, 1).toordinal()
+    days = sorted(start + rnd.randrange(365 * years) for _ in range(n_operations))
+
+    operations = []
+    for i, day in enumerate(days):
+        name = rnd.choice(TIERS_NAMES)
+        date = datetime.fromordinal(day)
+        operation = Operation(compte=rnd.choice(accounts), moyen=rnd.choice(("CARTE", "VIR", "CHEQUE", "_")),
+                              nom=f"VIR SEPA {name} {i}", destinataire=name, montant=round(rnd.uniform(-1500, 1500), 2),
+                              date=date, valeur=date + timedelta(days=1), de=name, ref=f"{i:09d}")
+        if rnd.random() < repartition_ratio:
+            # Répartition sur un ou deux tiers, pour le montant total de l'opération
+            first = round(operation.montant * rnd.choice((1, 0.5)), 2)
+            operation.repartition = [[f"Tiers {rnd.randrange(len(tiers))}", first, rnd.choice(EVENT_NAMES)]]
+            if first != operation.montant:
+                operation.repartition.append([f"Tiers {rnd.randrange(len(tiers))}", round(operation.montant - first, 2),
+                                              rnd.choice(EVENT_NAMES)])
+        operations.append(operation)
+
+    cash_operations = [CashOperation(uni_id=i, nom=f"Caisse {i}", destinataire=rnd.choice(TIERS_NAMES),
+                                     montant=round(rnd.uniform(-200, 200), 2),
+                                     date=datetime.fromordinal(start + rnd.randrange(365 * years)),
+                                     repartition=[[f"Tiers {rnd.randrange(len(tiers))}", 0.0, rnd.choice(EVENT_NAMES)]])
+                       for i in range(int(n_operations * cash_ratio))]
+    for operation in cash_operations:
+        operation.repartition[0][1] = operation.montant
+    return {"operations": operations, "cash_operations": cash_operations, "tiers": tiers, "events": events,
+            "config": {"accounts": {}, "root_folder": None}}
+
+
+def write_ledger(folder, data):
+    # Fichiers JSON du stockage historique (les autres stockages les importent au premier lancement)
+    for collection, filename in JsonStorage.FILES.items():
+        content = data[collection] if collection == "config" else [item.to_dict() for item in data[collection]]
+        write_json_atomic(os.path.join(folder, filename), content)
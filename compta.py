@@ -1,233 +1,193 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
-import json
 import os
-import pdfplumber
 from datetime import datetime
-import shutil  # pour copier les fichiers
-import pathlib  # pour gérer les noms de fichiers et de dossiers
+import queue
+import bisect
 
-FACTURES_ROOT_FOLDER = "factures"  # Dossier principal pour stocker les factures par compte
-flag = True
-
-
-# Classe représentant une opération
-class Operation:
-    def __init__(self, compte, moyen, nom, destinataire, montant, date, valeur=None, de=None, motif=None, ref=None, ref_2=None, ref_3=None,
-                 pour=None, date_virement=None, remise=None, chez=None, lib=None, facture=None, repartition=None):
-        self.compte = compte
-        self.moyen = moyen
-        self.nom = nom
-        self.destinataire = destinataire
-        self.montant = montant
-        self.date = date  # Date de l'opération
-        self.valeur = valeur  # Date de valeur
-        self.de = de
-        self.motif = motif
-        self.ref = ref
-        self.ref_2 = ref_2
-        self.ref_3 = ref_3
-        self.pour = pour
-        self.date_virement = date_virement
-        self.remise = remise
-        self.chez = chez
-        self.lib = lib
-        self.facture = facture  # Chemin du fichier facture (s'il y en a un)
-        self.repartition = repartition or []
-
-    def to_dict(self):
-        return {
-            "compte": self.compte,
-            "moyen": self.moyen,
-            "nom": self.nom,
-            "destinataire": self.destinataire,
-            "montant": self.montant,
-            "date": self.date.strftime("%d/%m/%Y"),
-            "valeur": self.valeur.strftime("%d/%m/%Y") if self.valeur else None,
-            "de": self.de,
-            "motif": self.motif,
-            "ref": self.ref,
-            "ref_2": self.ref_2,
-            "ref_3": self.ref_3,
-            "pour": self.pour,
-            "date_virement": self.date_virement,
-            "remise": self.remise,
-            "chez": self.chez,
-            "lib": self.lib,
-            "facture": self.facture,
-            "repartition": self.repartition,
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        return cls(
-            compte=data["compte"],
-            moyen=data["moyen"],
-            nom=data["nom"],
-            destinataire=data["destinataire"],
-            montant=data["montant"],
-            date=datetime.strptime(data["date"], "%d/%m/%Y"),
-            valeur=datetime.strptime(data["valeur"], "%d/%m/%Y") if data["valeur"] else None,
-            de=data.get("de"),
-            motif=data.get("motif"),
-            ref=data.get("ref"),
-            ref_2=data.get("ref_2"),
-            ref_3=data.get("ref_3"),
-            pour=data.get("pour"),
-            date_virement=data.get("date_virement"),
-            remise=data.get("remise"),
-            chez=data.get("chez"),
-            lib=data.get("lib"),
-            facture=data.get("facture"),
-            repartition=data.get("repartition", []),
-        )
-
-    def __repr__(self):
-        return f"Operation({self.nom}, {self.date}, {self.montant})"
-
-
-# Classe représentant une opération de cash
-class CashOperation:
-    def __init__(self, uni_id, nom, destinataire, montant, date, repartition=None):
-        self.uni_id = uni_id
-        self.nom = nom
-        self.destinataire = destinataire
-        self.montant = montant
-        self.date = date  # Date de l'opération
-        self.repartition = repartition or []
-
-    def to_dict(self):
-        return {
-            "uni_id": self.uni_id,
-            "nom": self.nom,
-            "destinataire": self.destinataire,
-            "montant": self.montant,
-            "date": self.date.strftime("%d/%m/%Y"),
-            "repartition": self.repartition,
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        return cls(
-            uni_id=data["uni_id"],
-            nom=data["nom"],
-            destinataire=data["destinataire"],
-            montant=data["montant"],
-            date=datetime.strptime(data["date"], "%d/%m/%Y"),
-            repartition=data.get("repartition", []),
-        )
-
-    def __repr__(self):
-        return f"Operation({self.nom}, {self.date}, {self.montant})"
+from trezoponts import CashOperation, Tiers, Event, Ledger
+from trezoponts.ingestion import TableCache, IngestionJob, extraction_profiles, plan_statements, commit_statements
+from trezoponts.invoices import InvoiceStore, match_invoices, scan_invoice_folder
+from trezoponts.tracing import traced
+from trezoponts.watcher import StatementWatcher
 
+FACTURES_ROOT_FOLDER = "factures"  # Dossier principal des factures (stockées sous leur empreinte)
+flag = True
 
-# Classe représentant un tiers
-class Tiers:
-    def __init__(self, nom_usage, noms_associes):
-        self.nom_usage = nom_usage
-        self.noms_associes = noms_associes  # Liste de noms associés
 
-    def to_dict(self):
-        return {
-            "nom_usage": self.nom_usage,
-            "noms_associes": self.noms_associes,
-        }
+# region WIDGETS
+class VirtualTreeview:
+    """Treeview virtualisé : seules les lignes visibles sont insérées dans Tk.
+
+    Les lignes sont fournies par set_rows(nombre, get_row, row_key) où get_row(i) renvoie (valeurs, tags). Les éléments
+    Tk sont réutilisés d'un affichage à l'autre et seuls ceux dont le contenu change sont mis à jour, ce qui garde le
+    défilement fluide quel que soit le nombre de lignes. Les autres méthodes sont celles du ttk.Treeview sous-jacent.
+    Au défilement, la sélection reste sur les mêmes lignes ; quand set_rows change de lignes, elle suit les mêmes
+    éléments par row_key(i) (identifiant stable : uni_id, ...), et elle est effacée sans row_key.
+    """
+
+    def __init__(self, parent, columns, height=15, **kwargs):
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=height, **kwargs)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.visible_rows = height
+        self.row_count = 0
+        self.get_row = None
+        self.row_key = None
+        self.offset = 0  # Indice de la première ligne à afficher
+        self._first_row = 0  # Indice de la ligne actuellement affichée dans le premier élément
+        self._items = []  # Éléments Tk réutilisés, du haut vers le bas
+        self._rendered = {}  # élément -> (valeurs, tags) actuellement affichés
+        self._keys = {}  # élément -> row_key de la ligne affichée
+        self._configured_tags = set()
+
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Configure>", self._on_configure)
+
+    def __getattr__(self, name):
+        return getattr(self.tree, name)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def tag_configure(self, tag, **options):
+        # Chaque tag n'est configuré qu'une fois
+        if tag not in self._configured_tags:
+            self._configured_tags.add(tag)
+            self.tree.tag_configure(tag, **options)
+
+    def set_rows(self, row_count, get_row, row_key=None):
+        # Les mêmes indices désigneraient d'autres éléments : la sélection est retrouvée par identifiant
+        selected_keys = {self._keys[item] for item in self.tree.selection() if item in self._keys} if row_key else set()
+        focus_key = self._keys.get(self.tree.focus()) if row_key else None
+        self.row_count = row_count
+        self.get_row = get_row
+        self.row_key = row_key
+        self._render(selected_keys, focus_key)
+
+    def index(self, item):
+        # Indice de la ligne (et non de l'élément Tk réutilisé)
+        return self._first_row + self._items.index(item)
+
+    def scroll(self, number, what="units"):
+        step = number * (self.visible_rows if what == "pages" else 1)
+        self.offset += step
+        self._render()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * self.row_count)
+            self._render()
+        elif args[0] == "scroll":
+            self.scroll(int(args[1]), args[2])
+
+    def _on_arrow(self, direction):
+        # Aux bords de la zone affichée, les flèches font défiler la liste
+        focus = self.tree.focus()
+        if focus not in self._items:
+            return None
+        position = self._items.index(focus) + direction
+        if 0 <= position < len(self._items):
+            return None
+        row = self.index(focus) + direction
+        if 0 <= row < self.row_count:
+            self.tree.selection_set([])
+            self.scroll(direction)
+            item = self._items[row - self.offset]
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+        return "break"
+
+    def _on_configure(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visible_rows = max(1, event.height // row_height - 1)  # Une ligne pour les en-têtes
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._render()
+
+    def _render(self, selected_keys=None, focus_key=None):
+        # Sans selected_keys (défilement), la sélection est conservée sur les mêmes lignes
+        self.offset = max(0, min(self.offset, self.row_count - self.visible_rows))
+        end = min(self.offset + self.visible_rows, self.row_count)
+
+        selected_rows = {self.index(item) for item in self.tree.selection() if item in self._items}
+        focus = self.tree.focus()
+        focus_row = self.index(focus) if focus in self._items else None
+
+        while len(self._items) < end - self.offset:
+            self._items.append(self.tree.insert("", "end"))
+        while len(self._items) > end - self.offset:
+            item = self._items.pop()
+            self._rendered.pop(item, None)
+            self._keys.pop(item, None)
+            self.tree.delete(item)
+
+        for item, row in zip(self._items, range(self.offset, end)):
+            values, tags = self.get_row(row)
+            if self._rendered.get(item) != (values, tags):
+                self.tree.item(item, values=values, tags=tags)
+                self._rendered[item] = (values, tags)
+            if self.row_key is not None:
+                self._keys[item] = self.row_key(row)
+            else:
+                self._keys.pop(item, None)
 
+        self._first_row = self.offset
+        if selected_keys is not None:
+            self.tree.selection_set([item for item in self._items if self._keys.get(item) in selected_keys])
+            focus_items = [item for item in self._items if focus_key is not None and self._keys.get(item) == focus_key]
+            self.tree.focus(focus_items[0] if focus_items else "")  # "" : aucun élément
+        else:
+            visible = range(self.offset, end)
+            self.tree.selection_set([self._items[row - self.offset] for row in selected_rows if row in visible])
+            if focus_row in visible:
+                self.tree.focus(self._items[focus_row - self.offset])
+        if self.row_count:
+            self.scrollbar.set(self.offset / self.row_count, end / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
 
-class Event:
-    def __init__(self, nom, couleur):
-        self.nom = nom
-        self.couleur = couleur
 
-    def to_dict(self):
-        return {
-            "nom": self.nom,
-            "couleur": self.couleur,
-        }
+# endregion
 
 
-class ComptaApp:
-    def __init__(self, root):
+class ComptaApp(Ledger):
+    def __init__(self, root, storage=None):
         self.root = root
         self.root.title("Logiciel de Comptabilité")
-        self.operations = []
-        self.all_operations = []  # Liste pour stocker toutes les opérations des RDC (non filtrées)
-        self.cash_operations = []  # Liste pour stocker toutes les opérations de Cash
-        self.tiers = []
-        self.events = []
-        self.config = {"accounts": {}, "root_folder": None}
-        self.page_num_operations = 0
+        self.operations = []  # Opérations affichées
+        self.page_num_operations = None  # Indice du mois affiché (None : le plus récent)
+        self.operations_account = None  # Compte affiché (None : tous les comptes)
         self.page_num_cash_operations = 0
         self.page_num_tiers = 0
         self.page_num_events = 0
+        self.ingestion_job = None  # Analyse des relevés en cours
+        self.watcher = None  # Surveillance des dossiers de relevés
+        self.watched_jobs = []  # Relevés signalés par la surveillance, en attente d'analyse
+        self.watch_job = None  # Analyse en cours lancée par la surveillance
+        self.watch_after_id = None  # Prochain passage de poll_watcher
+        self.invoice_store = InvoiceStore(FACTURES_ROOT_FOLDER)  # Copie des factures dans un thread
+        self.invoice_after_id = None  # Prochain passage de poll_invoices
 
-        # Chargement des données à partir des fichiers JSON
-        self.load_data()
+        # Chargement des données à partir du stockage
+        super().__init__(storage)
 
         # Menu principal
         self.main_menu()
 
-    def load_data(self):
-        # Chargement des opérations
-        try:
-            with open("operations.json", "r") as f:
-                operations_data = json.load(f)
-                self.all_operations = [Operation.from_dict(op) for op in operations_data]
-                self.operations = self.all_operations  # Par défaut, afficher toutes les opérations
-        except FileNotFoundError:
-            self.operations = []
-
-        # Chargement des opérations de Cash
-        try:
-            with open("cash_operations.json", "r") as f:
-                cash_operations_data = json.load(f)
-                self.cash_operations = [CashOperation.from_dict(op) for op in cash_operations_data]
-        except FileNotFoundError:
-            self.cash_operations = []
-
-        # Chargement des tiers
-        try:
-            with open("tiers.json", "r") as f:
-                tiers_data = json.load(f)
-                self.tiers = [Tiers(**tier) for tier in tiers_data]
-        except FileNotFoundError:
-            self.tiers = []
-
-        # Chargement des événements
-        try:
-            with open("events.json", "r") as f:
-                events_data = json.load(f)
-                self.events = [Event(**event) for event in events_data]
-        except FileNotFoundError:
-            self.events = []
+        if self.config.get("watch_statements") and self.config["root_folder"]:
+            self.start_watcher()
 
-        # Chargement de la configuration (chemin des dossiers de relevés et relevés analysés)
-        try:
-            with open("config.json", "r") as f:
-                self.config = json.load(f)
-        except FileNotFoundError:
-            self.config = {"accounts": {}, "root_folder": None}
-
-    def save_data(self):
-        # Sauvegarde des opérations
-        with open("operations.json", "w") as f:
-            json.dump([op.to_dict() for op in self.all_operations], f)
-
-        # Sauvegarde des opérations de cash
-        with open("cash_operations.json", "w") as f:
-            json.dump([c_op.to_dict() for c_op in self.cash_operations], f)
-
-        # Sauvegarde des tiers
-        with open("tiers.json", "w") as f:
-            json.dump([tier.to_dict() for tier in self.tiers], f)
-
-        # Sauvegarde des événements
-        with open("events.json", "w") as f:
-            json.dump([event.to_dict() for event in self.events], f)
-
-        # Sauvegarde de la configuration
-        with open("config.json", "w") as f:
-            json.dump(self.config, f)
+    def load_data(self):
+        super().load_data()
+        self.operations = self.all_operations  # Par défaut, afficher toutes les opérations
 
     def main_menu(self):
         # Réinitialisation de la fenêtre
@@ -247,13 +207,6 @@ class ComptaApp:
         btn_events = tk.Button(self.root, text="$", command=self.open_cash_operations_window)
         if flag: btn_events.pack(pady=10)
 
-    def get_tiers_nom_usage(self, destinataire):
-        """Renvoie le nom d'usage du tiers si le destinataire correspond à un tiers connu."""
-        for tier in self.tiers:
-            if destinataire in tier.noms_associes:
-                return tier.nom_usage
-        return destinataire  # Retourne le destinataire original si aucun tiers correspondant n'est trouvé.
-
     # region OPERATIONS
     def open_operations(self):
         if not self.config["root_folder"]:
@@ -263,7 +216,7 @@ class ComptaApp:
             if not self.config["root_folder"]:
                 messagebox.showerror("Erreur", "Aucun dossier racine sélectionné.")
                 return
-            self.save_data()
+            self.save_data(config=True)
 
         # Fenêtre de consultation des opérations
         operations_window = tk.Toplevel(self.root)
@@ -293,6 +246,12 @@ class ComptaApp:
         btn_add_invoice = tk.Button(comptes_frame, text="Ajouter une facture", command=self.attach_invoice)
         btn_add_invoice.pack(pady=5)
 
+        # Bouton pour lier en une fois les factures d'un dossier (rapprochées par montant et date)
+        btn_add_invoice_folder = tk.Button(comptes_frame, text="Factures d'un dossier", command=self.attach_invoice_folder)
+        btn_add_invoice_folder.pack(pady=5)
+        self.invoice_status = tk.Label(comptes_frame, text="")
+        self.invoice_status.pack()
+
         # Bouton pour ouvrir la facture liée
         btn_open_invoice = tk.Button(comptes_frame, text="Voir la facture", command=self.open_invoice)
         btn_open_invoice.pack(pady=5)
@@ -301,14 +260,20 @@ class ComptaApp:
         btn_open_repartition = tk.Button(comptes_frame, text="Répartiton", command=self.open_repartition_window)
         btn_open_repartition.pack(pady=5)
 
+        # Analyse automatique des nouveaux relevés déposés dans les dossiers des comptes
+        self.watch_var = tk.BooleanVar(value=self.watcher is not None)
+        tk.Checkbutton(comptes_frame, text="Surveiller les dossiers", variable=self.watch_var,
+                       command=self.toggle_watcher).pack(pady=5)
+        self.watch_status = tk.Label(comptes_frame, text="", wraplength=200, justify="left")
+        self.watch_status.pack()
+
         # Frame pour la liste des opérations
         operations_frame = tk.Frame(operations_window)
         operations_frame.pack(side="left", fill="both", expand=True)
 
         # Mise à jour des colonnes pour inclure la Date
-        self.operations_tree = ttk.Treeview(operations_frame, columns=("ID", "Date", "MOY", "Nom", "Destinataire", "Montant", "Facture"),
-                                            show="headings",
-                                            height=15)
+        self.operations_tree = VirtualTreeview(operations_frame, columns=("ID", "Date", "MOY", "Nom", "Destinataire", "Montant", "Facture"),
+                                               height=15)
         self.operations_tree.pack(fill="both", expand=True)
 
         # Configuration des colonnes
@@ -322,6 +287,7 @@ class ComptaApp:
         self.operations_tree.heading("Destinataire", text="Destinataire")
         self.operations_tree.heading("Montant", text="Montant")
         self.operations_tree.heading("Facture", text="Facture")
+        self.operations_tree.tag_configure("rep", background="salmon1")
         self.operations_tree.bind("<Double-1>", self.on_operation_double_click)
 
         pagination_frame = tk.Frame(operations_frame)
@@ -329,7 +295,7 @@ class ComptaApp:
 
         btn_prev = tk.Button(pagination_frame, text="Précédent", command=self.previous_page_operations)
         btn_prev.grid(row=0, column=0)
-        self.month_page = tk.Label(pagination_frame, text=(self.page_num_operations + 1) % 12 + 1)
+        self.month_page = tk.Label(pagination_frame)
         self.month_page.grid(row=0, column=1)
         btn_next = tk.Button(pagination_frame, text="Suivant", command=self.next_page_operations)
         btn_next.grid(row=0, column=2)
@@ -340,77 +306,259 @@ class ComptaApp:
     def update_operations_view(self):
         # Récupérer le compte sélectionné
         selected_account = self.selected_account.get()
-        # Filtrer les opérations pour ce compte, mais sans modifier self.all_operations
-        self.operations = [op for op in self.all_operations if op.compte == selected_account]  # Filtrage uniquement pour l'affichage
+        # Rester sur le même mois (ou le plus proche) pour le nouveau compte
+        months = self.operations_index.months(self.operations_account)
+        if self.page_num_operations is not None and months:
+            current_month = months[min(self.page_num_operations, len(months) - 1)]
+            self.page_num_operations = bisect.bisect_left(self.operations_index.months(selected_account), current_month)
+        self.operations_account = selected_account
         # Réinitialiser l'affichage des opérations
         self.load_operations_page()
 
     def select_releve_folder(self):
         # Sélectionner le dossier principal contenant tous les sous-dossiers de comptes
-        main_folder_path = self.config["root_folder"]
-        if main_folder_path:
-            # Parcourt les sous-dossiers du dossier principal et les lie à leurs comptes respectifs
-            for account_name in os.listdir(main_folder_path):
-                # noinspection PyTypeChecker
-                account_path = os.path.join(main_folder_path, account_name)
-
-                # Vérifier que chaque élément est bien un sous-dossier
-                if os.path.isdir(account_path):
-                    self.config["accounts"].setdefault(account_name, {"folder": account_path, "analyzed_files": []})
-
-            # Sauvegarder la configuration mise à jour
-            self.save_data()
+        if self.config["root_folder"]:
+            # Lie les sous-dossiers du dossier principal à leurs comptes respectifs et sauvegarde la configuration
+            self.discover_accounts()
+            if self.watcher is not None:
+                # Surveillance des éventuels nouveaux comptes
+                self.stop_watcher()
+                self.start_watcher()
 
             # Analyser les relevés pour chaque compte
             self.check_new_releves()
 
     def check_new_releves(self):
-        new_operations_count = 0
+        if self.ingestion_job is not None and self.ingestion_job.is_running():
+            return
+
+        # Analyse des relevés de tous les comptes en une seule passe, répartie sur tous les cœurs, hors du thread de l'interface
+        try:
+            profiles = extraction_profiles(self.config)
+        except ValueError as e:
+            messagebox.showerror("Profil d'extraction", str(e))
+            return
+        ignored = []
+        job = IngestionJob(plan_statements(self.account_folders(), self.config, ignored), cache=TableCache(),
+                           profiles=profiles, ignored=ignored)
+        if not job.jobs:
+            messagebox.showinfo("Aucun nouveau relevé", "Aucun nouveau relevé à analyser dans les dossiers des comptes.")
+            self.show_ignored_statements(ignored)
+            return
+        self.ingestion_job = job
+
+        # Fenêtre de progression
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Analyse des relevés")
+        status = tk.Label(progress_window, text=f"0 / {len(job.jobs)} relevés", width=60)
+        status.pack(padx=10, pady=5)
+        progress_bar = ttk.Progressbar(progress_window, maximum=len(job.jobs), length=400)
+        progress_bar.pack(padx=10, pady=5)
+        detail = tk.Label(progress_window, text="")
+        detail.pack(padx=10, pady=5)
+        tk.Button(progress_window, text="Annuler", command=job.cancel).pack(pady=5)
+        progress_window.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        done_files = 0
+        operations_found = 0
+
+        def poll():
+            nonlocal done_files, operations_found
+            while True:
+                try:
+                    message = job.events.get_nowait()
+                except queue.Empty:
+                    break
 
-        for account, account_info in self.config["accounts"].items():
-            folder_path = account_info.get("folder")
-            if folder_path:
-                # Appel à la fonction d'analyse pour chaque sous-dossier correspondant à un compte
-                new_operations = analyze_account_statements(account, folder_path)
+                if message[0] == "page":
+                    _, account, pdf_filename, page_number = message
+                    detail.config(text=f"{account} — {pdf_filename} — page {page_number}")
+                elif message[0] == "file":
+                    done_files += 1
+                    operations_found += message[3]
+                    progress_bar["value"] = done_files
+                    status.config(text=f"{done_files} / {len(job.jobs)} relevés — {operations_found} opérations trouvées")
+                else:
+                    progress_window.destroy()
+                    self.ingestion_job = None
+                    self.on_ingestion_finished(job, message)
+                    return
+            self.root.after(100, poll)
+
+        job.start()
+        self.root.after(100, poll)
+
+    def on_ingestion_finished(self, job, message):
+        if message[0] == "cancelled":
+            messagebox.showinfo("Analyse annulée", "L'analyse des relevés a été annulée, aucune opération n'a été ajoutée.")
+            return
+        if message[0] == "error":
+            messagebox.showerror("Erreur", f"L'analyse des relevés a échoué : {message[1]}")
+            return
 
-                # Incrément du compteur d'opérations nouvellement ajoutées
-                new_operations_count += len(new_operations)
+        # Validation en une fois des résultats, dans le thread de l'interface
+        _, results, stats = message
+        new_operations = commit_statements(self, job.jobs, results, stats)
+        new_operations_count = len(new_operations)
 
         # Affichage du résultat à l'utilisateur
         if new_operations_count > 0:
-            messagebox.showinfo("Nouveaux relevés détectés", f"{new_operations_count} opérations ajoutées depuis les nouveaux relevés.")
+            messagebox.showinfo("Nouveaux relevés détectés", f"{new_operations_count} opérations ajoutées depuis les nouveaux relevés.\n"
+                                                             f"{stats}")
         else:
-            messagebox.showinfo("Aucun nouveau relevé", "Aucun nouveau relevé à analyser dans les dossiers des comptes.")
+            messagebox.showinfo("Aucune opération ajoutée", f"Aucune nouvelle opération dans les relevés analysés.\n{stats}")
+        self.show_statement_warnings(stats)
 
         # Actualisation de l'affichage des opérations
         self.load_operations_page()
 
+    def show_statement_warnings(self, stats):
+        # Relevés en échec, incohérents ou ignorés d'une analyse (manuelle ou automatique)
+        if stats.failed:
+            messagebox.showwarning("Relevés illisibles", "L'analyse de ces relevés a échoué, ils seront de nouveau "
+                                                         "proposés à la prochaine analyse (par la surveillance, une "
+                                                         "fois modifiés) :\n" +
+                                   "\n".join(f"{account} / {pdf_filename} : {error}" for account, pdf_filename, error in stats.failed))
+        if stats.unreconciled:
+            messagebox.showwarning("Relevés incohérents", "Les opérations de ces relevés ne mènent pas du solde d'ouverture "
+                                                          "au solde de clôture :\n" +
+                                   "\n".join(f"{account} / {pdf_filename} : écart de {gap} €"
+                                             for account, pdf_filename, gap in stats.unreconciled))
+        self.show_ignored_statements(stats.ignored)
+
+    def show_ignored_statements(self, ignored):
+        if ignored:
+            messagebox.showwarning("Fichiers ignorés", "Ces PDF ne sont pas nommés ..._jjmmaaaa.pdf et n'ont pas été "
+                                                       "analysés :\n" +
+                                   "\n".join(f"{account} / {pdf_filename}" for account, pdf_filename in ignored))
+
+    def toggle_watcher(self):
+        self.config["watch_statements"] = self.watch_var.get()
+        self.save_data(config=True)
+        if self.watch_var.get():
+            self.start_watcher()
+        else:
+            self.stop_watcher()
+
+    def start_watcher(self):
+        if self.watcher is None:
+            self.watcher = StatementWatcher.for_ledger(self)
+            self.watcher.start()
+            self.watch_after_id = self.root.after(1000, self.poll_watcher)
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.watched_jobs = []
+            self.root.after_cancel(self.watch_after_id)
+        if self.watch_job is not None:
+            # Les résultats d'une analyse automatique en cours sont abandonnés
+            self.watch_job.cancel()
+            self.ingestion_job = self.watch_job = None
+
+    def poll_watcher(self):
+        # Analyse en arrière-plan, sans fenêtre, des relevés signalés par la surveillance
+        while True:
+            try:
+                self.watched_jobs += self.watcher.ready.get_nowait()
+            except queue.Empty:
+                break
+
+        job = self.watch_job
+        if job is not None:
+            while True:
+                try:
+                    message = job.events.get_nowait()
+                except queue.Empty:
+                    break
+                if message[0] in ("page", "file"):
+                    continue
+                self.ingestion_job = self.watch_job = None
+                if message[0] == "done":
+                    new_operations = commit_statements(self, job.jobs, message[1], message[2])
+                    # Les relevés en échec ne sont plus signalés tant qu'ils ne sont pas modifiés
+                    self.watcher.failed([statement for statement, result in zip(job.jobs, message[1]) if result is None])
+                    self.set_watch_status(f"{len(new_operations)} opérations ajoutées depuis {message[2].pdfs} relevés")
+                    if getattr(self, "operations_tree", None) is not None and self.operations_tree.winfo_exists():
+                        self.load_operations_page()
+                    self.show_statement_warnings(message[2])
+                elif message[0] == "cancelled":
+                    # Les relevés seront signalés de nouveau
+                    self.set_watch_status("Analyse interrompue")
+                    self.watcher.forget(job.jobs)
+                else:
+                    # Échec de tout le lot : relevés laissés de côté jusqu'à leur modification ou au prochain démarrage
+                    # de la surveillance (les signaler de nouveau relancerait aussitôt la même erreur)
+                    self.set_watch_status("Analyse en échec")
+                    self.watcher.failed(job.jobs)
+                    messagebox.showerror("Erreur", f"L'analyse automatique des relevés a échoué : {message[1]}")
+                break
+        elif self.ingestion_job is None and self.watched_jobs:
+            # Les relevés déjà analysés entre-temps (bouton "Analyser les comptes") sont écartés
+            jobs = [(account, pdf_filename, path) for account, pdf_filename, path in self.watched_jobs
+                    if pdf_filename not in self.config["accounts"][account].get("analyzed_files", [])]
+            self.watched_jobs = []
+            if jobs:
+                try:
+                    profiles = extraction_profiles(self.config)
+                except ValueError as e:
+                    # Relevés laissés de côté jusqu'au prochain démarrage de la surveillance
+                    self.set_watch_status("Analyse impossible")
+                    messagebox.showerror("Profil d'extraction", str(e))
+                else:
+                    self.ingestion_job = self.watch_job = IngestionJob(jobs, cache=TableCache(), profiles=profiles)
+                    self.watch_job.start()
+                    self.set_watch_status(f"Analyse de {len(jobs)} nouveaux relevés…")
+
+        self.watch_after_id = self.root.after(1000, self.poll_watcher)
+
+    @traced()
     def load_operations_page(self):
-        self.operations_tree.delete(*self.operations_tree.get_children())
-        self.month_page.config(text=(self.page_num_operations + 1) % 12 + 1)
-        for i, op in enumerate(self.operations):
-            # Afficher uniquement les opérations correspondant au mois de la page (la première page correspond à février)
-            if op.date.month == (self.page_num_operations + 1) % 12 + 1:
-                # Récupérer le nom d'usage du tiers si possible
-                destinataire_affiche = self.get_tiers_nom_usage(op.destinataire)
-                self.operations_tree.insert("", "end", values=(
-                    i, op.date.strftime("%d/%m/%Y"), op.moyen, op.nom, destinataire_affiche, op.montant, op.facture),
-                                            tags="rep" if len(op.repartition) > 0 else "")
-        self.operations_tree.tag_configure("rep", background="salmon1")
+        months = self.operations_index.months(self.operations_account)
+        if not months:
+            self.operations = []
+            self.month_page.config(text="-")
+            self.operations_tree.set_rows(0, None)
+            return
+        if self.page_num_operations is None or self.page_num_operations >= len(months):
+            self.page_num_operations = len(months) - 1
+        year, month = months[self.page_num_operations]
+        self.month_page.config(text=f"{month:02d}/{year}")
+
+        # Seules les opérations du mois affiché sont parcourues, et seules les lignes visibles sont construites
+        operations = self.operations = self.operations_index.operations(self.operations_account, year, month)
+
+        def operation_row(i):
+            op = operations[i]
+            # Récupérer le nom d'usage du tiers si possible
+            destinataire_affiche = self.get_tiers_nom_usage(op.destinataire)
+            return ((op.uni_id, op.date.strftime("%d/%m/%Y"), op.moyen, op.nom, destinataire_affiche, op.montant, op.facture),
+                    ("rep",) if len(op.repartition) > 0 else ())
+
+        self.operations_tree.set_rows(len(operations), operation_row, lambda i: operations[i].uni_id)
 
     def previous_page_operations(self):
-        if self.page_num_operations > 0:
+        if self.page_num_operations:
             self.page_num_operations -= 1
             self.load_operations_page()
 
     def next_page_operations(self):
-        if self.page_num_operations < 11:
+        if self.page_num_operations is not None and self.page_num_operations < len(self.operations_index.months(self.operations_account)) - 1:
             self.page_num_operations += 1
             self.load_operations_page()
 
+    def selected_operation(self):
+        # Opération de la ligne sélectionnée, retrouvée par son identifiant (colonne "#")
+        item_id = self.operations_tree.focus()
+        if not item_id:
+            return None
+        return self.operations_by_id.get(int(self.operations_tree.item(item_id, "values")[0]))
+
     def on_operation_double_click(self, event):
-        item_id = int(self.operations_tree.item(self.operations_tree.focus())['values'][0])
-        operation = self.operations[item_id]
+        operation = self.selected_operation()
+        if operation is None:
+            return
         details = (
             f"Date: {operation.date}\n"
             f"Valeur: {operation.valeur}\n"
@@ -431,43 +579,78 @@ class ComptaApp:
 
     def attach_invoice(self):
         # Récupération de l'élément sélectionné
-        item_id = self.operations_tree.focus()
-        if item_id:
-            operation_values = self.operations_tree.item(item_id, "values")
-            operation_index = int(operation_values[0])
-            operation = self.operations[operation_index]
-
+        operation = self.selected_operation()
+        if operation is not None:
             # Sélectionner le fichier de facture
             filepath = filedialog.askopenfilename(filetypes=[("All Files", "*.*")])
             if filepath:
-                # Assurez-vous que le dossier principal pour les factures existe
-                facture_root = pathlib.Path(FACTURES_ROOT_FOLDER)
-                facture_root.mkdir(exist_ok=True)
-
-                # Créez un sous-dossier pour le compte de l'opération
-                compte_folder = facture_root / operation.compte
-                compte_folder.mkdir(exist_ok=True)
-
-                # Formatage du nom de fichier de la facture copiée
-                date_str = operation.date.strftime("%m_%d_%Y")
-                nom_operation = operation.nom.replace(" ", "_").replace("/", "_")  # Retire les espaces et / dans le nom
-                montant_operation = str(operation.montant).replace(".", "")
-                filename = f"{date_str}_{operation.compte}_{nom_operation}_{montant_operation}{pathlib.Path(filepath).suffix}"
-
-                # Chemin cible dans le dossier des factures
-                dest_path = compte_folder / filename
-                shutil.copy(filepath, dest_path)
-
-                # Mise à jour du chemin de la facture dans l'opération et sauvegarde
-                operation.facture = str(dest_path)
+                # Copie (et empreinte) dans le thread des factures : l'opération est mise à jour à la fin de la copie
+                self.invoice_store.submit(filepath, operation)
+                self.poll_invoices()
+
+    def attach_invoice_folder(self):
+        folder = filedialog.askdirectory(title="Sélectionner le dossier des factures")
+        if not folder:
+            return
+        invoices, unrecognized = scan_invoice_folder(folder)
+        matches, unmatched = match_invoices(invoices, self.operations_index)
+        if not matches:
+            messagebox.showinfo("Factures d'un dossier", f"Aucune facture rapprochée d'une opération "
+                                                         f"({len(unrecognized)} sans montant ou date dans le nom).")
+            return
+        if not messagebox.askyesno("Factures d'un dossier",
+                                   f"{len(matches)} factures rapprochées d'une opération (même montant, date proche), "
+                                   f"{len(unmatched)} sans opération correspondante, {len(unrecognized)} sans montant "
+                                   f"ou date dans le nom.\n\nLier les factures rapprochées ?"):
+            return
+        for path, operation in matches:
+            self.invoice_store.submit(path, operation)
+        self.poll_invoices()
+
+    def set_watch_status(self, text):
+        # Résultat de la dernière analyse automatique, sous la case de la surveillance (si la fenêtre est ouverte)
+        if getattr(self, "watch_status", None) is not None and self.watch_status.winfo_exists():
+            self.watch_status.config(text=f"{datetime.now():%H:%M} — {text}")
+
+    def poll_invoices(self):
+        # Lit la progression des copies ; les opérations dont la facture est copiée sont sauvegardées ensemble
+        if self.invoice_after_id is not None:
+            self.root.after_cancel(self.invoice_after_id)
+            self.invoice_after_id = None
+        updated = []
+        status = None
+        while True:
+            try:
+                message = self.invoice_store.events.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                _, _, copied, total = message
+                status = f"Copie des factures : {copied * 100 // max(total, 1)} % ({self.invoice_store.pending} en attente)"
+            elif message[0] == "done":
+                message[1].facture = message[2]
+                updated.append(message[1])
+            else:
+                messagebox.showerror("Facture", f"Copie de la facture impossible : {message[2]}")
+
+        if updated:
+            self.save_data(updated=updated)
+            if getattr(self, "operations_tree", None) is not None and self.operations_tree.winfo_exists():
                 self.load_operations_page()  # Rafraîchir l'affichage
-                self.save_data()
+        if getattr(self, "invoice_status", None) is not None and self.invoice_status.winfo_exists():
+            if status is not None:
+                self.invoice_status.config(text=status)
+            elif not self.invoice_store.pending:
+                self.invoice_status.config(text="")
+        if self.invoice_store.pending or not self.invoice_store.events.empty():
+            self.invoice_after_id = self.root.after(100, self.poll_invoices)
 
     def open_invoice(self):
-        item_id = self.operations_tree.focus()
-        operation_values = self.operations_tree.item(item_id, "values")
-        if self.operations[int(operation_values[0])].facture:
-            os.startfile(self.operations[int(operation_values[0])].facture)
+        operation = self.selected_operation()
+        if operation is None:
+            return
+        if operation.facture:
+            os.startfile(operation.facture)
         else:
             messagebox.showwarning("Facture manquante", "Aucune facture n'est liée à cette opération")
 
@@ -495,12 +678,15 @@ class ComptaApp:
                 messagebox.showerror("Erreur", "Veuillez entrer un format de date valide (ddmmyyyy).")
                 return
 
-            self.cash_operations.append(CashOperation(int(datetime.now().timestamp()), motif, destinataire, montant, date))
+            c_op = CashOperation(None, motif, destinataire, montant, date)
+            self.cash_operations.add(c_op)  # Attribue son identifiant
+            self.cash_book.add(c_op)
+            self.event_aggregator.update(c_op)
             self.nom_var.delete(0, tk.END)
             self.montant_var.delete(0, tk.END)
             self.destinataire_var.delete(0, tk.END)
             self.selected_desti.set("Autre")
-            self.save_data()
+            self.save_data(added=[c_op])
             self.load_cash_operations_page()
 
         def delete_cash_operation():
@@ -510,15 +696,16 @@ class ComptaApp:
                 messagebox.showwarning("Aucune sélection", "Veuillez sélectionner un élément à supprimer.")
                 return
 
-            # Récupère l'index de l'élément dans la liste et le supprime
-            cash_operation_tag = self.cash_operations_tree.item(selected_item[0], "tags")[0]
-            for c_op in self.cash_operations:
-                if c_op.uni_id == int(cash_operation_tag):
-                    self.cash_operations.remove(c_op)
-                    break
+            # Retrouve l'opération par son identifiant (tag de la ligne) et la supprime
+            c_op = self.cash_book.remove(int(self.cash_operations_tree.item(selected_item[0], "tags")[0]))
+            deleted = []
+            if c_op is not None:
+                self.cash_operations.remove(c_op)
+                self.event_aggregator.remove(c_op)
+                deleted.append(c_op)
 
             # Actualise la liste affichée
-            self.save_data()
+            self.save_data(deleted=deleted)
             self.load_cash_operations_page()
 
         # Fenêtre de consultation des opérations de cash
@@ -580,9 +767,8 @@ class ComptaApp:
         cash_operations_frame.pack(side="left", fill="both", expand=True)
 
         # Treeview pour présenter les opérations
-        self.cash_operations_tree = ttk.Treeview(cash_operations_frame, columns=("ID", "Date", "Nom", "Destinataire", "Montant"),
-                                                 show="headings",
-                                                 height=15)
+        self.cash_operations_tree = VirtualTreeview(cash_operations_frame, columns=("ID", "Date", "Nom", "Destinataire", "Montant", "Solde"),
+                                                    height=15)
         self.cash_operations_tree.pack(fill="both", expand=True)
 
         # Configuration des colonnes
@@ -593,6 +779,7 @@ class ComptaApp:
         self.cash_operations_tree.heading("Nom", text="Nom")
         self.cash_operations_tree.heading("Destinataire", text="Destinataire")
         self.cash_operations_tree.heading("Montant", text="Montant")
+        self.cash_operations_tree.heading("Solde", text="Solde")
 
         pagination_frame = tk.Frame(cash_operations_frame)
         pagination_frame.pack(pady=5)
@@ -607,14 +794,20 @@ class ComptaApp:
         # Pagination des opérations
         self.load_cash_operations_page()
 
+    @traced()
     def load_cash_operations_page(self):
-        self.cash_operations_tree.delete(*self.cash_operations_tree.get_children())
         self.cash_page.config(text=self.page_num_cash_operations + 1)
-        sorted_operations = sorted(self.cash_operations, key=lambda op: op.date)
+        # Le coffre est déjà trié par date : la page est une tranche, avec le solde après chaque opération
         offset = self.page_num_cash_operations * 30
-        for i, c_op in enumerate(sorted_operations[offset:offset + 30]):
-            self.cash_operations_tree.insert("", "end", values=(
-                i, c_op.date.strftime("%d/%m/%Y"), c_op.nom, c_op.destinataire, c_op.montant), tags=c_op.uni_id)
+        page = self.cash_book[offset:offset + 30]
+        balances = self.cash_book.balances(offset, offset + 30)
+
+        def cash_operation_row(i):
+            c_op = page[i]
+            return ((i, c_op.date.strftime("%d/%m/%Y"), c_op.nom, c_op.destinataire, c_op.montant, balances[i]),
+                    (c_op.uni_id,))
+
+        self.cash_operations_tree.set_rows(len(page), cash_operation_row, lambda i: page[i].uni_id)
 
     def previous_page_cash_operations(self):
         if self.page_num_cash_operations > 0:
@@ -634,10 +827,10 @@ class ComptaApp:
         if not item_id:
             messagebox.showwarning("Aucune opération", "Veuillez sélectionner une opération pour la répartition.")
             return
-        operation_index = int(self.operations_tree.item(item_id, "values")[0]) if not cash else -1
-        c_op_uni_id = int(self.cash_operations_tree.item(item_id, "tags")[0]) if cash else 0  # L'identifiant pour l'opération cash
-        operation = self.operations[operation_index] if not cash else next(
-            (cash_op for cash_op in self.cash_operations if cash_op.uni_id == c_op_uni_id), None)
+        if cash:
+            operation = self.cash_operations.get(int(self.cash_operations_tree.item(item_id, "tags")[0]))
+        else:
+            operation = self.operations_by_id.get(int(self.operations_tree.item(item_id, "values")[0]))
 
         repartition_window = tk.Toplevel(self.root)
         repartition_window.title(f"Répartition pour l'opération : {operation.nom} - {operation.montant}€")
@@ -695,7 +888,7 @@ class ComptaApp:
         tk.Button(tiers_frame, text="Compléter", command=complete_amount).grid(row=1, column=2, padx=10, pady=10, sticky="w")
 
         # Liste pour afficher la répartition actuelle
-        self.repartition_list = operation.repartition
+        self.repartition_list = list(operation.repartition)  # Copie : l'opération n'est modifiée qu'à l'enregistrement
         repartition_tree = ttk.Treeview(repartition_window, columns=("Tiers", "Montant", "Événement"), show="headings")
         repartition_tree.heading("Tiers", text="Tiers")
         repartition_tree.heading("Montant", text="Montant")
@@ -714,7 +907,8 @@ class ComptaApp:
 
         def save_repartition():
             operation.repartition = self.repartition_list
-            self.save_data()
+            self.event_aggregator.update(operation)
+            self.save_data(updated=[operation])
             repartition_window.destroy()
             if not cash: self.update_operations_view()
 
@@ -733,7 +927,7 @@ class ComptaApp:
         tiers_frame = tk.Frame(tiers_window)
         tiers_frame.pack(fill="both", expand=True)
 
-        self.tiers_tree = ttk.Treeview(tiers_frame, columns=("Nom d'usage", "Noms associés"), show="headings", height=15)
+        self.tiers_tree = VirtualTreeview(tiers_frame, columns=("Nom d'usage", "Noms associés"), height=15)
         self.tiers_tree.pack(fill="both", expand=True)
 
         # Configuration des colonnes
@@ -766,12 +960,16 @@ class ComptaApp:
         btn_add_tiers = tk.Button(add_tiers_frame, text="Ajouter le tiers", command=self.add_tiers)
         btn_add_tiers.grid(row=2, columnspan=2, pady=5)
 
+    @traced()
     def load_tiers_page(self):
-        self.tiers_tree.delete(*self.tiers_tree.get_children())
         offset = self.page_num_tiers * 30
-        for tiers in self.tiers[offset:offset + 30]:
-            noms_associes_str = ", ".join(tiers.noms_associes)
-            self.tiers_tree.insert("", "end", values=(tiers.nom_usage, noms_associes_str))
+        page = self.tiers[offset:offset + 30]
+
+        def tiers_row(i):
+            noms_associes_str = ", ".join(page[i].noms_associes)
+            return (page[i].nom_usage, noms_associes_str), ()
+
+        self.tiers_tree.set_rows(len(page), tiers_row, lambda i: page[i].nom_usage)
 
     def previous_page_tiers(self):
         if self.page_num_tiers > 0:
@@ -785,10 +983,12 @@ class ComptaApp:
 
     def add_tiers(self):
         nom_usage = self.nom_usage_var.get()
-        noms_associes = self.noms_associes_var.get().split(",")
-        self.tiers.append(Tiers(nom_usage, noms_associes))
+        noms_associes = [nom.strip() for nom in self.noms_associes_var.get().split(",") if nom.strip()]
+        tier = Tiers(nom_usage, noms_associes)
+        self.tiers.append(tier)
+        self.tiers_resolver.add(tier)
         self.load_tiers_page()
-        self.save_data()
+        self.save_data(added=[tier])
         self.nom_usage_var.delete(0, tk.END)
         self.noms_associes_var.delete(0, tk.END)
 
@@ -803,7 +1003,7 @@ class ComptaApp:
         events_frame = tk.Frame(event_window)
         events_frame.pack(fill="both", expand=True)
 
-        self.events_tree = ttk.Treeview(events_frame, columns=("Nom", "Couleur"), show="headings", height=15)
+        self.events_tree = VirtualTreeview(events_frame, columns=("Nom", "Couleur"), height=15)
         self.events_tree.pack(fill="both", expand=True)
         self.events_tree.bind("<Double-1>", self.on_event_double_click)
 
@@ -859,12 +1059,17 @@ class ComptaApp:
         self.date_events_var = tk.Entry(add_event_frame)
         self.date_events_var.grid(row=3, column=1)
 
+    @traced()
     def load_events_page(self):
-        self.events_tree.delete(*self.events_tree.get_children())
         offset = self.page_num_events * 30
-        for event in self.events[offset:offset + 30]:
-            self.events_tree.insert("", "end", values=(event.nom, event.couleur), tags=event.couleur)
-            self.events_tree.tag_configure(event.couleur, background=event.couleur)
+        page = self.events[offset:offset + 30]
+
+        def event_row(i):
+            event = page[i]
+            self.events_tree.tag_configure(event.couleur, background=event.couleur)  # Une seule fois par couleur
+            return (event.nom, event.couleur), (event.couleur,)
+
+        self.events_tree.set_rows(len(page), event_row, lambda i: page[i].nom)
 
     def previous_page_events(self):
         if self.page_num_events > 0:
@@ -882,9 +1087,10 @@ class ComptaApp:
             messagebox.showwarning("Nom manquant", "Veuillez entrer un nom pour l'événement.")
             return
         # Ajoute l'événement à la liste des événements
-        self.events.append(Event(event_name, self.event_color.get()))
+        event = Event(event_name, self.event_color.get())
+        self.events.append(event)
         self.nom_var.delete(0, tk.END)
-        self.save_data()
+        self.save_data(added=[event])
         self.load_events_page()
 
     def delete_event(self):
@@ -895,13 +1101,14 @@ class ComptaApp:
             return
 
         # Récupère l'index de l'élément dans la liste et le supprime
-        item_index = self.events_tree.index(selected_item[0])  # L'index de l'élément dans le tree
-        del self.events[item_index]  # Supprime l'event correspondant dans la liste
+        item_index = self.page_num_events * 30 + self.events_tree.index(selected_item[0])  # L'index de l'élément dans la liste
+        event = self.events.pop(item_index)  # Supprime l'event correspondant dans la liste
 
         # Actualise la liste affichée
-        self.save_data()
+        self.save_data(deleted=[event])
         self.load_events_page()
 
+    @traced()
     def on_event_double_click(self, event):
         # Récupère l'événement sélectionné par un double-clic dans l'interface
         selected_item = self.events_tree.focus()
@@ -917,28 +1124,8 @@ class ComptaApp:
             messagebox.showerror("Erreur", "Veuillez entrer un format de date valide (ddmmyyyy).")
             return
 
-        # Initialiser le total général et un dictionnaire pour les détails par tiers
-        total_recettes = 0.0
-        total_charges = 0.0
-        tiers_summary = {}
-
-        # Parcourir toutes les opérations pour trouver celles liées à cet événement
-        for operation in self.all_operations + self.cash_operations:
-            if date_events < operation.date:
-                for tier, montant, event in operation.repartition:
-                    if event == event_name:  # Vérifier si la répartition est liée à l'événement sélectionné
-                        # Initialiser les détails du tiers si ce n'est pas déjà fait
-                        if tier not in tiers_summary:
-                            tiers_summary[tier] = {"recettes": 0.0, "charges": 0.0, "total": 0.0}
-
-                        # Mettre à jour les totaux en fonction du signe du montant
-                        tiers_summary[tier]["total"] += montant
-                        if montant > 0:
-                            tiers_summary[tier]["recettes"] += montant
-                            total_recettes += montant
-                        else:
-                            tiers_summary[tier]["charges"] += montant
-                            total_charges += montant
+        # Détails par tiers et totaux généraux, lus dans l'index d'agrégation (sans parcourir les opérations)
+        tiers_summary, total_recettes, total_charges = self.event_aggregator.summary(event_name, date_events)
 
         # Affichage des résultats
         details_window = tk.Toplevel(self.root)
@@ -975,92 +1162,8 @@ class ComptaApp:
     # endregion
 
 
-def extract_text_from_pdf(path):
-    text = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            table = page.extract_table(table_settings={"vertical_strategy": "lines", "horizontal_strategy": "text"})
-            if table is not None:  # Vérifie si une table a été trouvée
-                text += table  # Ajoute la table extraite si elle existe
-            else:
-                print("Pas de tableau trouvé pour: ", path)
-    return text
-
-
-def analyze_account_statements(account, folder_path):
-    account_info = app.config["accounts"].get(account, {})
-    analyzed_files = set(account_info.get("analyzed_files", []))
-    new_operations = []
-
-    # On trie les relevés de compte présents dans le dossier par date afin d'ajouter les opérations dans le bon ordre
-    sorted_pdfs_filenames = [pdf_name for pdf_name in os.listdir(folder_path)]
-    sorted_pdfs_filenames.sort(key=lambda x: datetime.strptime(x.split('.')[0].split('_')[-1], "%d%m%Y"))
-
-    for pdf_filename in sorted_pdfs_filenames:
-        if not pdf_filename.endswith('.pdf') or pdf_filename in analyzed_files:
-            continue
-
-        path = os.path.join(folder_path, pdf_filename)
-        text = extract_text_from_pdf(path)
-        current_operation = None
-
-        for l in text[3: len(text) - 1]:
-            if l[0] != '' and l[0] is not None:
-                if current_operation:
-                    new_operations.append(current_operation)
-                date = datetime.strptime(l[0], "%d/%m/%Y")
-                valeur = datetime.strptime(l[1], "%d/%m/%Y")
-                nom = l[2]
-                moyen = "CARTE" if "CARTE" in nom else "VIR" if "VIR" in nom else "CHEQUE" if "CHEQUE" in nom else "_"
-                debit = None if l[3] == '' else str_to_float(l[3])
-                credit = None if l[4] == '' else str_to_float(l[4])
-                montant = credit if credit is not None else -debit
-
-                current_operation = Operation(compte=account, moyen=moyen,
-                                              nom=nom, destinataire="", montant=montant, date=date, valeur=valeur
-                                              )
-
-            elif l[2] is not None:
-                if l[2].startswith("DE:"):
-                    current_operation.de = l[2].replace("DE:", "", 1).strip()
-                    current_operation.destinataire = current_operation.de
-                elif l[2].startswith("MOTIF:"):
-                    current_operation.motif = l[2].replace("MOTIF:", "", 1).strip()
-                elif l[2].startswith("REF:"):
-                    if current_operation.ref is None:
-                        current_operation.ref = l[2].replace("REF:", "", 1).strip()
-                    elif current_operation.ref_2 is None:
-                        current_operation.ref_2 = l[2].replace("REF:", "", 1).strip()
-                    elif current_operation.ref_3 is None:
-                        current_operation.ref_3 = l[2].replace("REF:", "", 1).strip()
-                elif l[2].startswith("POUR:"):
-                    current_operation.pour = l[2].replace("POUR:", "", 1).strip()
-                    current_operation.destinataire = current_operation.pour
-                elif l[2].startswith("DATE:"):
-                    current_operation.date_virement = l[2].replace("DATE:", "", 1).strip()
-                elif l[2].startswith("REMISE:"):
-                    current_operation.remise = l[2].replace("REMISE:", "", 1).strip()
-                elif l[2].startswith("CHEZ:"):
-                    current_operation.chez = l[2].replace("CHEZ:", "", 1).strip()
-                elif l[2].startswith("LIB:"):
-                    current_operation.lib = l[2].replace("LIB:", "", 1).strip()
-
-        if current_operation:
-            new_operations.append(current_operation)
-
-        analyzed_files.add(pdf_filename)
-
-    app.all_operations.extend(new_operations)
-    app.config["accounts"][account]["analyzed_files"] = list(analyzed_files)
-    app.save_data()
-    return new_operations
-
-
-def str_to_float(text: str) -> float:
-    return float(text.replace('*', '').replace('.', '').replace(',', '.'))
-
-
-# Exécution de l'application
-root = tk.Tk()
-app = ComptaApp(root)
-root.mainloop()
+# Exécution de l'application (protégée pour que les processus d'analyse puissent importer ce module)
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = ComptaApp(root)
+    root.mainloop()
@@ -0,0 +1,123 @@
+"""Index comparés à un calcul direct sur la liste des opérations."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from trezoponts import indexes
+from trezoponts.indexes import BalanceIndex, CashBook, DaySums, FingerprintIndex
+from trezoponts.models import CashOperation, LazyOperations, Operation
+
+START = datetime(2024, 1, 1)
+
+
+def random_operation(rnd, accounts=("COURANT", "LIVRET"), days=400):
+    day = START + timedelta(days=rnd.randint(0, days))
+    return Operation(compte=rnd.choice(accounts), moyen="_", nom=rnd.choice(["VIR A", "VIR B", "CARTE C"]),
+                     destinataire="", montant=round(rnd.uniform(-500, 500), 2), date=day, valeur=day)
+
+
+def test_day_sums_prefix_matches_brute_force():
+    rnd = random.Random(0)
+    daily = {1000: 5.0}
+    sums = DaySums(dict(daily))
+    for _ in range(500):
+        day = rnd.randint(700, 1500)  # Agrandit la plage vers le passé comme vers l'avenir
+        montant = round(rnd.uniform(-100, 100), 2)
+        sums.add(day, montant)
+        daily[day] = daily.get(day, 0.0) + montant
+        query = rnd.randint(600, 1600)
+        assert sums.prefix(query) == pytest.approx(sum(m for d, m in daily.items() if d <= query))
+    assert sums.total == pytest.approx(sum(daily.values()))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_balance_index_matches_brute_force(lazy):
+    rnd = random.Random(1)
+    operations = [random_operation(rnd) for _ in range(300)]
+    source = LazyOperations(operation.to_dict() for operation in operations) if lazy else list(operations)
+    index = BalanceIndex(source)
+    assert sorted(index.accounts()) == ["COURANT", "LIVRET"]  # Construit l'index
+
+    # Ajouts après construction, dont des opérations antérieures et un nouveau compte
+    for _ in range(200):
+        operation = random_operation(rnd, accounts=("COURANT", "LIVRET", "ASSO"), days=800)
+        operations.append(operation)
+        index.add(operation)
+
+    for _ in range(100):
+        account = rnd.choice(["COURANT", "LIVRET", "ASSO", "INCONNU"])
+        date = START + timedelta(days=rnd.randint(-10, 810))
+        expected = round(sum(op.montant for op in operations if op.compte == account and op.date <= date), 2)
+        assert index.balance(account, date) == pytest.approx(expected)
+    for account in ("COURANT", "LIVRET", "ASSO"):
+        assert index.balance(account) == pytest.approx(round(sum(op.montant for op in operations if op.compte == account), 2))
+
+
+def test_cash_book_matches_sorted_list(monkeypatch):
+    monkeypatch.setattr(indexes, "CASH_BLOCK_SIZE", 4)  # Petits blocs : découpes et suppressions de blocs fréquentes
+    rnd = random.Random(2)
+
+    def cash_operation():
+        return CashOperation(None, "Caisse", "Buvette", round(rnd.uniform(-100, 100), 2),
+                             START + timedelta(days=rnd.randint(0, 60)))
+
+    operations = [cash_operation() for _ in range(30)]
+    for uni_id, operation in enumerate(operations):
+        operation.uni_id = uni_id
+    book = CashBook(operations)
+    next_id = len(operations)
+
+    for step in range(2000):
+        if rnd.random() < 0.55 or not operations:
+            operation = cash_operation()
+            operation.uni_id = next_id
+            next_id += 1
+            book.add(operation)
+            operations.append(operation)
+        else:
+            operation = operations.pop(rnd.randrange(len(operations)))
+            assert book.remove(operation.uni_id) is operation
+        assert book.remove(-1) is None
+
+        if step % 25 == 0:
+            expected = sorted(operations, key=lambda op: (op.date, op.uni_id))
+            assert list(book) == expected
+            assert len(book) == len(expected)
+            start = rnd.randrange(len(expected) + 1)
+            stop = start + rnd.randint(0, 40)
+            assert book[start:stop] == expected[start:stop]
+            running, balances = 0.0, []
+            for operation in expected:
+                running += operation.montant
+                balances.append(round(running, 2))
+            assert book.balances(start, stop) == balances[start:stop]
+            assert book.balance() == (balances[-1] if balances else 0.0)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_fingerprint_index_keeps_only_missing_operations(lazy):
+    rnd = random.Random(3)
+    day = START
+    # Peu d'empreintes différentes : des opérations identiques le même jour reviennent souvent
+    pool = [Operation(compte="COURANT", moyen="_", nom=f"CARTE {i % 3}", destinataire="", montant=float(i % 4),
+                      date=day, valeur=day) for i in range(12)]
+    registry = [Operation.from_dict(rnd.choice(pool).to_dict()) for _ in range(40)]
+    source = LazyOperations(operation.to_dict() for operation in registry) if lazy else registry
+    index = FingerprintIndex(source)
+
+    statement = [Operation.from_dict(rnd.choice(pool).to_dict()) for _ in range(40)]
+    new_operations = index.new_operations(statement)
+
+    # Une empreinte n'apporte que ce que le relevé contient en plus du registre, dans l'ordre du relevé
+    for fingerprint in {operation.fingerprint() for operation in statement}:
+        in_statement = [op for op in statement if op.fingerprint() == fingerprint]
+        in_registry = sum(op.fingerprint() == fingerprint for op in registry)
+        kept = [op for op in new_operations if op.fingerprint() == fingerprint]
+        assert kept == in_statement[in_registry:]
+    kept_ids = {id(op) for op in new_operations}
+    assert new_operations == [op for op in statement if id(op) in kept_ids]
+
+    # Une fois ajoutées, les mêmes opérations ne sont plus nouvelles
+    index.add_many(new_operations)
+    assert index.new_operations(statement) == []
@@ -0,0 +1,114 @@
+"""Validation des relevés analysés (commit_statements) : rapprochement des soldes, relevés en échec, doublons."""
+from datetime import datetime
+
+import pytest
+
+from trezoponts import JsonStorage, Ledger, Operation
+from trezoponts.ingestion import IngestionStats, commit_statements, list_new_statements, plan_statements
+
+ACCOUNT = "COMPTE"
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    folder = tmp_path / "releves" / ACCOUNT
+    folder.mkdir(parents=True)
+    ledger = Ledger(JsonStorage())
+    ledger.config["accounts"][ACCOUNT] = {"folder": str(folder), "analyzed_files": []}
+    return ledger
+
+
+def statement(ledger, day, amounts, opening=100.0, gap=0.0):
+    # Job (compte, fichier, chemin) d'un relevé daté du jour day, et son résultat d'analyse
+    pdf_filename = f"releve_{day:02d}012024.pdf"
+    path = f"{ledger.config['accounts'][ACCOUNT]['folder']}/{pdf_filename}"
+    with open(path, "wb") as f:
+        f.write(pdf_filename.encode())
+    operations = [Operation(compte=ACCOUNT, moyen="VIR", nom=f"VIR {day} {i}", destinataire="", montant=montant,
+                            date=datetime(2024, 1, day), valeur=datetime(2024, 1, day))
+                  for i, montant in enumerate(amounts)]
+    closing = round(opening + sum(amounts) + gap, 2)
+    return (ACCOUNT, pdf_filename, path), (operations, (opening, closing))
+
+
+def commit(ledger, statements):
+    stats = IngestionStats()
+    jobs = [job for job, _ in statements]
+    results = [result for _, result in statements]
+    new_operations = commit_statements(ledger, jobs, results, stats)
+    return new_operations, stats
+
+
+def test_reconciled_statements_set_opening_balance(ledger):
+    first = statement(ledger, 5, [10.0, -2.5], opening=100.0)
+    second = statement(ledger, 20, [-30.0], opening=107.5)
+    new_operations, stats = commit(ledger, [first, second])
+
+    account_config = ledger.config["accounts"][ACCOUNT]
+    assert len(new_operations) == 3
+    assert stats.unreconciled == []
+    assert account_config["analyzed_files"] == ["releve_05012024.pdf", "releve_20012024.pdf"]
+    assert account_config["opening_balance"] == 100.0
+    assert ledger.balance_at(ACCOUNT) == 77.5
+    assert ledger.balance_at(ACCOUNT, datetime(2024, 1, 10)) == 107.5
+
+
+def test_unreconciled_statement_is_reported(ledger):
+    job, result = statement(ledger, 5, [10.0], gap=-4.2)
+    _, stats = commit(ledger, [(job, result)])
+    assert stats.unreconciled == [(ACCOUNT, "releve_05012024.pdf", -4.2)]
+    assert ledger.config["accounts"][ACCOUNT]["unreconciled_files"] == {"releve_05012024.pdf": -4.2}
+
+
+def test_failed_statement_retried_becomes_opening_anchor(ledger):
+    first = statement(ledger, 5, [10.0, -2.5], opening=100.0)
+    second = statement(ledger, 20, [-30.0], opening=107.5)
+
+    # Premier relevé en échec : le second donne provisoirement le solde d'ouverture
+    commit(ledger, [(first[0], None), second])
+    account_config = ledger.config["accounts"][ACCOUNT]
+    assert list(account_config["failed_files"]) == ["releve_05012024.pdf"]
+    assert account_config["opening_balance"] == 107.5
+    assert ledger.balance_at(ACCOUNT) == 77.5
+
+    # Relevé de nouveau proposé puis analysé : il devient le point de départ, sans compter ses opérations deux fois
+    assert [pdf_filename for _, pdf_filename, _ in plan_statements(ledger.account_folders(), ledger.config)] == ["releve_05012024.pdf"]
+    commit(ledger, [first])
+    assert account_config["failed_files"] == {}
+    assert account_config["opening_balance"] == 100.0
+    assert account_config["opening_balance_file"] == "releve_05012024.pdf"
+    assert ledger.balance_at(ACCOUNT) == 77.5
+
+    reloaded = Ledger(JsonStorage())
+    assert reloaded.balance_at(ACCOUNT) == 77.5
+
+
+def test_reissued_statement_adds_no_duplicates(ledger):
+    job, result = statement(ledger, 5, [10.0, 10.0, -3.0])
+    commit(ledger, [(job, result)])
+
+    # Même relevé sous un autre nom, avec une opération de plus
+    operations, balances = result
+    extra = Operation(compte=ACCOUNT, moyen="VIR", nom="VIR 5 0", destinataire="", montant=10.0,
+                      date=datetime(2024, 1, 5), valeur=datetime(2024, 1, 5))
+    reissued = [Operation.from_dict(operation.to_dict()) for operation in operations] + [extra]
+    new_operations, stats = commit(ledger, [((ACCOUNT, "copie_05012024.pdf", job[2]), (reissued, (balances[0], balances[1] + 10.0)))])
+    assert new_operations == [extra]
+    assert stats.duplicates == 3
+    assert len(ledger.all_operations) == 4
+
+
+def test_badly_named_pdfs_are_ignored(ledger):
+    folder = ledger.config["accounts"][ACCOUNT]["folder"]
+    for name in ("releve_20012024.pdf", "releve_05012024.pdf", "scan.pdf", "notes.txt"):
+        with open(f"{folder}/{name}", "wb"):
+            pass
+    ignored = []
+    assert list_new_statements(folder, {"releve_20012024.pdf"}, ignored) == ["releve_05012024.pdf"]
+    assert ignored == ["scan.pdf"]
+
+    ignored = []
+    jobs = plan_statements(ledger.account_folders(), ledger.config, ignored)
+    assert [pdf_filename for _, pdf_filename, _ in jobs] == ["releve_05012024.pdf", "releve_20012024.pdf"]
+    assert ignored == [(ACCOUNT, "scan.pdf")]
@@ -0,0 +1,88 @@
+"""Aller-retour des trois stockages : ce qui est sauvegardé (ajouts, modifications, suppressions) est relu à l'identique."""
+from datetime import datetime
+
+import pytest
+
+from trezoponts import CashOperation, Event, JournalStorage, JsonStorage, Ledger, Operation, SqliteStorage, Tiers
+
+STORAGES = {
+    "json": JsonStorage,
+    "sqlite": SqliteStorage,
+    "journal": lambda: JournalStorage(compact_every=3),  # Compactions fréquentes : le journal est aussi relu après
+}
+
+
+def snapshot(ledger):
+    # Contenu comparable d'une comptabilité, indépendant de l'ordre de chargement
+    return {
+        "operations": sorted((operation.to_dict() for operation in ledger.all_operations), key=lambda item: item["uni_id"]),
+        "cash_operations": sorted((operation.to_dict() for operation in ledger.cash_operations), key=lambda item: item["uni_id"]),
+        "tiers": [tier.to_dict() for tier in ledger.tiers],
+        "events": [event.to_dict() for event in ledger.events],
+        "config": ledger.config,
+    }
+
+
+def reload(storage_name, ledger):
+    if isinstance(ledger.storage, JournalStorage):
+        ledger.storage.wait_for_compaction()
+    return Ledger(STORAGES[storage_name]())
+
+
+def make_operations(n, start_day=1):
+    return [Operation(compte="COMPTE", moyen="VIR", nom=f"VIR {i}", destinataire="", montant=round(10.5 * i - 40, 2),
+                      date=datetime(2024, 1, start_day + i % 20), valeur=datetime(2024, 1, start_day + i % 20),
+                      ref=f"REF{i}")
+            for i in range(n)]
+
+
+@pytest.fixture(params=sorted(STORAGES))
+def storage_name(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Les stockages écrivent dans le dossier courant
+    return request.param
+
+
+def test_incremental_saves_round_trip(storage_name):
+    ledger = Ledger(STORAGES[storage_name]())
+    operations = make_operations(8)
+    ledger.all_operations.extend(operations)
+    ledger.operations_by_id.add_many(operations)
+    ledger.config["accounts"]["COMPTE"] = {"folder": "COMPTE", "analyzed_files": ["releve_31012024.pdf"],
+                                           "opening_balance": 120.5}
+    ledger.save_data(added=operations, config=True)
+
+    cash = [CashOperation(None, f"Caisse {i}", "Buvette", 5.0 * i, datetime(2024, 2, 1 + i)) for i in range(4)]
+    ledger.cash_operations.add_many(cash)
+    tiers = Tiers("Boulangerie", ["BOULANGERIE DU COIN", "BOUL. COIN"])
+    event = Event("Kermesse", "#ff0000")
+    ledger.tiers.append(tiers)
+    ledger.events.append(event)
+    ledger.save_data(added=[*cash, tiers, event])
+
+    operations[2].facture = "0123abcd"
+    cash[1].montant = -12.0
+    ledger.save_data(updated=[operations[2], cash[1]])
+
+    ledger.cash_operations.remove(cash[3])
+    ledger.events.remove(event)
+    ledger.save_data(deleted=[cash[3], event])
+
+    assert snapshot(reload(storage_name, ledger)) == snapshot(ledger)
+
+
+def test_full_save_round_trip(storage_name):
+    ledger = Ledger(STORAGES[storage_name]())
+    operations = make_operations(5)
+    ledger.all_operations.extend(operations)
+    ledger.operations_by_id.add_many(operations)
+    ledger.tiers.append(Tiers("Mairie", ["MAIRIE"]))
+    ledger.save_data()
+
+    reloaded = reload(storage_name, ledger)
+    assert snapshot(reloaded) == snapshot(ledger)
+
+    # Modification après rechargement (opérations encore sous forme d'enregistrements)
+    operation = reloaded.operations_by_id.get(operations[4].uni_id)
+    operation.facture = "feedbeef"
+    reloaded.save_data(updated=[operation])
+    assert snapshot(reload(storage_name, reloaded)) == snapshot(reloaded)
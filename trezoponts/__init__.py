@@ -0,0 +1,10 @@
+"""Cœur de Trezoponts : modèles, stockage et analyse des relevés, sans interface graphique.
+
+L'import du paquet n'a pas d'effet de bord et ne charge ni tkinter ni pdfplumber (chargé à la première analyse).
+"""
+from .models import Operation, CashOperation, Tiers, Event
+from .ledger import Ledger
+from .storage import JsonStorage, SqliteStorage, JournalStorage, make_storage
+
+__all__ = ["Operation", "CashOperation", "Tiers", "Event", "Ledger", "JsonStorage", "SqliteStorage", "JournalStorage",
+           "make_storage"]
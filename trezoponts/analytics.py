@@ -0,0 +1,107 @@
+"""Analyses vectorisées (NumPy) sur tout l'historique : soldes mensuels par compte, totaux par tiers et par événement,
+répartition cash / banque.
+
+Le registre est converti une fois en tableaux (montants, jours, comptes, lignes de répartition aplaties) ; chaque
+regroupement est ensuite un np.bincount sur des codes entiers.
+"""
+try:
+    import numpy as np
+except ImportError as e:  # numpy n'est nécessaire que pour ce module
+    raise ImportError("trezoponts.analytics nécessite numpy (pip install numpy)") from e
+
+CASH_ACCOUNT = "Coffre"  # Compte sous lequel apparaissent les opérations de cash
+
+
+def _codes(values):
+    # Codes entiers des valeurs (dans l'ordre de première apparition) et liste des valeurs distinctes
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32, count=len(values))
+    return codes, list(index)
+
+
+def _split_totals(codes, montants, size):
+    # Recettes (montants > 0), charges (montants <= 0) et total par code
+    recettes = np.bincount(codes, weights=np.where(montants > 0, montants, 0.0), minlength=size)
+    charges = np.bincount(codes, weights=np.where(montants > 0, 0.0, montants), minlength=size)
+    return recettes, charges
+
+
+class LedgerArrays:
+    """Opérations bancaires et de cash d'un registre, sous forme de tableaux NumPy alignés."""
+
+    def __init__(self, operations, cash_operations=()):
+        all_operations = list(operations) + list(cash_operations)
+        n = len(all_operations)
+        self.montant = np.fromiter((op.montant for op in all_operations), dtype=np.float64, count=n)
+        self.day = np.fromiter((op.date.toordinal() for op in all_operations), dtype=np.int32, count=n)
+        self.month = np.fromiter((op.date.year * 12 + op.date.month - 1 for op in all_operations), dtype=np.int32, count=n)
+        self.is_cash = np.zeros(n, dtype=bool)
+        self.is_cash[len(all_operations) - len(cash_operations):] = True
+        self.account, self.accounts = _codes([getattr(op, "compte", CASH_ACCOUNT) for op in all_operations])
+
+        # Lignes de répartition aplaties : une entrée par (opération, tiers, montant, événement)
+        lines = [(position, tier, montant, event) for position, op in enumerate(all_operations)
+                 for tier, montant, event in op.repartition]
+        self.line_operation = np.fromiter((line[0] for line in lines), dtype=np.int64, count=len(lines))
+        self.line_montant = np.fromiter((line[2] for line in lines), dtype=np.float64, count=len(lines))
+        self.line_day = self.day[self.line_operation]
+        self.line_tier, self.tiers = _codes([line[1] for line in lines])
+        self.line_event, self.events = _codes([line[3] for line in lines])
+
+    @classmethod
+    def from_ledger(cls, ledger):
+        return cls(ledger.all_operations, ledger.cash_operations)
+
+    def monthly_balances(self, include_cash=False):
+        # {compte: [(année, mois, mouvement du mois, solde cumulé depuis le premier mois)]}, mois vides compris
+        mask = slice(None) if include_cash else ~self.is_cash
+        montant, month, account = self.montant[mask], self.month[mask], self.account[mask]
+        if not len(montant):
+            return {}
+        first = month.min()
+        n_months = int(month.max() - first + 1)
+        flows = np.bincount(account * n_months + (month - first), weights=montant,
+                            minlength=len(self.accounts) * n_months).reshape(len(self.accounts), n_months)
+        balances = np.cumsum(flows, axis=1)
+
+        # Chaque compte commence à son premier mois d'opérations
+        account_first = np.full(len(self.accounts), n_months, dtype=np.int64)
+        np.minimum.at(account_first, account, month - first)
+
+        result = {}
+        for code in np.unique(account):
+            result[self.accounts[code]] = [(int((first + m) // 12), int((first + m) % 12 + 1), float(flows[code, m]), float(balances[code, m]))
+                                           for m in range(account_first[code], n_months)]
+        return result
+
+    def _lines_after(self, start_date):
+        if start_date is None:
+            return np.ones(len(self.line_montant), dtype=bool)
+        return self.line_day > start_date.toordinal()
+
+    def tier_totals(self, start_date=None, event=None):
+        # {tiers: {"recettes", "charges", "total"}} sur les répartitions postérieures à start_date (d'un événement si précisé)
+        mask = self._lines_after(start_date)
+        if event is not None:
+            if event not in self.events:
+                return {}
+            mask &= self.line_event == self.events.index(event)
+        recettes, charges = _split_totals(self.line_tier[mask], self.line_montant[mask], len(self.tiers))
+        present = np.bincount(self.line_tier[mask], minlength=len(self.tiers)) > 0
+        return {self.tiers[code]: {"recettes": float(recettes[code]), "charges": float(charges[code]),
+                                   "total": float(recettes[code] + charges[code])} for code in np.flatnonzero(present)}
+
+    def event_totals(self, start_date=None):
+        # {événement: {"recettes", "charges", "total"}} sur les répartitions postérieures à start_date
+        mask = self._lines_after(start_date)
+        recettes, charges = _split_totals(self.line_event[mask], self.line_montant[mask], len(self.events))
+        present = np.bincount(self.line_event[mask], minlength=len(self.events)) > 0
+        return {self.events[code]: {"recettes": float(recettes[code]), "charges": float(charges[code]),
+                                    "total": float(recettes[code] + charges[code])} for code in np.flatnonzero(present)}
+
+    def cash_vs_bank(self, start_date=None):
+        # {"cash": {...}, "banque": {...}} : recettes, charges et total des opérations postérieures à start_date
+        mask = np.ones(len(self.montant), dtype=bool) if start_date is None else self.day > start_date.toordinal()
+        recettes, charges = _split_totals(self.is_cash[mask].astype(np.int64), self.montant[mask], 2)
+        return {name: {"recettes": float(recettes[code]), "charges": float(charges[code]), "total": float(recettes[code] + charges[code])}
+                for code, name in ((0, "banque"), (1, "cash"))}
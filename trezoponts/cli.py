@@ -0,0 +1,235 @@
+"""Ligne de commande : analyse des relevés et rapports, sans interface graphique (utilisable depuis cron).
+
+    python -m trezoponts ingest [--data-dir DOSSIER] [--root DOSSIER] [--workers N] [--no-cache]
+    python -m trezoponts watch [--data-dir DOSSIER] [--root DOSSIER] [--interval S] [--settle N] [--workers N] [--no-cache]
+    python -m trezoponts attach DOSSIER [--data-dir DOSSIER] [--days N] [--dry-run]
+    python -m trezoponts balance [--data-dir DOSSIER] [--account COMPTE] [--date ddmmyyyy]
+    python -m trezoponts report [--data-dir DOSSIER] [--since ddmmyyyy] [--output FICHIER]
+    python -m trezoponts dashboard [--data-dir DOSSIER] [--since ddmmyyyy] [--output FICHIER]   (nécessite numpy)
+
+Avec --trace FICHIER (ou COMPTA_TRACE), les durées des étapes et les compteurs sont enregistrés (voir tracing).
+
+Le résultat (statistiques de temps et nombres de lignes) est écrit en JSON sur la sortie standard ; watch écrit en
+plus une ligne JSON par lot de relevés analysés, jusqu'à son interruption (Ctrl-C).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from . import tracing
+from .ledger import Ledger
+from .storage import make_storage
+
+
+def ingest(ledger, args):
+    from .ingestion import TableCache, analyze_accounts_statements
+
+    if args.root:
+        ledger.config["root_folder"] = os.path.abspath(args.root)
+    if not ledger.config["root_folder"]:
+        raise CommandError("Aucun dossier racine configuré (option --root).")
+    ledger.discover_accounts()
+
+    new_operations, stats = analyze_accounts_statements(ledger, ledger.account_folders(), args.workers,
+                                                        None if args.no_cache else TableCache())
+    return {"stats": {**stats.to_dict(), "accounts": len(ledger.account_folders()), "total_operations": len(ledger.all_operations)}}
+
+
+def watch(ledger, args):
+    from .ingestion import TableCache, extraction_profiles, ingest_statements, commit_statements
+    from .watcher import StatementWatcher, WATCH_INTERVAL, WATCH_SETTLE
+
+    if args.root:
+        ledger.config["root_folder"] = os.path.abspath(args.root)
+    if not ledger.config["root_folder"]:
+        raise CommandError("Aucun dossier racine configuré (option --root).")
+    ledger.discover_accounts()
+
+    # Scrutation dans le thread principal : chaque lot de relevés stables est analysé puis ajouté aussitôt
+    interval = WATCH_INTERVAL if args.interval is None else args.interval
+    watcher = StatementWatcher.for_ledger(ledger, interval=interval, settle=WATCH_SETTLE if args.settle is None else args.settle)
+    cache = None if args.no_cache else TableCache()
+    totals = {"batches": 0, "pdfs": 0, "operations": 0, "failed": 0}
+    try:
+        while True:
+            jobs = watcher.poll()
+            if jobs:
+                files = [pdf_filename for _, pdf_filename, _ in jobs]
+                try:
+                    results, stats = ingest_statements([(account, path) for account, _, path in jobs], args.workers, cache,
+                                                       profiles=extraction_profiles(ledger.config))
+                    new_operations = commit_statements(ledger, jobs, results, stats)
+                    watcher.failed([job for job, result in zip(jobs, results) if result is None])
+                except (ValueError, OSError) as e:
+                    # Lot en échec (profil d'extraction invalide, sauvegarde impossible, ...) : la surveillance continue
+                    print(json.dumps({"command": "watch", "files": files, "error": str(e)}, ensure_ascii=False),
+                          file=sys.stderr, flush=True)
+                else:
+                    # Les relevés en échec sont listés dans stats["failed"], les autres sont ajoutés
+                    totals["batches"] += 1
+                    totals["pdfs"] += stats.pdfs
+                    totals["operations"] += len(new_operations)
+                    totals["failed"] += len(stats.failed)
+                    print(json.dumps({"command": "watch", "files": files, "stats": stats.to_dict()}, ensure_ascii=False), flush=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return {"stats": {**totals, "total_operations": len(ledger.all_operations)}}
+
+
+def attach(ledger, args):
+    from .invoices import InvoiceStore, INVOICE_MATCH_DAYS, match_invoices, scan_invoice_folder
+
+    # Factures du dossier rapprochées des opérations par montant et date, puis stockées par contenu
+    start = time.perf_counter()
+    invoices, unrecognized = scan_invoice_folder(args.folder)
+    matches, unmatched = match_invoices(invoices, ledger.operations_index, INVOICE_MATCH_DAYS if args.days is None else args.days)
+    if not args.dry_run:
+        store = InvoiceStore()
+        for path, operation in matches:
+            operation.facture = store.store(path)
+        ledger.save_data(updated=[operation for _, operation in matches])
+
+    stats = {"seconds": round(time.perf_counter() - start, 3), "files": len(invoices) + len(unrecognized),
+             "matched": len(matches), "unmatched": len(unmatched), "unrecognized": len(unrecognized)}
+    return {"matches": [{"file": os.path.basename(path), "compte": operation.compte, "date": operation.date.strftime("%d/%m/%Y"),
+                         "nom": operation.nom, "montant": operation.montant, "facture": operation.facture}
+                        for path, operation in matches],
+            "unmatched": [os.path.basename(path) for path in unmatched],
+            "unrecognized": [os.path.basename(path) for path in unrecognized], "stats": stats}
+
+
+def balance(ledger, args):
+    start = time.perf_counter()
+    date = datetime.strptime(args.date, "%d%m%Y") if args.date else None
+    accounts = [args.account] if args.account else sorted(set(ledger.config["accounts"]) | set(ledger.balance_index.accounts()))
+
+    # Solde de chaque compte à la date demandée (null sans solde d'ouverture connu, "flows" donnant alors la somme des
+    # montants), et relevés dont les soldes ne correspondent pas aux opérations
+    balances = {account: {"balance": ledger.balance_at(account, date), "flows": ledger.balance_index.balance(account, date),
+                          "opening_balance": ledger.config["accounts"].get(account, {}).get("opening_balance"),
+                          "unreconciled": ledger.config["accounts"].get(account, {}).get("unreconciled_files", {})}
+                for account in accounts}
+    stats = {"seconds": round(time.perf_counter() - start, 3), "operations": len(ledger.all_operations), "accounts": len(accounts)}
+    return {"date": date.strftime("%d/%m/%Y") if date else None, "accounts": balances, "stats": stats}
+
+
+def report(ledger, args):
+    start = time.perf_counter()
+    since = datetime.strptime(args.since, "%d%m%Y") if args.since else datetime.min
+    aggregator = ledger.event_aggregator
+
+    # Mêmes totaux que la fenêtre de détails d'un événement, pour chaque événement
+    event_names = [event.nom for event in ledger.events]
+    event_names += [name for name in aggregator.event_names() if name not in event_names]
+    events = {}
+    for event_name in event_names:
+        tiers_summary, total_recettes, total_charges = aggregator.summary(event_name, since)
+        events[event_name] = {"tiers": tiers_summary, "recettes": total_recettes, "charges": total_charges,
+                              "total": total_recettes + total_charges}
+    summaries = {"since": since.strftime("%d/%m/%Y") if args.since else None, "events": events,
+                 "tiers": aggregator.tiers_summary(since)}
+
+    stats = {"seconds": round(time.perf_counter() - start, 3), "operations": len(ledger.all_operations),
+             "cash_operations": len(ledger.cash_operations), "events": len(events), "tiers": len(summaries["tiers"])}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=1)
+        return {"output": args.output, "stats": stats}
+    return {**summaries, "stats": stats}
+
+
+def dashboard(ledger, args):
+    from .analytics import LedgerArrays
+
+    start = time.perf_counter()
+    since = datetime.strptime(args.since, "%d%m%Y") if args.since else None
+    arrays = LedgerArrays.from_ledger(ledger)
+    build_seconds = time.perf_counter() - start
+
+    # Tout l'historique : soldes mensuels par compte, totaux par événement et par tiers, cash / banque
+    summaries = {"since": since.strftime("%d/%m/%Y") if since else None,
+                 "monthly_balances": {account: [{"month": f"{month:02d}/{year}", "flow": flow, "balance": balance}
+                                                for year, month, flow, balance in months]
+                                      for account, months in arrays.monthly_balances().items()},
+                 "events": arrays.event_totals(since), "tiers": arrays.tier_totals(since),
+                 "cash_vs_bank": arrays.cash_vs_bank(since)}
+
+    stats = {"seconds": round(time.perf_counter() - start, 3), "build_seconds": round(build_seconds, 3),
+             "operations": len(ledger.all_operations), "cash_operations": len(ledger.cash_operations),
+             "repartition_lines": len(arrays.line_montant)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=1)
+        return {"output": args.output, "stats": stats}
+    return {**summaries, "stats": stats}
+
+
+class CommandError(Exception):
+    pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="trezoponts", description="Analyse des relevés et rapports sans interface graphique.")
+    parser.add_argument("--data-dir", help="Dossier des données (operations.json, config.json, ...) ; dossier courant par défaut")
+    parser.add_argument("--storage", choices=("json", "sqlite", "journal"), help="Stockage (COMPTA_STORAGE par défaut)")
+    parser.add_argument("--trace", help="Fichier de trace (.json : trace Chrome, sinon journal JSON ; COMPTA_TRACE par défaut)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Analyse les nouveaux relevés de tous les comptes")
+    ingest_parser.add_argument("--root", help="Dossier racine contenant un sous-dossier par compte")
+    ingest_parser.add_argument("--workers", type=int, help="Nombre de processus (tous les cœurs par défaut)")
+    ingest_parser.add_argument("--no-cache", action="store_true", help="Ignore le cache des tableaux extraits")
+    ingest_parser.set_defaults(handler=ingest)
+
+    watch_parser = commands.add_parser("watch", help="Surveille les dossiers des comptes et analyse les nouveaux relevés")
+    watch_parser.add_argument("--root", help="Dossier racine contenant un sous-dossier par compte")
+    watch_parser.add_argument("--interval", type=float, help="Secondes entre deux passages (2 par défaut)")
+    watch_parser.add_argument("--settle", type=int, help="Passages sans changement avant d'analyser un fichier en cours de copie (2 par défaut)")
+    watch_parser.add_argument("--workers", type=int, help="Nombre de processus (tous les cœurs par défaut)")
+    watch_parser.add_argument("--no-cache", action="store_true", help="Ignore le cache des tableaux extraits")
+    watch_parser.set_defaults(handler=watch)
+
+    attach_parser = commands.add_parser("attach", help="Lie les factures d'un dossier aux opérations de même montant et de date proche")
+    attach_parser.add_argument("folder", help="Dossier des factures (montant et date dans le nom : 2024-03-15_1.234,56.pdf)")
+    attach_parser.add_argument("--days", type=int, help="Écart maximal en jours entre facture et opération (31 par défaut)")
+    attach_parser.add_argument("--dry-run", action="store_true", help="Affiche les rapprochements sans lier ni copier les factures")
+    attach_parser.set_defaults(handler=attach)
+
+    balance_parser = commands.add_parser("balance", help="Soldes des comptes et relevés incohérents")
+    balance_parser.add_argument("--account", help="Compte (tous les comptes par défaut)")
+    balance_parser.add_argument("--date", help="Date du solde (ddmmyyyy), fin de journée ; solde actuel par défaut")
+    balance_parser.set_defaults(handler=balance)
+
+    report_parser = commands.add_parser("report", help="Résumés par événement et par tiers")
+    report_parser.add_argument("--since", help="Date de début (ddmmyyyy), opérations strictement postérieures")
+    report_parser.add_argument("--output", help="Fichier JSON des résumés (sinon sur la sortie standard)")
+    report_parser.set_defaults(handler=report)
+
+    dashboard_parser = commands.add_parser("dashboard", help="Tableaux de bord vectorisés sur tout l'historique (numpy)")
+    dashboard_parser.add_argument("--since", help="Date de début (ddmmyyyy), opérations strictement postérieures")
+    dashboard_parser.add_argument("--output", help="Fichier JSON des tableaux (sinon sur la sortie standard)")
+    dashboard_parser.set_defaults(handler=dashboard)
+
+    args = parser.parse_args(argv)
+    if args.trace:
+        tracing.enable(os.path.abspath(args.trace))
+    if args.data_dir:
+        os.chdir(args.data_dir)
+
+    start = time.perf_counter()
+    ledger = Ledger(make_storage(args.storage) if args.storage else None)
+    load_seconds = time.perf_counter() - start
+    try:
+        result = args.handler(ledger, args)
+    except (CommandError, ValueError, OSError, ImportError) as e:
+        print(json.dumps({"command": args.command, "error": str(e)}, ensure_ascii=False), file=sys.stderr)
+        return 1
+
+    result["stats"]["load_seconds"] = round(load_seconds, 3)
+    result["stats"]["total_seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps({"command": args.command, **result}, ensure_ascii=False))
+    return 0
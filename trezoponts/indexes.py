@@ -0,0 +1,603 @@
+import bisect
+import itertools
+import unicodedata
+from collections import OrderedDict
+
+from .models import LazyOperations
+
+CASH_BLOCK_SIZE = 256  # Taille visée des blocs du coffre (CashBook)
+TIERS_MEMO_SIZE = 4096  # Nombre de noms bancaires dont la résolution approchée est mémorisée
+
+
+class OperationIndex:
+    """Index des opérations par (compte, année, mois), mis à jour au fur et à mesure des ajouts.
+
+    Le compte None regroupe tous les comptes. Afficher un mois ne coûte que le nombre d'opérations de ce mois.
+    """
+
+    def __init__(self, operations=()):
+        self._buckets = {}  # (compte, année, mois) -> opérations dans l'ordre d'ajout
+        self._months = {}  # compte -> liste triée des (année, mois) contenant des opérations
+        self._source = None  # LazyOperations dont les positions sont encore dans les seaux
+        if isinstance(operations, LazyOperations):
+            self._add_positions(operations)
+        else:
+            self.add_many(operations)
+
+    def _add_positions(self, operations):
+        # Indexation sans créer les opérations : les seaux contiennent leurs positions jusqu'à la première lecture
+        # (les opérations bancaires ne sont qu'ajoutées, jamais supprimées : les positions restent valables)
+        self._source = operations
+        for (compte, year, month), positions in operations.positions_by_month().items():
+            self._buckets[(compte, year, month)] = positions
+            self._buckets.setdefault((None, year, month), []).extend(positions)
+            self._months.setdefault(compte, []).append((year, month))
+        for key, bucket in self._buckets.items():
+            if key[0] is None:
+                bucket.sort()  # Tous comptes confondus : dans l'ordre d'ajout
+                self._months.setdefault(None, []).append(key[1:])
+        for months in self._months.values():
+            months.sort()
+
+    def add(self, operation):
+        month = (operation.date.year, operation.date.month)
+        for compte in (operation.compte, None):
+            bucket = self._buckets.get((compte, *month))
+            if bucket is None:
+                bucket = self._buckets[(compte, *month)] = []
+                bisect.insort(self._months.setdefault(compte, []), month)
+            bucket.append(operation)
+
+    def add_many(self, operations):
+        for operation in operations:
+            self.add(operation)
+
+    def months(self, compte=None):
+        return self._months.get(compte, [])
+
+    def operations(self, compte, year, month):
+        bucket = self._buckets.get((compte, year, month), [])
+        if bucket and self._source is not None and type(bucket[0]) is int:
+            bucket[:] = [self._source[item] if type(item) is int else item for item in bucket]
+        return bucket
+
+
+class OperationRegistry:
+    """Opérations par identifiant stable (uni_id) : recherche, ajout, remplacement et suppression en O(1).
+
+    À la construction, un identifiant manquant ou déjà pris (anciens uni_id horodatés de deux opérations créées dans
+    la même seconde) est remplacé par un nouveau, après le plus grand existant ; add() attribue de même un identifiant
+    aux nouvelles opérations. Sur des LazyOperations, seules les positions sont indexées : une opération n'est créée
+    qu'à sa première recherche. Le parcours suit l'ordre d'ajout.
+    """
+
+    def __init__(self, operations=()):
+        self._items = {}  # uni_id -> opération (ou sa position dans _source)
+        self._source = None  # LazyOperations dont les positions sont encore dans _items
+        if isinstance(operations, LazyOperations):
+            self._source = operations
+            uni_ids = operations.uni_ids()
+            values = range(len(uni_ids))
+        else:
+            values = list(operations)
+            uni_ids = [operation.uni_id for operation in values]
+        self._next_id = max((uni_id for uni_id in uni_ids if uni_id is not None), default=-1) + 1
+
+        items = self._items
+        for uni_id, value in zip(uni_ids, values):
+            if uni_id is None or uni_id in items:
+                uni_id = self._next_id
+                self._next_id += 1
+                if self._source is not None:
+                    self._source.set_uni_id(value, uni_id)
+                else:
+                    value.uni_id = uni_id
+            items[uni_id] = value
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, uni_id):
+        return uni_id in self._items
+
+    def __iter__(self):
+        for uni_id in list(self._items):
+            yield self.get(uni_id)
+
+    def __getitem__(self, uni_id):
+        operation = self.get(uni_id)
+        if operation is None:
+            raise KeyError(uni_id)
+        return operation
+
+    def get(self, uni_id, default=None):
+        if uni_id not in self._items:
+            return default
+        value = self._items[uni_id]
+        if type(value) is int and self._source is not None:
+            value = self._items[uni_id] = self._source[value]
+        return value
+
+    def add(self, operation):
+        if operation.uni_id is None or operation.uni_id in self._items:
+            operation.uni_id = self._next_id
+        self._next_id = max(self._next_id, operation.uni_id + 1)
+        self._items[operation.uni_id] = operation
+
+    def add_many(self, operations):
+        for operation in operations:
+            self.add(operation)
+
+    def replace(self, operation):
+        # Remplace l'opération de même identifiant
+        if operation.uni_id not in self._items:
+            raise KeyError(operation.uni_id)
+        self._items[operation.uni_id] = operation
+
+    def remove(self, operation):
+        del self._items[operation.uni_id]
+
+
+class CashBook:
+    """Opérations de cash triées par date (puis identifiant), avec le solde du coffre après chacune.
+
+    Les opérations sont rangées dans des blocs triés d'au plus 2 * CASH_BLOCK_SIZE opérations, chacun avec la somme de
+    ses montants. Ajout et suppression (par identifiant, sa clé de tri étant retrouvée en O(1)) touchent un seul bloc,
+    trouvé par recherche dichotomique : O(log n + B). Une page de l'affichage et ses soldes se lisent en O(n / B + taille
+    de la page), le solde avant la page étant la somme des blocs qui la précèdent : aucun solde n'est à recalculer
+    après une modification.
+    """
+
+    def __init__(self, operations=()):
+        operations = sorted(operations, key=self._key)
+        self._key_by_id = {operation.uni_id: self._key(operation) for operation in operations}
+        self._blocks = [operations[i:i + CASH_BLOCK_SIZE] for i in range(0, len(operations), CASH_BLOCK_SIZE)]
+        self._block_keys = [[self._key(operation) for operation in block] for block in self._blocks]
+        self._sums = [sum(operation.montant for operation in block) for block in self._blocks]
+        self._len = len(operations)
+
+    @staticmethod
+    def _key(operation):
+        return operation.date, operation.uni_id
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._blocks)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            return self._slice(start, stop)
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("CashBook index out of range")
+        return self._slice(index, index + 1)[0]
+
+    def _locate(self, position):
+        # (bloc, position dans le bloc, somme des montants des blocs précédents) de l'opération à cette position
+        before = 0.0
+        for j, block in enumerate(self._blocks):
+            if position < len(block):
+                return j, position, before
+            position -= len(block)
+            before += self._sums[j]
+        return len(self._blocks), 0, before
+
+    def _slice(self, start, stop):
+        j, i, _ = self._locate(start)
+        operations = []
+        while len(operations) < stop - start and j < len(self._blocks):
+            operations += self._blocks[j][i:i + stop - start - len(operations)]
+            j, i = j + 1, 0
+        return operations
+
+    def _block_index(self, key):
+        # Premier bloc dont la dernière clé n'est pas inférieure à key (le dernier bloc sinon)
+        lo, hi = 0, len(self._blocks) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._block_keys[mid][-1] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def add(self, operation):
+        key = self._key(operation)
+        self._key_by_id[operation.uni_id] = key
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([operation])
+            self._block_keys.append([key])
+            self._sums.append(operation.montant)
+            return
+        j = self._block_index(key)
+        keys = self._block_keys[j]
+        i = bisect.bisect_right(keys, key)
+        keys.insert(i, key)
+        self._blocks[j].insert(i, operation)
+        if len(keys) > 2 * CASH_BLOCK_SIZE:
+            block = self._blocks[j]
+            self._blocks[j:j + 1] = [block[:CASH_BLOCK_SIZE], block[CASH_BLOCK_SIZE:]]
+            self._block_keys[j:j + 1] = [keys[:CASH_BLOCK_SIZE], keys[CASH_BLOCK_SIZE:]]
+            self._sums[j:j + 1] = [0.0, 0.0]
+            self._update_sum(j + 1)
+        self._update_sum(j)
+
+    def _update_sum(self, j):
+        # Somme recalculée plutôt que mise à jour par différence : pas d'erreurs d'arrondi accumulées
+        self._sums[j] = sum(operation.montant for operation in self._blocks[j])
+
+    def remove(self, uni_id):
+        # Retire et renvoie l'opération d'identifiant uni_id (None si elle n'est pas dans le coffre)
+        key = self._key_by_id.pop(uni_id, None)
+        if key is None:
+            return None
+        j = self._block_index(key)
+        keys = self._block_keys[j]
+        i = bisect.bisect_left(keys, key)
+        del keys[i]
+        operation = self._blocks[j].pop(i)
+        self._len -= 1
+        if keys:
+            self._update_sum(j)
+        else:
+            del self._blocks[j], self._block_keys[j], self._sums[j]
+        return operation
+
+    def balances(self, start, stop):
+        # Solde du coffre après chacune des opérations start..stop-1
+        j, i, balance = self._locate(start)
+        result = []
+        if j < len(self._blocks):
+            balance += sum(operation.montant for operation in self._blocks[j][:i])
+        for operation in self._slice(start, min(stop, self._len)):
+            balance += operation.montant
+            result.append(round(balance, 2))
+        return result
+
+    def balance(self):
+        # Solde actuel du coffre
+        return round(sum(self._sums, 0.0), 2)
+
+
+class DaySums:
+    """Arbre de Fenwick des montants par jour : ajout d'un montant et somme jusqu'à un jour en O(log d).
+
+    d est le nombre de jours couverts, du premier au dernier jour vus (quelques milliers pour des décennies). Un jour
+    hors de cette plage l'agrandit en reconstruisant l'arbre en O(d), la plage étant au moins doublée : le coût des
+    reconstructions reste constant en moyenne par ajout.
+    """
+
+    def __init__(self, daily):
+        self.daily = daily  # jour (ordinal) -> somme des montants du jour, pour les reconstructions
+        self.total = sum(daily.values())
+        self._build(min(daily), max(daily))
+
+    def _build(self, first, last):
+        self.first = first
+        size = last - first + 1
+        tree = [0.0] * (size + 1)
+        for day, montant in self.daily.items():
+            tree[day - first + 1] += montant
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, day, montant):
+        self.daily[day] = self.daily.get(day, 0.0) + montant
+        self.total += montant
+        size = len(self.tree) - 1
+        last = self.first + size - 1
+        if day > last:
+            self._build(self.first, max(day, self.first + 2 * size - 1))
+        elif day < self.first:
+            self._build(min(day, last - 2 * size + 1), last)
+        else:
+            tree = self.tree
+            i = day - self.first + 1
+            while i <= size:
+                tree[i] += montant
+                i += i & -i
+
+    def prefix(self, day):
+        # Somme des montants jusqu'au jour day inclus
+        if day < self.first:
+            return 0.0
+        tree = self.tree
+        i = min(day - self.first + 1, len(tree) - 1)
+        total = 0.0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+class BalanceIndex:
+    """Soldes cumulés par compte : sommes des montants des opérations jusqu'à une date (voir DaySums).
+
+    Le solde d'un compte à une date comme l'ajout d'une opération, même ancienne, coûtent O(log d). L'index n'est
+    construit qu'à la première requête, depuis la liste d'opérations donnée (sans créer les objets d'une
+    LazyOperations) ; une opération ajoutée à cette liste avant la construction y est lue.
+    """
+
+    def __init__(self, operations=()):
+        self._source = operations
+        self._accounts = None  # compte -> DaySums ; None tant que l'index n'est pas construit
+
+    def _build(self):
+        if isinstance(self._source, LazyOperations):
+            records = self._source.balance_records()
+        else:
+            records = ((operation.compte, operation.date.toordinal(), operation.montant) for operation in self._source)
+        daily_by_account = {}
+        for compte, day, montant in records:
+            daily = daily_by_account.get(compte)
+            if daily is None:
+                daily = daily_by_account[compte] = {}
+            daily[day] = daily.get(day, 0.0) + montant
+        self._accounts = {compte: DaySums(daily) for compte, daily in daily_by_account.items()}
+        self._source = None
+
+    def add(self, operation):
+        # Avant la construction, rien à faire : l'opération est lue dans la liste source (où elle doit déjà être)
+        if self._accounts is None:
+            return
+        day = operation.date.toordinal()
+        sums = self._accounts.get(operation.compte)
+        if sums is None:
+            self._accounts[operation.compte] = DaySums({day: operation.montant})
+        else:
+            sums.add(day, operation.montant)
+
+    def add_many(self, operations):
+        for operation in operations:
+            self.add(operation)
+
+    def accounts(self):
+        if self._accounts is None:
+            self._build()
+        return list(self._accounts)
+
+    def balance(self, compte, date=None):
+        # Somme des montants du compte jusqu'à date incluse (toutes ses opérations si date est None)
+        if self._accounts is None:
+            self._build()
+        sums = self._accounts.get(compte)
+        if sums is None:
+            return 0.0
+        return round(sums.total if date is None else sums.prefix(date.toordinal()), 2)
+
+
+class AmountIndex:
+    """Index des opérations par montant (en centimes, au signe près), triées par date dans chaque montant.
+
+    Sert à rapprocher une pièce (facture, ...) des opérations de même montant autour de sa date, en O(log n) par
+    recherche au lieu d'un parcours de toutes les opérations.
+    """
+
+    def __init__(self, operations=()):
+        self._days = {}  # centimes -> jours (ordinaux) triés
+        self._operations = {}  # centimes -> opérations, alignées sur _days
+        for operation in operations:
+            self.add(operation)
+
+    @staticmethod
+    def cents(montant):
+        return round(abs(montant) * 100)
+
+    def add(self, operation):
+        cents = self.cents(operation.montant)
+        days = self._days.setdefault(cents, [])
+        day = operation.date.toordinal()
+        i = bisect.bisect_right(days, day)
+        days.insert(i, day)
+        self._operations.setdefault(cents, []).insert(i, operation)
+
+    def candidates(self, montant, date, max_days):
+        # Opérations du même montant à au plus max_days jours de date, de la plus proche à la plus éloignée
+        cents = self.cents(montant)
+        days = self._days.get(cents)
+        if not days:
+            return []
+        day = date.toordinal()
+        start = bisect.bisect_left(days, day - max_days)
+        end = bisect.bisect_right(days, day + max_days)
+        operations = self._operations[cents]
+        return [operations[i] for i in sorted(range(start, end), key=lambda i: (abs(days[i] - day), days[i]))]
+
+
+class FingerprintIndex:
+    """Nombre d'opérations bancaires par empreinte (compte, date, valeur, montant, nom, références).
+
+    Une même empreinte peut revenir légitimement (deux paiements identiques le même jour) : un relevé n'apporte donc
+    une opération que s'il en contient plus que le registre pour cette empreinte. Vérification et ajout en O(1) par
+    opération, quelle que soit la taille de l'historique.
+    """
+
+    def __init__(self, operations=()):
+        self._counts = {}  # empreinte -> nombre d'opérations
+        fingerprints = operations.fingerprints() if isinstance(operations, LazyOperations) else (op.fingerprint() for op in operations)
+        counts = self._counts
+        for fingerprint in fingerprints:
+            counts[fingerprint] = counts.get(fingerprint, 0) + 1
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, operation):
+        fingerprint = operation.fingerprint()
+        self._counts[fingerprint] = self._counts.get(fingerprint, 0) + 1
+
+    def add_many(self, operations):
+        for operation in operations:
+            self.add(operation)
+
+    def new_operations(self, operations):
+        # Opérations d'un relevé qui ne sont pas déjà dans le registre (relevé réédité, relevés qui se chevauchent)
+        seen = {}
+        new_operations = []
+        for operation in operations:
+            fingerprint = operation.fingerprint()
+            n = seen.get(fingerprint, 0)
+            seen[fingerprint] = n + 1
+            if n >= self._counts.get(fingerprint, 0):
+                new_operations.append(operation)
+        return new_operations
+
+
+class DailyTotals:
+    # Recettes et charges par jour (ordinal de date), avec sommes cumulées recalculées à la demande
+    def __init__(self):
+        self.days = []  # Jours triés
+        self.amounts = {}  # jour -> [recettes, charges, nombre de lignes]
+        self._prefix = None  # (recettes cumulées, charges cumulées) alignées sur days
+
+    def add(self, day, montant, sign=1):
+        amounts = self.amounts.get(day)
+        if amounts is None:
+            amounts = self.amounts[day] = [0.0, 0.0, 0]
+            bisect.insort(self.days, day)
+        amounts[0 if montant > 0 else 1] += sign * montant
+        amounts[2] += sign
+        if amounts[2] == 0:
+            del self.amounts[day]
+            del self.days[bisect.bisect_left(self.days, day)]
+        self._prefix = None
+
+    def totals_after(self, day):
+        # (recettes, charges) des jours strictement postérieurs à day
+        if self._prefix is None:
+            recettes = list(itertools.accumulate(self.amounts[d][0] for d in self.days))
+            charges = list(itertools.accumulate(self.amounts[d][1] for d in self.days))
+            self._prefix = (recettes, charges)
+        recettes, charges = self._prefix
+        if not self.days:
+            return 0.0, 0.0
+        start = bisect.bisect_right(self.days, day)
+        if start == 0:
+            return recettes[-1], charges[-1]
+        return recettes[-1] - recettes[start - 1], charges[-1] - charges[start - 1]
+
+
+class EventAggregator:
+    """Totaux des répartitions par (événement, tiers, jour), recettes et charges séparées.
+
+    Mis à jour à chaque modification d'une répartition ou d'une opération de cash : le résumé d'un événement à partir
+    d'une date se lit dans les sommes cumulées par jour, sans parcourir les opérations.
+    """
+
+    def __init__(self, operations=()):
+        self._totals = {}  # événement -> {tiers: DailyTotals}
+        self._contributions = {}  # id(opération) -> (opération, [(événement, tiers, jour, montant)])
+        for operation in operations:
+            self.update(operation)
+
+    def update(self, operation):
+        # (Re)prend en compte la répartition actuelle de l'opération
+        self.remove(operation)
+        lines = [(event, tier, operation.date.toordinal(), montant) for tier, montant, event in operation.repartition]
+        for event, tier, day, montant in lines:
+            self._totals.setdefault(event, {}).setdefault(tier, DailyTotals()).add(day, montant)
+        if lines:
+            self._contributions[id(operation)] = (operation, lines)
+
+    def remove(self, operation):
+        _, lines = self._contributions.pop(id(operation), (None, []))
+        for event, tier, day, montant in lines:
+            self._totals[event][tier].add(day, montant, sign=-1)
+
+    def event_names(self):
+        return list(self._totals)
+
+    def tiers_summary(self, start_date):
+        # Recettes, charges et total par tiers, tous événements confondus, sur les opérations postérieures à start_date
+        summary = {}
+        for event_name in self._totals:
+            for tier, details in self.summary(event_name, start_date)[0].items():
+                totals = summary.setdefault(tier, {"recettes": 0.0, "charges": 0.0, "total": 0.0})
+                for key in totals:
+                    totals[key] += details[key]
+        return summary
+
+    def summary(self, event_name, start_date):
+        # Détails par tiers et totaux des répartitions de l'événement sur les opérations postérieures à start_date
+        tiers_summary = {}
+        total_recettes = 0.0
+        total_charges = 0.0
+        for tier, daily_totals in self._totals.get(event_name, {}).items():
+            if not daily_totals.days or daily_totals.days[-1] <= start_date.toordinal():
+                continue
+            recettes, charges = daily_totals.totals_after(start_date.toordinal())
+            tiers_summary[tier] = {"recettes": recettes, "charges": charges, "total": recettes + charges}
+            total_recettes += recettes
+            total_charges += charges
+        return tiers_summary, total_recettes, total_charges
+
+
+def normalize_name(name):
+    # Minuscules, sans accents et avec des espaces simples : "  Société  Générale" -> "societe generale"
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(name.casefold().split())
+
+
+class TiersResolver:
+    """Résolution d'un nom bancaire (DE:, POUR:, ...) vers le nom d'usage du tiers correspondant.
+
+    Les noms associés sont indexés dans un dictionnaire : la résolution exacte est en O(1). Avec normalize, les noms
+    sont aussi comparés sans casse, accents ni espaces superflus, puis par préfixe de mots ; ces recherches plus
+    coûteuses sont mémorisées dans un cache borné.
+    """
+
+    def __init__(self, tiers=(), normalize=False, memo_size=TIERS_MEMO_SIZE):
+        self.normalize = normalize
+        self.memo_size = memo_size
+        self._exact = {}  # nom associé -> nom d'usage
+        self._normalized = {}  # nom associé normalisé -> nom d'usage
+        self._memo = OrderedDict()  # nom bancaire -> résultat (LRU)
+        for tier in tiers:
+            self.add(tier)
+
+    def add(self, tier):
+        for alias in tier.noms_associes:
+            if not alias:
+                continue
+            # Le premier tiers déclaré l'emporte, comme avec le parcours de la liste des tiers
+            self._exact.setdefault(alias, tier.nom_usage)
+            self._normalized.setdefault(normalize_name(alias), tier.nom_usage)
+        self._memo.clear()  # Un nouveau nom associé peut changer les résultats approchés
+
+    def resolve(self, destinataire):
+        nom_usage = self._exact.get(destinataire)
+        if nom_usage is not None:
+            return nom_usage
+        if not self.normalize or not destinataire:
+            return destinataire
+
+        if destinataire in self._memo:
+            self._memo.move_to_end(destinataire)
+            return self._memo[destinataire]
+
+        key = normalize_name(destinataire)
+        nom_usage = self._normalized.get(key)
+        if nom_usage is None:
+            # Plus long préfixe de mots correspondant à un nom associé ("SARL DUPONT PARIS 12" -> "sarl dupont")
+            words = key.split(" ")
+            for length in range(len(words) - 1, 0, -1):
+                nom_usage = self._normalized.get(" ".join(words[:length]))
+                if nom_usage is not None:
+                    break
+        result = nom_usage if nom_usage is not None else destinataire
+
+        self._memo[destinataire] = result
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return result
@@ -0,0 +1,649 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import pathlib
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait as futures_wait
+from datetime import datetime
+
+from . import tracing
+from .models import Operation, parse_date
+
+TABLES_CACHE_FOLDER = "cache_tableaux"  # Cache des tableaux extraits des relevés PDF
+TABLES_CACHE_MAX_SIZE = 200 * 1024 * 1024  # Taille maximale du cache (octets) avant éviction des entrées les plus anciennes
+TABLE_SETTINGS = {"vertical_strategy": "lines", "horizontal_strategy": "text"}
+DEFAULT_PROFILE = "defaut"  # Profil d'extraction des comptes sans "extraction_profile" dans la configuration
+SIMPLE_FONTS = ("Type1", "MMType1", "TrueType")  # Polices dont les chaînes sont des codes d'un octet par caractère
+# Lignes de continuation "PRÉFIXE: valeur" -> champ de l'opération (REF remplit ref, ref_2 puis ref_3)
+CONTINUATION_FIELDS = {"DE": "de", "MOTIF": "motif", "REF": "ref", "POUR": "pour", "DATE": "date_virement",
+                       "REMISE": "remise", "CHEZ": "chez", "LIB": "lib"}
+BALANCE_LABEL = "SOLDE"  # Libellé des lignes de solde (SOLDE PRECEDENT en en-tête, SOLDE FINAL en dernière ligne)
+
+
+class ExtractionProfile:
+    """Réglages d'extraction des tableaux propres à une banque.
+
+    crop : zone du tableau des opérations (x0, haut, x1, bas, en points depuis le coin supérieur gauche), le reste de
+    la page est ignoré. skip_pages : plages de pages (première, dernière) jamais analysées, numérotées à partir de 1,
+    les nombres négatifs partant de la fin (-1 : dernière page). header : texte présent sur toute page d'opérations ;
+    les autres pages (couverture, mentions légales) sont écartées sur leur texte, sans détection du tableau.
+    """
+
+    def __init__(self, name=DEFAULT_PROFILE, table_settings=None, crop=None, skip_pages=(), header=None):
+        self.name = name
+        self.table_settings = dict(table_settings or TABLE_SETTINGS)
+        self.crop = tuple(crop) if crop else None
+        self.skip_pages = [tuple(page_range) for page_range in skip_pages]
+        self.header = header
+        self._header_chars = "".join(header.split()) if header else None  # Les espaces ne sont pas des caractères du PDF
+
+    def to_dict(self):
+        return {
+            "table_settings": self.table_settings,
+            "crop": list(self.crop) if self.crop else None,
+            "skip_pages": [list(page_range) for page_range in self.skip_pages],
+            "header": self.header,
+        }
+
+    @classmethod
+    def from_dict(cls, name, data):
+        return cls(name, data.get("table_settings"), data.get("crop"), data.get("skip_pages", ()), data.get("header"))
+
+    def skipped_pages(self, nb_pages):
+        # Numéros (à partir de 1) des pages à ne pas analyser dans un relevé de nb_pages pages
+        skipped = set()
+        for first, last in self.skip_pages:
+            first = first if first > 0 else nb_pages + 1 + first
+            last = last if last > 0 else nb_pages + 1 + last
+            skipped.update(range(max(first, 1), min(last, nb_pages) + 1))
+        return skipped
+
+    def crop_page(self, page):
+        # Zone du tableau des opérations, bornée à la page
+        if not self.crop:
+            return page
+        x0, top, x1, bottom = page.bbox
+        return page.crop((max(self.crop[0], x0), max(self.crop[1], top), min(self.crop[2], x1), min(self.crop[3], bottom)))
+
+    def has_header(self, page):
+        # Test rapide avant la détection (coûteuse) du tableau : l'en-tête est cherché dans les chaînes du flux de
+        # contenu, lues sans interpréter la page ; les caractères de la page (interprétation complète par pdfminer) ne
+        # servent que si ces chaînes ne suffisent pas à conclure
+        if self._header_chars is None:
+            return True
+        found = content_strings_contain(page.page_obj, self._header_chars)
+        if found is not None:
+            return found
+        return self._header_chars in "".join("".join(char["text"] for char in page.chars).split())
+
+
+def content_strings_contain(pdf_page, text):
+    """Vrai si text (sans espaces) figure dans les chaînes du flux de contenu de la page pdfminer pdf_page.
+
+    Les chaînes sont lues par le découpage du flux en jetons, sans interprétation ni calcul des caractères. Renvoie None
+    quand elles ne permettent pas de conclure : texte possible dans un formulaire (XObject), police composite ou Type3,
+    police sans encodage nommé (encodage de la police elle-même, /Differences), ou texte non ASCII avec une police
+    dont l'encodage n'est pas WinAnsi.
+    """
+    from pdfminer.pdfinterp import PDFContentParser
+    from pdfminer.pdftypes import dict_value, resolve1, stream_value
+    from pdfminer.psparser import PSEOF, PSLiteral
+
+    try:
+        encoded = text.encode("cp1252")
+    except UnicodeEncodeError:
+        return None
+    resources = dict_value(pdf_page.resources)
+    for xobject in dict_value(resources.get("XObject", {})).values():
+        subtype = stream_value(xobject).get("Subtype")
+        if not isinstance(subtype, PSLiteral) or subtype.name != "Image":
+            return None  # Formulaire, dont le flux peut contenir du texte
+    for font in dict_value(resources.get("Font", {})).values():
+        font = dict_value(font)
+        subtype, encoding = font.get("Subtype"), resolve1(font.get("Encoding"))
+        if not isinstance(subtype, PSLiteral) or subtype.name not in SIMPLE_FONTS:
+            return None
+        if not isinstance(encoding, PSLiteral):
+            return None  # Encodage du programme de la police, ou avec /Differences
+        if not text.isascii() and encoding.name != "WinAnsiEncoding":
+            return None
+
+    strings = []
+    parser = PDFContentParser([stream_value(stream) for stream in pdf_page.contents])
+    while True:
+        try:
+            _, token = parser.nextobject()
+        except PSEOF:
+            break
+        if isinstance(token, bytes):
+            strings.append(token)
+        elif isinstance(token, list):  # Tableau de TJ : chaînes et décalages
+            strings += [item for item in token if isinstance(item, bytes)]
+    return encoded in b"".join(b"".join(strings).split())
+
+
+EXTRACTION_PROFILES = {DEFAULT_PROFILE: ExtractionProfile()}  # Profils intégrés, complétés par config["extraction_profiles"]
+
+
+def extraction_profiles(config):
+    """Profil d'extraction de chaque compte : {compte: ExtractionProfile}.
+
+    Les profils sont ceux de EXTRACTION_PROFILES et de config["extraction_profiles"] ({nom: réglages}) ; un compte
+    choisit le sien par config["accounts"][compte]["extraction_profile"].
+    """
+    profiles = dict(EXTRACTION_PROFILES)
+    profiles.update({name: ExtractionProfile.from_dict(name, data) for name, data in config.get("extraction_profiles", {}).items()})
+    account_profiles = {}
+    for account, account_info in config["accounts"].items():
+        name = account_info.get("extraction_profile", DEFAULT_PROFILE)
+        if name not in profiles:
+            raise ValueError(f"Profil d'extraction inconnu pour le compte {account} : {name}")
+        account_profiles[account] = profiles[name]
+    return account_profiles
+
+
+class TableCache:
+    """Cache disque des tableaux extraits des relevés, indexé par le contenu du PDF et le profil d'extraction."""
+
+    def __init__(self, folder=TABLES_CACHE_FOLDER, max_size=TABLES_CACHE_MAX_SIZE):
+        self.folder = pathlib.Path(folder)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(path, profile):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        h.update(json.dumps(profile.to_dict(), sort_keys=True).encode())  # Sans le nom : renommer un profil garde le cache
+        return h.hexdigest()
+
+    def get(self, key):
+        # Renvoie un générateur des tableaux page par page, ou None si le relevé n'est pas en cache
+        entry_path = self.folder / f"{key}.jsonl"
+        if not entry_path.exists():
+            return None
+        os.utime(entry_path)  # La date de modification sert d'horodatage LRU pour l'éviction
+
+        def read_pages():
+            with open(entry_path, "r") as f:
+                for line in f:
+                    yield json.loads(line)
+
+        return read_pages()
+
+    def store(self, key, pages):
+        # Laisse passer les tableaux page par page en les écrivant au fur et à mesure (une ligne JSON par page)
+        self.folder.mkdir(exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage : plusieurs processus peuvent écrire en même temps
+        tmp_path = self.folder / f"{key}.{os.getpid()}.tmp"
+        completed = False
+        try:
+            with open(tmp_path, "w") as f:
+                for table in pages:
+                    f.write(json.dumps(table) + "\n")
+                    yield table
+            os.replace(tmp_path, self.folder / f"{key}.jsonl")
+            completed = True
+        finally:
+            if not completed:
+                tmp_path.unlink(missing_ok=True)
+
+    def evict(self):
+        # Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la taille maximale
+        if not self.folder.is_dir():
+            return
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry) for entry in self.folder.glob("*.jsonl")]
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total_size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= size
+
+
+class StatementPages:
+    """Tableaux d'un relevé, extraits page par page (depuis le cache si possible).
+
+    Chaque page est fermée dès que son tableau est extrait : seuls les objets de mise en page de la page courante
+    sont en mémoire, quelle que soit la longueur du relevé.
+    """
+
+    def __init__(self, path, cache=None, profile=None):
+        self.path = path
+        self.cache = cache
+        self.profile = profile or EXTRACTION_PROFILES[DEFAULT_PROFILE]
+        self.nb_pages = 0
+        self.from_cache = False
+
+    def __iter__(self):
+        key = self.cache.key(self.path, self.profile) if self.cache else None
+        cached_pages = self.cache.get(key) if self.cache else None
+        self.from_cache = cached_pages is not None
+
+        if cached_pages is not None:
+            pages = cached_pages
+        elif self.cache:
+            pages = self.cache.store(key, self._extract_pages())
+        else:
+            pages = self._extract_pages()
+
+        for table in pages:
+            self.nb_pages += 1
+            yield table
+
+    def _extract_pages(self):
+        import pdfplumber  # Chargé seulement quand une analyse a réellement lieu (pdfplumber et pdfminer sont lents à importer)
+
+        with pdfplumber.open(self.path) as pdf:
+            skipped_pages = self.profile.skipped_pages(len(pdf.pages))
+            for page_number, page in enumerate(pdf.pages, start=1):
+                if page_number in skipped_pages:
+                    yield None  # Page écartée par le profil sans être lue (les numéros de page restent ceux du relevé)
+                    continue
+                with tracing.span("extract_page", file=os.path.basename(self.path), page=page_number, profile=self.profile.name) as span:
+                    # En-tête cherché sur toute la page : il est souvent juste au-dessus de la zone du tableau
+                    if self.profile.has_header(page):
+                        table = self.profile.crop_page(page).extract_table(table_settings=self.profile.table_settings)
+                        if table is None:  # Vérifie si une table a été trouvée
+                            print("Pas de tableau trouvé pour: ", self.path)
+                    else:
+                        table = None  # Pas une page d'opérations (couverture, mentions légales, ...)
+                        span.set(skipped="header")
+                    page.close()  # Libère les objets de mise en page de la page
+                yield table
+
+
+def statement_rows(pages, balances=None):
+    # Lignes des tableaux du relevé, sans les 3 lignes d'en-tête ni la dernière ligne (équivalent de text[3:len(text) - 1]) ;
+    # si balances (dict) est fourni, il reçoit les soldes lus dans ces lignes : "ouverture" et "cloture" (None si absents)
+    previous_row = None
+    row_count = 0
+    opening = None
+    for table in pages:
+        if table is None:
+            continue
+        for row in table:
+            row_count += 1
+            if row_count <= 3:
+                if opening is None:
+                    opening = balance_row_amount(row)
+                continue
+            # On garde une ligne de retard pour ne jamais renvoyer la dernière
+            if previous_row is not None:
+                yield previous_row
+            previous_row = row
+    if balances is not None:
+        balances["ouverture"] = opening
+        balances["cloture"] = balance_row_amount(previous_row) if previous_row is not None else None
+
+
+def balance_row_amount(row):
+    # Montant d'une ligne de solde (colonne crédit, ou opposé de la colonne débit pour un solde débiteur), None sinon
+    if len(row) < 5 or BALANCE_LABEL not in (row[2] or "").upper():
+        return None
+    try:
+        return str_to_float(row[4]) if row[4] else -str_to_float(row[3]) if row[3] else None
+    except ValueError:
+        return None
+
+
+def reconciliation_gap(operations, opening, closing):
+    # Écart entre le solde de clôture lu et celui recalculé depuis les opérations (0 si le relevé est cohérent),
+    # None si l'un des soldes n'a pas été lu
+    if opening is None or closing is None:
+        return None
+    return round(closing - opening - sum(operation.montant for operation in operations), 2)
+
+
+def statement_date(pdf_filename):
+    # Les relevés sont nommés ..._ddmmyyyy.pdf
+    return datetime.strptime(pdf_filename.split('.')[0].split('_')[-1], "%d%m%Y")
+
+
+def statement_signature(path):
+    # [taille, date de modification] d'un relevé : un relevé en échec n'est proposé de nouveau qu'une fois modifié
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def list_new_statements(folder_path, analyzed_files, ignored=None):
+    # On trie les relevés de compte présents dans le dossier par date afin d'ajouter les opérations dans le bon ordre ;
+    # les PDF qui ne sont pas nommés ..._ddmmyyyy.pdf sont écartés (et ajoutés à ignored si fourni)
+    dated_pdfs = []
+    for pdf_name in os.listdir(folder_path):
+        if not pdf_name.endswith('.pdf') or pdf_name in analyzed_files:
+            continue
+        try:
+            dated_pdfs.append((statement_date(pdf_name), pdf_name))
+        except ValueError:
+            if ignored is not None:
+                ignored.append(pdf_name)
+    dated_pdfs.sort()
+    return [pdf_name for _, pdf_name in dated_pdfs]
+
+
+def parse_statement_rows(account, rows):
+    # Générateur : les opérations sont renvoyées dès que leurs lignes de continuation (DE:, MOTIF:, ...) sont lues
+    current_operation = None
+    continuation_fields = CONTINUATION_FIELDS
+
+    for l in rows:
+        if l[0] != '' and l[0] is not None:
+            if current_operation:
+                current_operation.compact()
+                yield current_operation
+            date = parse_date(l[0])
+            valeur = parse_date(l[1])
+            nom = l[2]
+            moyen = "CARTE" if "CARTE" in nom else "VIR" if "VIR" in nom else "CHEQUE" if "CHEQUE" in nom else "_"
+            montant = str_to_float(l[4]) if l[4] != '' else -str_to_float(l[3])
+
+            current_operation = Operation(compte=account, moyen=moyen,
+                                          nom=nom, destinataire="", montant=montant, date=date, valeur=valeur
+                                          )
+
+        elif l[2] is not None:
+            # Préfixe et valeur en une passe, champ trouvé dans la table (les autres libellés sont ignorés)
+            prefix, colon, payload = l[2].partition(":")
+            field = continuation_fields.get(prefix) if colon else None
+            if field is None:
+                continue
+            payload = payload.strip()
+            if field == "ref":
+                if current_operation.ref is None:
+                    current_operation.ref = payload
+                elif current_operation.ref_2 is None:
+                    current_operation.ref_2 = payload
+                elif current_operation.ref_3 is None:
+                    current_operation.ref_3 = payload
+            else:
+                setattr(current_operation, field, payload)
+                if field == "de" or field == "pour":
+                    current_operation.destinataire = payload
+
+    if current_operation:
+        current_operation.compact()
+        yield current_operation
+
+
+def parse_statement(account, path, cache_folder=None, progress=None, profile=None):
+    # Exécuté dans un processus du pool : extraction + analyse d'un relevé, sans toucher à l'application
+    with tracing.span("parse_statement", account=account, file=os.path.basename(path)) as span:
+        pages = StatementPages(path, TableCache(cache_folder) if cache_folder else None, profile)
+        tables = pages if progress is None else report_pages(pages, progress, account, os.path.basename(path))
+        balances = {}
+        operations = list(parse_statement_rows(account, tracing.counted("rows", statement_rows(tables, balances))))
+        span.set(pages=pages.nb_pages, operations=len(operations), from_cache=pages.from_cache)
+    tracing.count("pdfs")
+    return operations, pages.nb_pages, pages.from_cache, (balances["ouverture"], balances["cloture"])
+
+
+worker_progress_queue = None  # File de progression des processus du pool
+
+
+def init_statement_worker(progress):
+    global worker_progress_queue
+    worker_progress_queue = progress
+
+
+def parse_statement_in_worker(account, path, cache_folder, profile):
+    return parse_statement(account, path, cache_folder, worker_progress_queue, profile)
+
+
+def report_pages(pages, progress, account, pdf_filename):
+    # Signale chaque page lue dans la file de progression
+    for page_number, table in enumerate(pages, start=1):
+        progress.put(("page", account, pdf_filename, page_number))
+        yield table
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+class IngestionStats:
+    def __init__(self):
+        self.pdfs = 0
+        self.pages = 0
+        self.operations = 0
+        self.cached = 0  # Relevés dont les tableaux venaient du cache
+        self.duplicates = 0  # Opérations déjà présentes dans le registre, écartées à l'ajout
+        self.unreconciled = []  # (compte, relevé, écart) des relevés dont les soldes ne correspondent pas aux opérations
+        self.failed = []  # (compte, relevé, erreur) des relevés dont l'analyse a échoué
+        self.ignored = []  # (compte, fichier) des PDF écartés car non nommés ..._ddmmyyyy.pdf
+        self.seconds = 0.0
+
+    @property
+    def pdfs_per_second(self):
+        return self.pdfs / self.seconds if self.seconds else 0.0
+
+    @property
+    def pages_per_second(self):
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {"pdfs": self.pdfs, "pages": self.pages, "operations": self.operations, "cached": self.cached,
+                "duplicates": self.duplicates,
+                "unreconciled": [{"account": account, "file": pdf_filename, "gap": gap} for account, pdf_filename, gap in self.unreconciled],
+                "failed": [{"account": account, "file": pdf_filename, "error": error} for account, pdf_filename, error in self.failed],
+                "ignored": [{"account": account, "file": pdf_filename} for account, pdf_filename in self.ignored],
+                "seconds": round(self.seconds, 3), "pdfs_per_second": round(self.pdfs_per_second, 2),
+                "pages_per_second": round(self.pages_per_second, 2)}
+
+    def __str__(self):
+        return (f"{self.pdfs} relevés ({self.cached} en cache), {self.pages} pages, {self.operations} opérations "
+                f"({self.duplicates} déjà présentes, {len(self.unreconciled)} relevés incohérents, {len(self.failed)} en échec, {len(self.ignored)} fichiers ignorés) en {self.seconds:.2f} s ({self.pdfs_per_second:.1f} PDF/s, {self.pages_per_second:.1f} pages/s)")
+
+
+def ingest_statements(jobs, max_workers=None, cache=None, progress=None, cancel=None, profiles=None):
+    """Analyse les relevés (compte, chemin) répartis sur tous les cœurs.
+
+    profiles ({compte: ExtractionProfile}, voir extraction_profiles) donne le profil d'extraction de chaque compte,
+    le profil par défaut sinon.
+    Les résultats, (opérations, (solde d'ouverture, solde de clôture)) par relevé, sont renvoyés dans l'ordre des jobs
+    (donc par date de relevé), quel que soit l'ordre de fin des processus. Un relevé dont l'analyse échoue (PDF
+    illisible, ...) n'interrompt pas les autres : son résultat est None et l'erreur est ajoutée à stats.failed.
+    Si progress (file) est fourni, il reçoit ("page", compte, fichier, n° de page) pour chaque page et
+    ("file", compte, fichier, nb d'opérations) pour chaque relevé terminé (0 opération pour un relevé en échec). Si cancel (threading.Event) est levé,
+    l'analyse s'arrête au prochain relevé terminé avec IngestionCancelled.
+    """
+    stats = IngestionStats()
+    start = time.perf_counter()
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    cache_folder = str(cache.folder) if cache else None
+    profiles = profiles or {}
+    results = []
+
+    def fail(account, path, error):
+        stats.failed.append((account, os.path.basename(path), f"{type(error).__name__}: {error}"))
+        results.append(None)
+        if progress is not None:
+            progress.put(("file", account, os.path.basename(path), 0))
+
+    def collect(account, path, result):
+        operations, nb_pages, from_cache, balances = result
+        stats.pdfs += 1
+        stats.pages += nb_pages
+        stats.operations += len(operations)
+        stats.cached += from_cache
+        results.append((operations, balances))
+        if progress is not None:
+            progress.put(("file", account, os.path.basename(path), len(operations)))
+
+    if max_workers > 1:
+        # Les processus du pool écrivent leur progression dans une file inter-processus, relayée vers progress
+        worker_progress = multiprocessing.Queue() if progress is not None else None
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_statement_worker, initargs=(worker_progress,)) as executor:
+            futures = [executor.submit(parse_statement_in_worker, account, path, cache_folder, profiles.get(account))
+                       for account, path in jobs]
+            # Parcours dans l'ordre de soumission
+            for (account, path), future in zip(jobs, futures):
+                while not future.done():
+                    if cancel is not None and cancel.is_set():
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise IngestionCancelled()
+                    if worker_progress is not None:
+                        try:
+                            progress.put(worker_progress.get(timeout=0.1))
+                        except queue.Empty:
+                            pass
+                    else:
+                        futures_wait([future], timeout=0.1)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    fail(account, path, e)
+                else:
+                    collect(account, path, result)
+        # Dernières pages signalées après la fin des relevés
+        while worker_progress is not None:
+            try:
+                progress.put(worker_progress.get(timeout=0.1))
+            except queue.Empty:
+                break
+    else:
+        # Inutile de lancer un pool pour un seul relevé
+        for account, path in jobs:
+            if cancel is not None and cancel.is_set():
+                raise IngestionCancelled()
+            try:
+                result = parse_statement(account, path, cache_folder, progress, profiles.get(account))
+            except Exception as e:
+                fail(account, path, e)
+            else:
+                collect(account, path, result)
+
+    if cache:
+        cache.evict()
+    stats.seconds = time.perf_counter() - start
+    return results, stats
+
+
+def plan_statements(accounts, config, ignored=None):
+    # Relevés à analyser (compte, fichier, chemin), dans l'ordre des relevés ; accounts : {compte: dossier des relevés}.
+    # Les PDF mal nommés sont ajoutés à ignored ((compte, fichier)) si fourni
+    jobs = []
+    for account, folder_path in accounts.items():
+        analyzed_files = set(config["accounts"].get(account, {}).get("analyzed_files", []))
+        ignored_files = []
+        for pdf_filename in list_new_statements(folder_path, analyzed_files, ignored_files):
+            jobs.append((account, pdf_filename, os.path.join(folder_path, pdf_filename)))
+        if ignored is not None:
+            ignored.extend((account, pdf_filename) for pdf_filename in ignored_files)
+    return jobs
+
+
+def commit_statements(ledger, jobs, results, stats=None):
+    # Ajout en une fois des opérations analysées (dans l'ordre des relevés) et des relevés traités ; les opérations
+    # déjà présentes (relevé réédité sous un autre nom, relevés qui se chevauchent) sont écartées et comptées dans stats.
+    # Un relevé dont les opérations ne mènent pas du solde d'ouverture au solde de clôture est signalé dans la
+    # configuration du compte ("unreconciled_files" : {relevé: écart}) et dans stats. Les relevés en échec (résultat
+    # None) ne sont pas marqués comme analysés : ils sont notés avec leur signature dans "failed_files" ({relevé:
+    # [taille, date de modification]}), que la surveillance ne signale plus tant que le fichier n'a pas changé.
+    # Le solde d'ouverture du compte ("opening_balance") est celui du plus ancien relevé analysé
+    # ("opening_balance_file"), même si celui-ci n'est analysé qu'après d'autres (relevé d'abord en échec)
+    fingerprints = ledger.fingerprint_index()
+    new_operations = []
+    for (account, pdf_filename, path), result in zip(jobs, results):
+        account_config = ledger.config["accounts"][account]
+        if result is None:
+            try:
+                account_config.setdefault("failed_files", {})[pdf_filename] = statement_signature(path)
+            except OSError:
+                pass  # Relevé supprimé depuis
+            continue
+        account_config.get("failed_files", {}).pop(pdf_filename, None)
+        operations, (opening, closing) = result
+        if opening is not None and _is_earliest_statement(account_config, pdf_filename):
+            account_config["opening_balance"] = opening  # Point de départ des soldes du compte
+            account_config["opening_balance_file"] = pdf_filename
+        gap = reconciliation_gap(operations, opening, closing)
+        if gap:
+            account_config.setdefault("unreconciled_files", {})[pdf_filename] = gap
+            if stats is not None:
+                stats.unreconciled.append((account, pdf_filename, gap))
+
+        statement_operations = fingerprints.new_operations(operations)
+        fingerprints.add_many(statement_operations)  # Un relevé suivant du même lot est comparé à celui-ci aussi
+        new_operations += statement_operations
+        if stats is not None:
+            stats.duplicates += len(operations) - len(statement_operations)
+        account_config.setdefault("analyzed_files", []).append(pdf_filename)
+
+    ledger.all_operations.extend(new_operations)
+    ledger.operations_by_id.add_many(new_operations)  # Attribue leurs identifiants avant la sauvegarde
+    ledger.operations_index.add_many(new_operations)
+    ledger.balance_index.add_many(new_operations)
+    ledger.save_data(added=new_operations, config=True)
+    return new_operations
+
+
+def _is_earliest_statement(account_config, pdf_filename):
+    # Vrai si le relevé précède celui qui a donné le solde d'ouverture du compte (ou s'il n'y en a pas encore)
+    if account_config.get("opening_balance") is None:
+        return True
+    anchor = account_config.get("opening_balance_file")
+    if anchor is not None:
+        return statement_date(pdf_filename) < statement_date(anchor)
+    # Configuration antérieure : le solde d'ouverture vient du premier relevé analysé, le plus ancien à ce moment
+    analyzed_files = account_config.get("analyzed_files", [])
+    return not analyzed_files or statement_date(pdf_filename) < min(map(statement_date, analyzed_files))
+
+
+def analyze_accounts_statements(ledger, accounts, max_workers=None, cache=None):
+    # accounts : {compte: dossier des relevés}
+    ignored = []
+    jobs = plan_statements(accounts, ledger.config, ignored)
+    results, stats = ingest_statements([(account, path) for account, _, path in jobs], max_workers, cache,
+                                       profiles=extraction_profiles(ledger.config))
+    stats.ignored = ignored
+    new_operations = commit_statements(ledger, jobs, results, stats)
+    return new_operations, stats
+
+
+class IngestionJob:
+    """Analyse des relevés dans un thread, hors du thread de l'interface.
+
+    La progression arrive dans la file events, que l'interface lit avec root.after ; le dernier message est
+    ("done", résultats, stats), ("cancelled",) ou ("error", exception). Rien n'est ajouté aux opérations avant la fin :
+    c'est à l'appelant de valider les résultats avec commit_statements.
+    """
+
+    def __init__(self, jobs, max_workers=None, cache=None, profiles=None, ignored=None):
+        self.jobs = jobs  # (compte, fichier, chemin) issus de plan_statements
+        self.ignored = ignored or []  # (compte, fichier) écartés par plan_statements, repris dans stats.ignored
+        self.max_workers = max_workers
+        self.cache = cache
+        self.profiles = profiles  # {compte: ExtractionProfile}, voir extraction_profiles
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def _run(self):
+        try:
+            results, stats = ingest_statements([(account, path) for account, _, path in self.jobs], self.max_workers,
+                                               self.cache, self.events, self.cancelled, self.profiles)
+        except IngestionCancelled:
+            self.events.put(("cancelled",))
+        except Exception as e:
+            self.events.put(("error", e))
+        else:
+            stats.ignored = self.ignored
+            self.events.put(("done", results, stats))
+
+
+def str_to_float(text: str) -> float:
+    return float(text.replace('*', '').replace('.', '').replace(',', '.'))
@@ -0,0 +1,171 @@
+"""Factures : stockage par contenu et rapprochement d'un dossier de factures avec les opérations.
+
+Chaque facture est stockée une seule fois, sous le nom de son empreinte SHA-256 : une même facture liée à plusieurs
+opérations n'occupe la place qu'une fois, et les opérations pointent toutes vers le même fichier.
+"""
+import hashlib
+import os
+import pathlib
+import queue
+import re
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from .indexes import AmountIndex
+
+INVOICES_FOLDER = "factures"  # Dossier des factures stockées
+COPY_CHUNK_SIZE = 1 << 20  # Taille des blocs lus et écrits (et pas de la progression)
+INVOICE_MATCH_DAYS = 31  # Écart maximal (jours) entre la date d'une facture et celle de l'opération rapprochée
+
+# Dates et montants lus dans les noms de fichiers : 2024-03-15, 15-03-2024 (ou _ .) ; 1234,56 / 1.234,56 / 150€ / 150 EUR
+_DATE_PATTERNS = (re.compile(r"(?<!\d)(\d{4})[-_.](\d{2})[-_.](\d{2})(?!\d)"), re.compile(r"(?<!\d)(\d{2})[-_.](\d{2})[-_.](\d{4})(?!\d)"))
+_AMOUNT_PATTERN = re.compile(r"(?<![\d.,])(\d{1,3}(?:[ .]\d{3})+|\d+)(?:[.,](\d{2})(?!\d)|\s*(?:€|eur))", re.IGNORECASE)
+
+
+class InvoiceStore:
+    """Factures stockées par contenu : factures/ab/abcdef...pdf, où abcdef... est l'empreinte SHA-256 du fichier.
+
+    store() copie en calculant l'empreinte dans la même lecture, puis garde la copie ou la supprime si la facture est
+    déjà stockée. submit() fait la même chose dans un thread d'entrée/sortie (une copie à la fois, dans l'ordre des
+    demandes) et rend la main aussitôt ; la file events reçoit ("progress", jeton, octets copiés, taille) pour chaque
+    bloc, puis ("done", jeton, chemin stocké) ou ("error", jeton, exception). Le jeton est celui passé à submit.
+    """
+
+    def __init__(self, folder=INVOICES_FOLDER):
+        self.folder = pathlib.Path(folder)
+        self.events = queue.Queue()
+        self._requests = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def store(self, source, progress=None):
+        # Copie source dans le stockage (si elle n'y est pas déjà) et renvoie le chemin de la facture stockée
+        self.folder.mkdir(exist_ok=True)
+        total = os.path.getsize(source)
+        h = hashlib.sha256()
+        copied = 0
+        with open(source, "rb") as src, tempfile.NamedTemporaryFile(dir=self.folder, suffix=".tmp", delete=False) as tmp:
+            try:
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                    h.update(chunk)
+                    tmp.write(chunk)
+                    copied += len(chunk)
+                    if progress is not None:
+                        progress(copied, total)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+
+        digest = h.hexdigest()
+        dest_path = self.folder / digest[:2] / f"{digest}{pathlib.Path(source).suffix.lower()}"
+        if dest_path.exists():
+            os.unlink(tmp.name)  # Facture déjà stockée
+        else:
+            dest_path.parent.mkdir(exist_ok=True)
+            os.replace(tmp.name, dest_path)
+        return str(dest_path)
+
+    def submit(self, source, token=None):
+        with self._lock:
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._requests.put((source, token))
+
+    @property
+    def pending(self):
+        # Copies demandées et pas encore terminées
+        return self._pending
+
+    def wait(self):
+        self._requests.join()
+
+    def _run(self):
+        while True:
+            source, token = self._requests.get()
+            try:
+                path = self.store(source, lambda copied, total: self.events.put(("progress", token, copied, total)))
+            except Exception as e:
+                self.events.put(("error", token, e))
+            else:
+                self.events.put(("done", token, path))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                self._requests.task_done()
+
+
+def invoice_fields(filename):
+    """(montant, date) lus dans le nom d'une facture, None pour ceux qui n'y sont pas.
+
+    facture_2024-03-15_1.234,56.pdf -> (1234.56, 15/03/2024) ; le premier montant et la première date valides l'emportent.
+    """
+    stem = pathlib.Path(filename).stem
+    date = None
+    for pattern in _DATE_PATTERNS:
+        for match in pattern.finditer(stem):
+            parts = match.groups() if len(match.group(1)) == 4 else match.groups()[::-1]
+            try:
+                date = datetime(int(parts[0]), int(parts[1]), int(parts[2]))
+            except ValueError:
+                continue
+            stem = stem[:match.start()] + " " + stem[match.end():]  # Les chiffres de la date ne sont pas un montant
+            break
+        if date is not None:
+            break
+
+    match = _AMOUNT_PATTERN.search(stem)
+    montant = None
+    if match:
+        montant = float(match.group(1).replace(" ", "").replace(".", "") + "." + (match.group(2) or "00"))
+    return montant, date
+
+
+def scan_invoice_folder(folder):
+    # Factures du dossier : ([(chemin, montant, date)], [fichiers sans montant ou sans date dans le nom])
+    invoices = []
+    unrecognized = []
+    with os.scandir(folder) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            montant, date = invoice_fields(entry.name)
+            if montant is None or date is None:
+                unrecognized.append(entry.path)
+            else:
+                invoices.append((entry.path, montant, date))
+    return invoices, unrecognized
+
+
+def match_invoices(invoices, operations_index, max_days=INVOICE_MATCH_DAYS):
+    """Rapproche chaque facture (chemin, montant, date) de l'opération de même montant la plus proche en date.
+
+    Seules les opérations des mois autour des factures sont lues (index par mois), puis indexées par montant. Une
+    opération qui a déjà une facture, ou déjà rapprochée d'une autre facture du lot, est écartée.
+    Renvoie ([(chemin, opération)], [chemins sans opération correspondante]).
+    """
+    months = set()
+    for _, _, date in invoices:
+        day = date - timedelta(days=max_days)
+        while day <= date + timedelta(days=max_days):
+            months.add((day.year, day.month))
+            day = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    index = AmountIndex(operation for year, month in sorted(months)
+                        for operation in operations_index.operations(None, year, month) if not operation.facture)
+
+    matches = []
+    unmatched = []
+    taken = set()
+    for path, montant, date in sorted(invoices, key=lambda invoice: invoice[2]):
+        for operation in index.candidates(montant, date, max_days):
+            if id(operation) not in taken:
+                taken.add(id(operation))
+                matches.append((path, operation))
+                break
+        else:
+            unmatched.append(path)
+    return matches, unmatched
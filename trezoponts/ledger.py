@@ -0,0 +1,91 @@
+import itertools
+import os
+
+from . import tracing
+from .indexes import OperationIndex, OperationRegistry, CashBook, BalanceIndex, EventAggregator, TiersResolver, FingerprintIndex
+from .models import LazyOperations
+from .storage import make_storage
+
+
+class Ledger:
+    """Données de la comptabilité et leurs index, sans interface graphique.
+
+    Regroupe les opérations bancaires et de cash, les tiers, les événements et la configuration chargés depuis le
+    stockage, ainsi que les index tenus à jour au fil des modifications.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage or make_storage()
+        self.all_operations = LazyOperations()  # Toutes les opérations des RDC (non filtrées), créées à la première lecture
+        self.cash_operations = OperationRegistry()  # Opérations de Cash, par identifiant
+        self.tiers = []
+        self.events = []
+        self.config = {"accounts": {}, "root_folder": None}
+
+        # Chargement des données à partir du stockage
+        self.load_data()
+
+    def load_data(self):
+        # Chargement des opérations, tiers, événements et de la configuration depuis le stockage
+        with tracing.span("load_data", storage=type(self.storage).__name__):
+            data = self.storage.load()
+            self.all_operations = LazyOperations(data["operations"])
+            self.operations_index = OperationIndex(self.all_operations)
+            self.operations_by_id = OperationRegistry(self.all_operations)  # Opérations bancaires par identifiant
+            self.balance_index = BalanceIndex(self.all_operations)  # Construit à la première demande de solde
+            self.cash_operations = OperationRegistry(data["cash_operations"])
+            self.cash_book = CashBook(self.cash_operations)  # Mêmes opérations, triées par date, avec le solde du coffre
+            self.tiers = data["tiers"]
+            self.events = data["events"]
+            self.config = data["config"]
+            # Seules les opérations réparties comptent dans les totaux : les autres restent des enregistrements
+            self.event_aggregator = EventAggregator(itertools.chain(self.all_operations.with_repartition(), self.cash_operations))
+            # Comparaison sans casse ni accents et par préfixe : facultative, désactivée par défaut (résolution exacte)
+            self.tiers_resolver = TiersResolver(self.tiers, normalize=self.config.get("tiers_normalized_matching", False))
+            self._fingerprint_index = None  # Construit à la première analyse de relevés (inutile au démarrage)
+
+    def fingerprint_index(self):
+        # Empreintes des opérations bancaires, pour écarter les doublons à l'analyse des relevés
+        if self._fingerprint_index is None:
+            with tracing.span("fingerprint_index", operations=len(self.all_operations)):
+                self._fingerprint_index = FingerprintIndex(self.all_operations)
+        return self._fingerprint_index
+
+    def balance_at(self, account, date=None):
+        """Solde du compte à la fin de la journée date (solde actuel si date est None).
+
+        Part du solde d'ouverture du plus ancien relevé analysé du compte ("opening_balance" dans sa configuration), auquel
+        s'ajoutent les montants des opérations jusqu'à cette date. None si ce solde d'ouverture n'est pas connu
+        (relevés analysés avant la lecture des soldes) : la seule somme des montants n'est pas un solde.
+        """
+        opening_balance = self.config["accounts"].get(account, {}).get("opening_balance")
+        if opening_balance is None:
+            return None
+        return round(opening_balance + self.balance_index.balance(account, date), 2)
+
+    def save_data(self, added=(), updated=(), deleted=(), config=False):
+        # Sans précision, tout est sauvegardé ; sinon seuls les éléments ajoutés/modifiés/supprimés (et la configuration) le sont
+        with tracing.span("save_data", storage=type(self.storage).__name__, added=len(added), updated=len(updated),
+                          deleted=len(deleted), config=config):
+            self.storage.save(self, added=added, updated=updated, deleted=deleted, config=config)
+
+    def get_tiers_nom_usage(self, destinataire):
+        """Renvoie le nom d'usage du tiers si le destinataire correspond à un tiers connu."""
+        # Retourne le destinataire original si aucun tiers correspondant n'est trouvé.
+        return self.tiers_resolver.resolve(destinataire)
+
+    def discover_accounts(self):
+        # Parcourt les sous-dossiers du dossier racine, les lie à leurs comptes respectifs et sauvegarde la configuration
+        main_folder_path = self.config["root_folder"]
+        for account_name in os.listdir(main_folder_path):
+            account_path = os.path.join(main_folder_path, account_name)
+
+            # Vérifier que chaque élément est bien un sous-dossier
+            if os.path.isdir(account_path):
+                self.config["accounts"].setdefault(account_name, {"folder": account_path, "analyzed_files": []})
+        self.save_data(config=True)
+
+    def account_folders(self):
+        # {compte: dossier des relevés} pour les comptes configurés
+        return {account: account_info["folder"] for account, account_info in self.config["accounts"].items()
+                if account_info.get("folder")}
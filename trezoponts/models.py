@@ -0,0 +1,282 @@
+import sys
+from collections.abc import MutableSequence
+from datetime import datetime
+
+_shared_dates = {}  # Une seule instance par date : les opérations d'un même jour partagent leur datetime
+_parsed_dates = {}  # "jj/mm/aaaa" -> datetime partagé
+
+
+def shared_date(date):
+    if date is None:
+        return None
+    return _shared_dates.setdefault(date, date)
+
+
+def parse_date(text):
+    # Équivalent mémorisé de datetime.strptime(text, "%d/%m/%Y") : les dates d'un registre se répètent beaucoup
+    date = _parsed_dates.get(text)
+    if date is None:
+        if len(text) == 10 and text[2] == text[5] == "/":
+            date = datetime(int(text[6:]), int(text[3:5]), int(text[:2]))
+        else:
+            date = datetime.strptime(text, "%d/%m/%Y")
+        date = _parsed_dates[text] = shared_date(date)
+    return date
+
+
+def intern_str(value):
+    # Les valeurs très répétées (compte, moyen, destinataire, ...) ne sont stockées qu'une fois
+    return sys.intern(value) if type(value) is str else value
+
+
+# Classe représentant une opération
+class Operation:
+    # Pas de __dict__ par instance : la mémoire reste compacte même avec des millions d'opérations
+    __slots__ = ("compte", "moyen", "nom", "destinataire", "montant", "date", "valeur", "de", "motif", "ref", "ref_2", "ref_3",
+                 "pour", "date_virement", "remise", "chez", "lib", "facture", "repartition", "uni_id")
+
+    def __init__(self, compte, moyen, nom, destinataire, montant, date, valeur=None, de=None, motif=None, ref=None, ref_2=None, ref_3=None,
+                 pour=None, date_virement=None, remise=None, chez=None, lib=None, facture=None, repartition=None, uni_id=None):
+        self.compte = compte
+        self.moyen = moyen
+        self.nom = nom
+        self.destinataire = destinataire
+        self.montant = montant
+        self.date = date  # Date de l'opération
+        self.valeur = valeur  # Date de valeur
+        self.de = de
+        self.motif = motif
+        self.ref = ref
+        self.ref_2 = ref_2
+        self.ref_3 = ref_3
+        self.pour = pour
+        self.date_virement = date_virement
+        self.remise = remise
+        self.chez = chez
+        self.lib = lib
+        self.facture = facture  # Chemin du fichier facture (s'il y en a un)
+        self.repartition = repartition or ()  # Tuple vide partagé tant qu'il n'y a pas de répartition
+        self.uni_id = uni_id  # Identifiant stable, attribué par OperationRegistry
+        self.compact()
+
+    def compact(self):
+        # Internalise les chaînes répétées et partage les dates (à rappeler après avoir renseigné des champs)
+        self.compte = intern_str(self.compte)
+        self.moyen = intern_str(self.moyen)
+        self.destinataire = intern_str(self.destinataire)
+        self.de = intern_str(self.de)
+        self.pour = intern_str(self.pour)
+        self.chez = intern_str(self.chez)
+        self.date = shared_date(self.date)
+        self.valeur = shared_date(self.valeur)
+
+    def fingerprint(self):
+        # Identité de l'opération bancaire : la même ligne de relevé donne toujours la même empreinte
+        return self.compte, self.date, self.valeur, self.montant, self.nom, self.ref, self.ref_2, self.ref_3
+
+    def __reduce__(self):
+        # Reconstruit l'opération via __init__ (chaînes internalisées dans le processus qui la reçoit)
+        return self.__class__, tuple(getattr(self, field) for field in self.__slots__)
+
+    def to_dict(self):
+        return {
+            "compte": self.compte,
+            "moyen": self.moyen,
+            "nom": self.nom,
+            "destinataire": self.destinataire,
+            "montant": self.montant,
+            "date": self.date.strftime("%d/%m/%Y"),
+            "valeur": self.valeur.strftime("%d/%m/%Y") if self.valeur else None,
+            "de": self.de,
+            "motif": self.motif,
+            "ref": self.ref,
+            "ref_2": self.ref_2,
+            "ref_3": self.ref_3,
+            "pour": self.pour,
+            "date_virement": self.date_virement,
+            "remise": self.remise,
+            "chez": self.chez,
+            "lib": self.lib,
+            "facture": self.facture,
+            "repartition": list(self.repartition),
+            "uni_id": self.uni_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            compte=data["compte"],
+            moyen=data["moyen"],
+            nom=data["nom"],
+            destinataire=data["destinataire"],
+            montant=data["montant"],
+            date=parse_date(data["date"]),
+            valeur=parse_date(data["valeur"]) if data["valeur"] else None,
+            de=data.get("de"),
+            motif=data.get("motif"),
+            ref=data.get("ref"),
+            ref_2=data.get("ref_2"),
+            ref_3=data.get("ref_3"),
+            pour=data.get("pour"),
+            date_virement=data.get("date_virement"),
+            remise=data.get("remise"),
+            chez=data.get("chez"),
+            lib=data.get("lib"),
+            facture=data.get("facture"),
+            repartition=data.get("repartition", []),
+            uni_id=data.get("uni_id"),
+        )
+
+    def __repr__(self):
+        return f"Operation({self.nom}, {self.date}, {self.montant})"
+
+
+class LazyOperations(MutableSequence):
+    """Liste d'opérations dont les éléments peuvent rester sous forme d'enregistrements (dict de to_dict).
+
+    Un enregistrement n'est converti en Operation qu'à sa première lecture, puis remplacé par l'objet : au démarrage,
+    seules les opérations affichées ou réparties sont créées.
+    """
+
+    def __init__(self, items=()):
+        self._items = list(items._items if isinstance(items, LazyOperations) else items)  # Operation ou dict
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self._items)))]
+        item = self._items[i]
+        if type(item) is dict:
+            item = self._items[i] = Operation.from_dict(item)
+        return item
+
+    def __setitem__(self, i, operation):
+        self._items[i] = operation
+
+    def __delitem__(self, i):
+        del self._items[i]
+
+    def __iter__(self):
+        for i in range(len(self._items)):
+            yield self[i]
+
+    def insert(self, i, operation):
+        self._items.insert(i, operation)
+
+    def extend(self, operations):
+        self._items.extend(operations)
+
+    def positions_by_month(self):
+        # {(compte, année, mois): positions croissantes}, sans créer les objets
+        groups = {}
+        for position, item in enumerate(self._items):
+            if type(item) is dict:
+                key = (item["compte"], item["date"][3:])  # "mm/aaaa"
+            else:
+                key = (item.compte, item.date.strftime("%m/%Y"))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = []
+            group.append(position)
+        return {(compte, int(month[3:]), int(month[:2])): positions for (compte, month), positions in groups.items()}
+
+    def uni_ids(self):
+        # Identifiant de chaque opération (None s'il n'en a pas encore), sans créer les objets
+        return [item.get("uni_id") if type(item) is dict else item.uni_id for item in self._items]
+
+    def set_uni_id(self, position, uni_id):
+        item = self._items[position]
+        if type(item) is dict:
+            item["uni_id"] = uni_id  # Réécrit tel quel par records() : l'identifiant est conservé à la sauvegarde
+        else:
+            item.uni_id = uni_id
+
+    def fingerprints(self):
+        # Empreintes de toutes les opérations (voir Operation.fingerprint), sans créer les objets
+        for item in self._items:
+            if type(item) is dict:
+                yield (item["compte"], parse_date(item["date"]), parse_date(item["valeur"]) if item["valeur"] else None,
+                       item["montant"], item["nom"], item.get("ref"), item.get("ref_2"), item.get("ref_3"))
+            else:
+                yield item.fingerprint()
+
+    def balance_records(self):
+        # (compte, jour ordinal, montant) de chaque opération, sans créer les objets
+        for item in self._items:
+            if type(item) is dict:
+                yield item["compte"], parse_date(item["date"]).toordinal(), item["montant"]
+            else:
+                yield item.compte, item.date.toordinal(), item.montant
+
+    def with_repartition(self):
+        # Opérations ayant une répartition (les seules créées pour les totaux par événement)
+        return [self[position] for position, item in enumerate(self._items)
+                if (item.get("repartition") if type(item) is dict else item.repartition)]
+
+    def records(self):
+        # Enregistrements à sauvegarder : ceux jamais lus sont réécrits tels quels
+        return [item if type(item) is dict else item.to_dict() for item in self._items]
+
+
+# Classe représentant une opération de cash
+class CashOperation:
+    __slots__ = ("uni_id", "nom", "destinataire", "montant", "date", "repartition")
+
+    def __init__(self, uni_id, nom, destinataire, montant, date, repartition=None):
+        self.uni_id = uni_id
+        self.nom = nom
+        self.destinataire = intern_str(destinataire)
+        self.montant = montant
+        self.date = shared_date(date)  # Date de l'opération
+        self.repartition = repartition or ()
+
+    def to_dict(self):
+        return {
+            "uni_id": self.uni_id,
+            "nom": self.nom,
+            "destinataire": self.destinataire,
+            "montant": self.montant,
+            "date": self.date.strftime("%d/%m/%Y"),
+            "repartition": list(self.repartition),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            uni_id=data["uni_id"],
+            nom=data["nom"],
+            destinataire=data["destinataire"],
+            montant=data["montant"],
+            date=parse_date(data["date"]),
+            repartition=data.get("repartition", []),
+        )
+
+    def __repr__(self):
+        return f"Operation({self.nom}, {self.date}, {self.montant})"
+
+
+# Classe représentant un tiers
+class Tiers:
+    def __init__(self, nom_usage, noms_associes):
+        self.nom_usage = nom_usage
+        self.noms_associes = noms_associes  # Liste de noms associés
+
+    def to_dict(self):
+        return {
+            "nom_usage": self.nom_usage,
+            "noms_associes": self.noms_associes,
+        }
+
+
+class Event:
+    def __init__(self, nom, couleur):
+        self.nom = nom
+        self.couleur = couleur
+
+    def to_dict(self):
+        return {
+            "nom": self.nom,
+            "couleur": self.couleur,
+        }
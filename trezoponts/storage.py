@@ -0,0 +1,479 @@
+import gc
+import json
+import os
+import pathlib
+import threading
+from datetime import datetime
+
+try:
+    import orjson  # Décodeur JSON plus rapide, facultatif
+except ImportError:
+    orjson = None
+
+from . import tracing
+from .indexes import OperationRegistry
+from .models import Operation, CashOperation, Tiers, Event, LazyOperations
+
+DATABASE_FILE = "compta.db"  # Base SQLite (stockage "sqlite")
+JOURNAL_SNAPSHOT_FILE = "snapshot.json"  # Instantané du stockage "journal"
+JOURNAL_FILE = "journal.jsonl"  # Journal des modifications depuis l'instantané
+JOURNAL_COMPACT_EVERY = 500  # Nombre d'entrées du journal avant compaction en arrière-plan
+STORAGE_BACKEND = os.environ.get("COMPTA_STORAGE", "json")  # "json" (fichiers historiques), "sqlite" ou "journal"
+
+STORED_CLASSES = {Operation: "operations", CashOperation: "cash_operations", Tiers: "tiers", Event: "events"}
+ID_COLLECTIONS = ("operations", "cash_operations")  # Collections dont les éléments ont un identifiant stable (uni_id)
+
+
+def write_json_atomic(path, data):
+    # Écrit dans un fichier temporaire puis le renomme : un arrêt brutal ne laisse jamais un fichier à moitié écrit
+    with tracing.span("write_json", file=os.path.basename(path)) as span:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_path, path)
+        span.set(bytes=size)
+    tracing.count("bytes_written", size)
+
+
+def read_json(path, pause_gc=True):
+    # Décodage avec orjson s'il est installé. Avec pause_gc, le ramasse-miettes est suspendu pendant la création des
+    # objets, qu'il parcourrait sinon à répétition sans rien pouvoir libérer ; l'interrupteur étant global au processus,
+    # les threads d'arrière-plan lisent sans pause_gc
+    with open(path, "rb") as f:
+        content = f.read()
+    decode = orjson.loads if orjson is not None else json.loads
+    if not pause_gc:
+        return decode(content)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return decode(content)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def assign_ids(data):
+    # Identifiants stables des opérations chargées (manquants dans les anciens fichiers, ou en double)
+    for collection in ID_COLLECTIONS:
+        OperationRegistry(data[collection])
+
+
+def stored_collections(app):
+    # Collections de l'application, par nom de stockage
+    return {"operations": app.all_operations, "cash_operations": app.cash_operations, "tiers": app.tiers, "events": app.events}
+
+
+class JsonStorage:
+    """Stockage historique : un fichier JSON par collection, réécrit en entier."""
+
+    FILES = {"operations": "operations.json", "cash_operations": "cash_operations.json", "tiers": "tiers.json",
+             "events": "events.json", "config": "config.json"}
+
+    def load(self):
+        data = {}
+        # Les opérations bancaires restent des enregistrements jusqu'à leur première lecture (LazyOperations)
+        loaders = {"operations": LazyOperations, "cash_operations": lambda items: [CashOperation.from_dict(item) for item in items],
+                   "tiers": lambda items: [Tiers(**tier) for tier in items], "events": lambda items: [Event(**event) for event in items]}
+        for collection, loader in loaders.items():
+            try:
+                data[collection] = loader(read_json(self.FILES[collection]))
+            except FileNotFoundError:
+                data[collection] = loader([])
+
+        # Chargement de la configuration (chemin des dossiers de relevés et relevés analysés)
+        try:
+            data["config"] = read_json(self.FILES["config"])
+        except FileNotFoundError:
+            data["config"] = {"accounts": {}, "root_folder": None}
+        return data
+
+    def save(self, app, added=(), updated=(), deleted=(), config=False):
+        # Seuls les fichiers des collections modifiées sont réécrits (tous si aucune modification n'est précisée)
+        changed = [*added, *updated, *deleted]
+        full_save = not changed and not config
+        collections = stored_collections(app)
+        for collection in {STORED_CLASSES[type(obj)] for obj in changed} if not full_save else collections:
+            items = collections[collection]
+            write_json_atomic(self.FILES[collection],
+                              items.records() if isinstance(items, LazyOperations) else [item.to_dict() for item in items])
+
+        # Sauvegarde de la configuration
+        if config or full_save:
+            write_json_atomic(self.FILES["config"], app.config)
+
+
+class SqliteStorage:
+    """Stockage SQLite : chaque sauvegarde n'écrit que les lignes modifiées, dans une seule transaction.
+
+    La clé des opérations bancaires et de cash est leur identifiant stable (uni_id), celle des tiers et des événements
+    un numéro de ligne suivi en mémoire.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS operations (
+            id INTEGER PRIMARY KEY, compte TEXT, moyen TEXT, nom TEXT, destinataire TEXT, montant REAL, date TEXT,
+            valeur TEXT, de TEXT, motif TEXT, ref TEXT, ref_2 TEXT, ref_3 TEXT, pour TEXT, date_virement TEXT,
+            remise TEXT, chez TEXT, lib TEXT, facture TEXT);
+        CREATE INDEX IF NOT EXISTS operations_compte_date ON operations (compte, date);
+        CREATE TABLE IF NOT EXISTS cash_operations (
+            id INTEGER PRIMARY KEY, uni_id INTEGER, nom TEXT, destinataire TEXT, montant REAL, date TEXT);
+        CREATE INDEX IF NOT EXISTS cash_operations_date ON cash_operations (date);
+        CREATE TABLE IF NOT EXISTS repartitions (
+            owner TEXT, owner_id INTEGER, position INTEGER, tiers TEXT, montant REAL, event TEXT,
+            PRIMARY KEY (owner, owner_id, position));
+        CREATE INDEX IF NOT EXISTS repartitions_event ON repartitions (event);
+        CREATE INDEX IF NOT EXISTS repartitions_tiers ON repartitions (tiers);
+        CREATE TABLE IF NOT EXISTS tiers (id INTEGER PRIMARY KEY, nom_usage TEXT);
+        CREATE TABLE IF NOT EXISTS tiers_aliases (
+            tiers_id INTEGER, position INTEGER, alias TEXT, PRIMARY KEY (tiers_id, position));
+        CREATE INDEX IF NOT EXISTS tiers_aliases_alias ON tiers_aliases (alias);
+        CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, nom TEXT, couleur TEXT);
+        CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT);
+    """
+    OPERATION_FIELDS = ("compte", "moyen", "nom", "destinataire", "montant", "date", "valeur", "de", "motif", "ref",
+                        "ref_2", "ref_3", "pour", "date_virement", "remise", "chez", "lib", "facture")
+    CASH_OPERATION_FIELDS = ("uni_id", "nom", "destinataire", "montant", "date")
+
+    def __init__(self, path=DATABASE_FILE):
+        import sqlite3  # Chargé seulement si ce stockage est utilisé
+
+        migrate = not os.path.exists(path)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(self.SCHEMA)
+        with self.connection:
+            # Bases antérieures aux identifiants stables : le numéro de ligne (unique) devient l'identifiant
+            self.connection.execute("UPDATE cash_operations SET uni_id = id WHERE uni_id IS NOT id")
+        self._rowids = {}  # id(objet) -> (identifiant de ligne, objet), pour les tiers et les événements
+        if migrate:
+            self.migrate_from_json()
+
+    def migrate_from_json(self, json_storage=None):
+        # Import unique des fichiers JSON existants dans la base
+        data = (json_storage or JsonStorage()).load()
+        assign_ids(data)
+        with self.connection:
+            for collection in ("operations", "cash_operations", "tiers", "events"):
+                for obj in data[collection]:
+                    self._upsert(obj)
+            self._write_config(data["config"])
+        self._rowids.clear()
+
+    def load(self):
+        self._rowids.clear()
+        db = self.connection
+        repartitions = {}
+        for row in db.execute("SELECT * FROM repartitions ORDER BY owner, owner_id, position"):
+            repartitions.setdefault((row["owner"], row["owner_id"]), []).append([row["tiers"], row["montant"], row["event"]])
+        aliases = {}
+        for row in db.execute("SELECT * FROM tiers_aliases ORDER BY tiers_id, position"):
+            aliases.setdefault(row["tiers_id"], []).append(row["alias"])
+
+        data = {"operations": [], "cash_operations": [], "tiers": [], "events": []}
+        for row in db.execute("SELECT * FROM operations ORDER BY id"):
+            fields = {field: row[field] for field in self.OPERATION_FIELDS}
+            fields["date"] = datetime.fromisoformat(row["date"])
+            fields["valeur"] = datetime.fromisoformat(row["valeur"]) if row["valeur"] else None
+            data["operations"].append(Operation(**fields, repartition=repartitions.get(("operations", row["id"])), uni_id=row["id"]))
+        for row in db.execute("SELECT * FROM cash_operations ORDER BY id"):
+            fields = {field: row[field] for field in self.CASH_OPERATION_FIELDS}
+            fields["uni_id"] = row["id"]
+            fields["date"] = datetime.fromisoformat(row["date"])
+            data["cash_operations"].append(CashOperation(**fields, repartition=repartitions.get(("cash_operations", row["id"]))))
+        for row in db.execute("SELECT * FROM tiers ORDER BY id"):
+            data["tiers"].append(self._track(Tiers(row["nom_usage"], aliases.get(row["id"], [])), row["id"]))
+        for row in db.execute("SELECT * FROM events ORDER BY id"):
+            data["events"].append(self._track(Event(row["nom"], row["couleur"]), row["id"]))
+
+        data["config"] = {"accounts": {}, "root_folder": None}
+        data["config"].update({row["key"]: json.loads(row["value"]) for row in db.execute("SELECT * FROM config")})
+        return data
+
+    def save(self, app, added=(), updated=(), deleted=(), config=False):
+        with self.connection:  # Une seule transaction par sauvegarde
+            if not (added or updated or deleted or config):
+                # Sauvegarde complète : synchronise toutes les collections
+                present = set()
+                for collection, items in stored_collections(app).items():
+                    for obj in items:
+                        self._upsert(obj)
+                        present.add(id(obj))
+                    if collection in ID_COLLECTIONS:
+                        kept = {obj.uni_id for obj in items}
+                        stale = [row[0] for row in self.connection.execute(f"SELECT id FROM {collection}") if row[0] not in kept]
+                        for uni_id in stale:
+                            self._delete_row(collection, uni_id)
+                for key, (_, obj) in list(self._rowids.items()):
+                    if key not in present:
+                        self._delete(obj)
+                self._write_config(app.config)
+                return
+
+            for obj in deleted:
+                self._delete(obj)
+            for obj in [*added, *updated]:
+                self._upsert(obj)
+            if config:
+                self._write_config(app.config)
+
+    def _track(self, obj, rowid):
+        self._rowids[id(obj)] = (rowid, obj)
+        return obj
+
+    def _upsert(self, obj):
+        db = self.connection
+        collection = STORED_CLASSES[type(obj)]
+        rowid = obj.uni_id if collection in ID_COLLECTIONS else self._rowids[id(obj)][0] if id(obj) in self._rowids else None
+
+        if collection == "operations":
+            values = [getattr(obj, field) for field in self.OPERATION_FIELDS]
+            values[5] = obj.date.date().isoformat()
+            values[6] = obj.valeur.date().isoformat() if obj.valeur else None
+            self._write_keyed_row(collection, self.OPERATION_FIELDS, values, rowid)
+        elif collection == "cash_operations":
+            values = [obj.uni_id, obj.nom, obj.destinataire, obj.montant, obj.date.date().isoformat()]
+            self._write_keyed_row(collection, self.CASH_OPERATION_FIELDS, values, rowid)
+        elif collection == "tiers":
+            rowid = self._write_row(collection, ("nom_usage",), [obj.nom_usage], rowid)
+            db.execute("DELETE FROM tiers_aliases WHERE tiers_id = ?", (rowid,))
+            db.executemany("INSERT INTO tiers_aliases VALUES (?, ?, ?)",
+                           [(rowid, position, alias) for position, alias in enumerate(obj.noms_associes)])
+        else:
+            rowid = self._write_row(collection, ("nom", "couleur"), [obj.nom, obj.couleur], rowid)
+
+        if collection in ID_COLLECTIONS:
+            db.execute("DELETE FROM repartitions WHERE owner = ? AND owner_id = ?", (collection, rowid))
+            db.executemany("INSERT INTO repartitions VALUES (?, ?, ?, ?, ?, ?)",
+                           [(collection, rowid, position, tier, montant, event)
+                            for position, (tier, montant, event) in enumerate(obj.repartition)])
+        else:
+            self._track(obj, rowid)
+
+    def _write_row(self, table, fields, values, rowid):
+        if rowid is None:
+            placeholders = ", ".join("?" * len(fields))
+            return self.connection.execute(f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({placeholders})", values).lastrowid
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self.connection.execute(f"UPDATE {table} SET {assignments} WHERE id = ?", [*values, rowid])
+        return rowid
+
+    def _write_keyed_row(self, table, fields, values, key):
+        # Insertion ou mise à jour de la ligne d'identifiant key
+        assignments = ", ".join(f"{field} = excluded.{field}" for field in fields)
+        self.connection.execute(f"INSERT INTO {table} (id, {', '.join(fields)}) VALUES ({', '.join('?' * (len(fields) + 1))}) "
+                                f"ON CONFLICT (id) DO UPDATE SET {assignments}", [key, *values])
+
+    def _delete(self, obj):
+        collection = STORED_CLASSES[type(obj)]
+        if collection in ID_COLLECTIONS:
+            self._delete_row(collection, obj.uni_id)
+        elif id(obj) in self._rowids:
+            self._delete_row(collection, self._rowids.pop(id(obj))[0])
+
+    def _delete_row(self, collection, rowid):
+        self.connection.execute(f"DELETE FROM {collection} WHERE id = ?", (rowid,))
+        if collection == "tiers":
+            self.connection.execute("DELETE FROM tiers_aliases WHERE tiers_id = ?", (rowid,))
+        elif collection in ID_COLLECTIONS:
+            self.connection.execute("DELETE FROM repartitions WHERE owner = ? AND owner_id = ?", (collection, rowid))
+
+    def _write_config(self, config):
+        self.connection.executemany("INSERT OR REPLACE INTO config VALUES (?, ?)",
+                                    [(key, json.dumps(value)) for key, value in config.items()])
+
+
+class JournalStorage:
+    """Stockage journalisé : un instantané JSON plus un journal où chaque modification est ajoutée sur une ligne.
+
+    Chaque sauvegarde n'ajoute que quelques lignes au journal (et ne réécrit jamais de fichier existant). Quand le
+    journal devient long, il est scellé et fusionné dans un nouvel instantané par un thread en arrière-plan.
+    La clé des opérations bancaires et de cash est leur identifiant stable (uni_id).
+    """
+
+    def __init__(self, snapshot_path=JOURNAL_SNAPSHOT_FILE, journal_path=JOURNAL_FILE, compact_every=JOURNAL_COMPACT_EVERY):
+        self.snapshot_path = pathlib.Path(snapshot_path)
+        self.journal_path = pathlib.Path(journal_path)
+        self.compact_every = compact_every
+        self._keys = {}  # id(objet) -> (clé stable dans sa collection, objet), pour les tiers et les événements
+        self._next_key = {collection: 0 for collection in STORED_CLASSES.values()}
+        self._seq = 0  # Numéro de la dernière entrée écrite
+        self._entries_since_compaction = 0
+        self._compaction = None  # Thread de compaction en cours
+
+    def load(self):
+        if not self.snapshot_path.exists():
+            # Premier lancement en mode journal : instantané initial à partir des fichiers JSON existants
+            data = JsonStorage().load()
+            assign_ids(data)
+            self._keys.clear()
+            for collection in ("tiers", "events"):
+                for obj in data[collection]:
+                    self._track(obj, self._new_key(collection))
+            self._seq = 0
+            write_json_atomic(self.snapshot_path, self._snapshot_from_objects(data, data["config"]))
+            return data
+
+        self._repair_journal()
+        state = self.replay(self.snapshot_path, self._segments())
+        self._seq = state["seq"]
+        self._next_key = state["next_key"]
+        self._keys.clear()
+        loaders = {"operations": Operation.from_dict, "cash_operations": CashOperation.from_dict,
+                   "tiers": lambda tier: Tiers(**tier), "events": lambda event: Event(**event)}
+        data = {"config": state["config"]}
+        for collection, loader in loaders.items():
+            data[collection] = [loader(item) for item in state[collection].values()]
+            for key, obj in zip(state[collection], data[collection]):
+                if collection in ID_COLLECTIONS:
+                    obj.uni_id = int(key)  # La clé fait foi (anciens journaux sans identifiant)
+                else:
+                    self._track(obj, int(key))
+        return data
+
+    @staticmethod
+    def replay(snapshot_path, segments, pause_gc=True):
+        # Instantané + entrées des segments du journal (dans l'ordre), en ignorant celles déjà incluses dans l'instantané
+        state = read_json(snapshot_path, pause_gc)
+        for collection in STORED_CLASSES.values():
+            state[collection] = {str(key): item for key, item in state[collection]}
+
+        for segment in segments:
+            with open(segment, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Dernière ligne tronquée par un arrêt brutal : on l'ignore
+                    if entry["seq"] <= state["seq"]:
+                        continue
+                    state["seq"] = entry["seq"]
+                    if entry["op"] == "config":
+                        state["config"] = entry["data"]
+                        continue
+                    collection, key = entry["collection"], str(entry["key"])
+                    if entry["op"] == "delete":
+                        state[collection].pop(key, None)
+                    else:
+                        state[collection][key] = entry["data"]
+                        state["next_key"][collection] = max(state["next_key"][collection], int(key) + 1)
+        return state
+
+    def save(self, app, added=(), updated=(), deleted=(), config=False):
+        if not (added or updated or deleted or config):
+            # Sauvegarde complète : nouvel instantané écrit directement depuis la mémoire
+            self.wait_for_compaction()
+            data = stored_collections(app)
+            for collection in ("tiers", "events"):
+                for obj in data[collection]:
+                    if id(obj) not in self._keys:
+                        self._track(obj, self._new_key(collection))
+            write_json_atomic(self.snapshot_path, self._snapshot_from_objects(data, app.config))
+            for segment in self._segments():
+                segment.unlink()
+            self._entries_since_compaction = 0
+            return
+
+        entries = []
+        for obj in deleted:
+            collection = STORED_CLASSES[type(obj)]
+            if collection in ID_COLLECTIONS:
+                entries.append({"op": "delete", "collection": collection, "key": obj.uni_id})
+            elif id(obj) in self._keys:
+                key, _ = self._keys.pop(id(obj))
+                entries.append({"op": "delete", "collection": collection, "key": key})
+        for op, objects in (("add", added), ("update", updated)):
+            for obj in objects:
+                collection = STORED_CLASSES[type(obj)]
+                if collection not in ID_COLLECTIONS and id(obj) not in self._keys:
+                    self._track(obj, self._new_key(collection))
+                entries.append({"op": op, "collection": collection, "key": self._key(obj), "data": obj.to_dict()})
+        if config:
+            entries.append({"op": "config", "data": app.config})
+
+        lines = []
+        for entry in entries:
+            self._seq += 1
+            entry["seq"] = self._seq
+            lines.append(json.dumps(entry) + "\n")
+        content = "".join(lines).encode()
+        with tracing.span("append_journal", entries=len(entries), bytes=len(content)):
+            with open(self.journal_path, "ab") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())  # L'entrée est sur disque avant de rendre la main
+        tracing.count("bytes_written", len(content))
+
+        self._entries_since_compaction += len(entries)
+        if self._entries_since_compaction >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # Scelle le journal courant et le fusionne dans l'instantané en arrière-plan
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        if self.journal_path.exists():
+            self.journal_path.rename(self.journal_path.with_name(f"{self.journal_path.stem}.{self._seq}{self.journal_path.suffix}"))
+        self._entries_since_compaction = 0
+        segments = self._segments()
+        self._compaction = threading.Thread(target=self._compact_segments, args=(segments,), daemon=True)
+        self._compaction.start()
+
+    def wait_for_compaction(self):
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def _compact_segments(self, segments):
+        state = self.replay(self.snapshot_path, segments, pause_gc=False)  # Thread de compaction
+        for collection in STORED_CLASSES.values():
+            state[collection] = [[int(key), item] for key, item in state[collection].items()]
+        write_json_atomic(self.snapshot_path, state)
+        # Les segments ne sont supprimés qu'une fois l'instantané remplacé (rejouer leurs entrées serait sans effet)
+        for segment in segments:
+            segment.unlink(missing_ok=True)
+
+    def _repair_journal(self):
+        # Coupe une dernière ligne tronquée par un arrêt brutal, pour que les prochaines entrées restent lisibles
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "rb+") as f:
+            content = f.read()
+            end = content.rfind(b"\n") + 1
+            if end != len(content):
+                f.truncate(end)
+
+    def _segments(self):
+        # Segments scellés (journal.<seq>.jsonl) dans l'ordre, puis le journal courant
+        stem, suffix = self.journal_path.stem, self.journal_path.suffix
+        sealed = sorted(self.journal_path.parent.glob(f"{stem}.*{suffix}"), key=lambda p: int(p.name[len(stem) + 1:-len(suffix)]))
+        return sealed + ([self.journal_path] if self.journal_path.exists() else [])
+
+    def _snapshot_from_objects(self, data, config):
+        snapshot = {"seq": self._seq, "next_key": dict(self._next_key), "config": config}
+        for collection in STORED_CLASSES.values():
+            snapshot[collection] = [[self._key(obj), obj.to_dict()] for obj in data[collection]]
+        return snapshot
+
+    def _key(self, obj):
+        return obj.uni_id if STORED_CLASSES[type(obj)] in ID_COLLECTIONS else self._keys[id(obj)][0]
+
+    def _new_key(self, collection):
+        key = self._next_key[collection]
+        self._next_key[collection] = key + 1
+        return key
+
+    def _track(self, obj, key):
+        self._keys[id(obj)] = (key, obj)
+        return obj
+
+
+def make_storage(backend=STORAGE_BACKEND):
+    if backend == "sqlite":
+        return SqliteStorage()
+    if backend == "journal":
+        return JournalStorage()
+    return JsonStorage()
@@ -0,0 +1,148 @@
+"""Instrumentation : durées des étapes coûteuses (spans) et compteurs, exportés en trace Chrome ou en journal JSON.
+
+Activée par la variable d'environnement COMPTA_TRACE=<fichier> (ou enable()) : un fichier .json reçoit une trace
+Chrome (à ouvrir dans chrome://tracing ou ui.perfetto.dev), tout autre fichier une ligne JSON par événement. Chaque
+événement est ajouté au fichier dès sa fin, y compris depuis les processus d'analyse des relevés.
+
+Désactivée, elle ne coûte rien : traced() renvoie la fonction telle quelle (résolu à l'import), span() un contexte
+vide partagé et counted() l'itérable d'origine.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = "COMPTA_TRACE"  # Fichier de trace (.json : trace Chrome, sinon journal JSON ligne par ligne)
+
+trace_path = os.environ.get(TRACE_ENV) or None
+enabled = trace_path is not None
+
+_lock = threading.Lock()
+_fd = None  # Descripteur du fichier de trace, ouvert par processus
+_fd_pid = None
+_counters = {}  # Valeurs cumulées des compteurs dans ce processus
+
+
+def enable(path):
+    # Active l'instrumentation (et pour les processus lancés ensuite) ; les fonctions déjà décorées par traced() ne changent pas
+    global trace_path, enabled
+    trace_path = str(path)
+    enabled = True
+    os.environ[TRACE_ENV] = trace_path
+
+
+def disable():
+    global trace_path, enabled, _fd
+    enabled = False
+    trace_path = None
+    os.environ.pop(TRACE_ENV, None)
+    with _lock:
+        if _fd is not None:
+            os.close(_fd)
+            _fd = None
+
+
+def _emit(event):
+    global _fd, _fd_pid
+    chrome = trace_path.endswith(".json")
+    event["pid"] = os.getpid()
+    event["tid"] = threading.get_ident()
+    # Format tableau JSON de Chrome : le "]" final est facultatif, les processus peuvent donc ajouter leurs lignes
+    line = (json.dumps(event, ensure_ascii=False, default=str) + (",\n" if chrome else "\n")).encode()
+    with _lock:
+        if _fd is None or _fd_pid != os.getpid():
+            _fd = os.open(trace_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            _fd_pid = os.getpid()
+            if chrome and os.fstat(_fd).st_size == 0:
+                os.write(_fd, b"[\n")
+        os.write(_fd, line)  # Une seule écriture en mode ajout : les lignes des processus ne se mélangent pas
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def set(self, **args):
+        # Précise les arguments du span (nombre d'opérations, ...) avant sa fin
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _emit({"name": self.name, "cat": "trezoponts", "ph": "X", "ts": self.start // 1000, "dur": duration // 1000,
+               "args": self.args})
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **args):
+    # with span("nom", clé=valeur) as s: ... ; s.set(...) complète les arguments
+    return _Span(name, args) if enabled else _NO_SPAN
+
+
+def traced(name=None):
+    # Décorateur : un span par appel, nommé d'après la fonction par défaut
+    def decorate(function):
+        if not enabled:
+            return function
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Span(label, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def count(name, n=1):
+    # Ajoute n au compteur et enregistre sa nouvelle valeur (piste de compteur dans la trace Chrome)
+    if not enabled:
+        return
+    with _lock:
+        value = _counters[name] = _counters.get(name, 0) + n
+    _emit({"name": name, "cat": "trezoponts", "ph": "C", "ts": time.perf_counter_ns() // 1000, "args": {name: value}})
+
+
+def counted(name, iterable):
+    # Itère en comptant les éléments, ajoutés au compteur à la fin
+    if not enabled:
+        return iterable
+    return _counted(name, iterable)
+
+
+def _counted(name, iterable):
+    n = 0
+    try:
+        for item in iterable:
+            n += 1
+            yield item
+    finally:
+        count(name, n)
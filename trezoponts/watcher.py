@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+import time
+
+from .ingestion import statement_date, statement_signature
+
+WATCH_INTERVAL = 2.0  # Secondes entre deux passages sur les dossiers des comptes
+WATCH_SETTLE = 2  # Passages successifs sans changement de taille ni de date avant d'analyser un nouveau relevé
+
+
+class StatementWatcher:
+    """Surveillance par scrutation des dossiers de relevés des comptes.
+
+    À chaque passage, seuls les dossiers dont la date de modification a changé sont relistés. Un nouveau PDF n'est
+    signalé qu'une fois sa taille et sa date de modification stables pendant settle passages (fichier en cours de
+    copie). Les relevés prêts sont placés dans la file ready, par lots de jobs (compte, fichier, chemin) triés par date.
+    Un relevé en échec (failed_files, ou signalé par failed()) n'est proposé de nouveau qu'une fois sa taille ou sa
+    date de modification changée.
+    """
+
+    def __init__(self, accounts, analyzed_files=None, interval=WATCH_INTERVAL, settle=WATCH_SETTLE, failed_files=None):
+        self.accounts = dict(accounts)  # {compte: dossier des relevés}
+        self.interval = interval
+        self.settle = settle
+        self.ready = queue.Queue()
+        self._known = {account: set((analyzed_files or {}).get(account, ())) for account in self.accounts}  # Analysés ou signalés
+        self._folder_mtimes = {}  # dossier -> date de modification au dernier listage
+        self._pending = {}  # chemin -> [compte, fichier, (taille, date de modification), passages stables]
+        self._failed = {}  # chemin -> (compte, fichier, (taille, date de modification) au moment de l'échec)
+        for account, files in (failed_files or {}).items():
+            if account in self.accounts:
+                for pdf_filename, signature in files.items():
+                    self._known[account].add(pdf_filename)
+                    self._failed[os.path.join(self.accounts[account], pdf_filename)] = (account, pdf_filename, tuple(signature))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def for_ledger(cls, ledger, **kwargs):
+        analyzed_files = {account: account_info.get("analyzed_files", []) for account, account_info in ledger.config["accounts"].items()}
+        failed_files = {account: account_info.get("failed_files", {}) for account, account_info in ledger.config["accounts"].items()}
+        return cls(ledger.account_folders(), analyzed_files, failed_files=failed_files, **kwargs)
+
+    def start(self):
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def forget(self, jobs):
+        # Relevés à signaler de nouveau (analyse annulée) au prochain passage
+        with self._lock:
+            for account, pdf_filename, _ in jobs:
+                self._known.get(account, set()).discard(pdf_filename)
+                self._folder_mtimes.pop(self.accounts.get(account), None)
+
+    def failed(self, jobs):
+        # Relevés en échec : plus signalés tant que leur taille et leur date de modification n'ont pas changé
+        with self._lock:
+            for account, pdf_filename, path in jobs:
+                try:
+                    signature = tuple(statement_signature(path))
+                except OSError:
+                    self._known.get(account, set()).discard(pdf_filename)
+                    continue
+                self._failed[path] = (account, pdf_filename, signature)
+
+    def poll(self):
+        # Un passage : renvoie le lot de relevés devenus prêts (aussi placé dans ready s'il n'est pas vide)
+        with self._lock:
+            for account, folder in self.accounts.items():
+                self._scan_folder(account, folder)
+            self._recheck_failed()
+            ready = self._settled()
+        ready.sort(key=lambda job: statement_date(job[1]))
+        if ready:
+            self.ready.put(ready)
+        return ready
+
+    def _run(self):
+        self.poll()
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def _scan_folder(self, account, folder):
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            return
+        # Dossier inchangé : rien à relister (sauf modification très récente, la date n'étant pas toujours précise)
+        if self._folder_mtimes.get(folder) == mtime and time.time() - mtime / 1e9 > 2 * self.interval:
+            return
+        self._folder_mtimes[folder] = mtime
+
+        known = self._known.setdefault(account, set())
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name in known or not entry.name.endswith(".pdf"):
+                    continue
+                known.add(entry.name)
+                try:
+                    statement_date(entry.name)
+                except ValueError:
+                    continue  # Pas un relevé nommé ..._ddmmyyyy.pdf : ignoré
+                self._pending[entry.path] = [account, entry.name, None, 0]
+
+    def _recheck_failed(self):
+        # Un relevé en échec modifié depuis (fichier remplacé) repasse par l'attente de stabilité
+        for path, (account, pdf_filename, signature) in list(self._failed.items()):
+            try:
+                current = tuple(statement_signature(path))
+            except OSError:
+                del self._failed[path]
+                self._known[account].discard(pdf_filename)
+                continue
+            if current != signature:
+                del self._failed[path]
+                self._pending[path] = [account, pdf_filename, None, 0]
+
+    def _settled(self):
+        ready = []
+        for path, pending in list(self._pending.items()):
+            account, pdf_filename, signature, stable_polls = pending
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Fichier supprimé ou renommé avant la fin de la copie
+                del self._pending[path]
+                self._known[account].discard(pdf_filename)
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            pending[2:] = [current, stable_polls + 1 if current == signature and stat.st_size > 0 else 0]
+            if pending[3] >= self.settle:
+                del self._pending[path]
+                ready.append((account, pdf_filename, path))
+        return ready